@@ -0,0 +1,99 @@
+"""
+Dense index recall/latency trade-off: IVF search at several `nprobe` values
+against an exhaustive scan of the same int8 codes.
+
+    python -m benchmarks.bench_dense --pairs 15000 60000 --nprobe 1 4 8 16 32
+
+For each corpus size, fits the model and its dense index on a synthetic corpus
+(`benchmarks.synthetic_corpus`), then embeds the English form of a query set
+(`benchmarks.query_sets`). It prints the largest score error of the int8
+codes against float32 embeddings, then for each nprobe:
+
+    recall@k        share of the IVF top k that belongs in the exhaustive top k
+                    (ties count: the synthetic corpus repeats questions)
+    p50/p99 ms      search latency per query (embedding included)
+    scanned         mean fraction of the corpus scored per query
+    top-1 acc       top-1 row's answer among the query's expected answers
+
+Latency that stays flat while the corpus grows is the sublinear part; nprobe
+set to the number of lists is the exhaustive (int8) scan.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.query_sets import answer_digest, make_query_set
+from benchmarks.synthetic_corpus import generate_corpus, write_corpus
+from src.dense_index import fit_dense_index
+from src.ranking import top_k_scores
+from src.retrieval_model import MedicalQARetrievalModel
+from src.text_normalization import clean_series
+
+
+def _kth_scores(embeddings, queries, top_k):
+    """Score of the k-th best row per query: anything scoring at least that is a true top-k row."""
+    return [top_k_scores(np.arange(len(embeddings)), embeddings @ query, top_k)[1][-1] for query in queries]
+
+
+def run(pairs, seed, per_lang, nprobes, top_k, components, lists, workdir):
+    corpus = generate_corpus(pairs, seed)
+    data_path = os.path.join(workdir, f"corpus_{pairs}_{seed}.parquet")
+    write_corpus(corpus, data_path)
+    records = make_query_set(corpus, per_lang, seed)
+    model = MedicalQARetrievalModel(data_path=data_path)
+
+    start = time.perf_counter()
+    dense = fit_dense_index(model.question_vector, model.vectorizer, model._texts('answer'), components, lists, seed)
+    fit_s = time.perf_counter() - start
+    print(f"\n{pairs} pairs: dense index fitted in {fit_s:.1f}s "
+          f"({dense.n_lists} lists, {dense.codes.nbytes / 2**20:.1f} MB of codes)")
+
+    query_matrix = model.vectorizer.transform(clean_series([record['english'] for record in records]))
+    queries = dense.embed(query_matrix)
+    exact = dense.embed(model.question_vector)
+    quantized = np.empty_like(exact)
+    quantized[dense.list_rows] = dense.codes.astype(np.float32) * dense.scale
+    kth = _kth_scores(quantized, queries, top_k)
+    error = np.abs((quantized - exact) @ queries.T).max()
+    print(f"int8 codes: largest score error against float32 {error:.4f}")
+    answers = model._texts('answer')
+    list_sizes = np.diff(dense.list_offsets)
+
+    print(f"{'nprobe':>8}{f'recall@{top_k}':>12}{'p50 ms':>10}{'p99 ms':>10}{'scanned':>10}{'top-1 acc':>11}")
+    for nprobe in nprobes:
+        latencies, recalls, scanned, correct = [], [], [], []
+        for i, record in enumerate(records):
+            start = time.perf_counter()
+            rows, _ = dense.search(dense.embed(query_matrix[i])[0], top_k, nprobe)
+            latencies.append((time.perf_counter() - start) * 1000)
+            # Synthetic corpora are full of tied questions, so recall counts rows, not ids.
+            recalls.append(np.sum(quantized[rows] @ queries[i] >= kth[i] - 1e-5) / top_k)
+            scanned.append(list_sizes[dense._probe(queries[i], nprobe)].sum() / pairs)
+            correct.append(len(rows) > 0 and answer_digest(answers.iloc[rows[0]]) in record['expected_answers'])
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"{min(nprobe, dense.n_lists):>8}{np.mean(recalls):>12.3f}{p50:>10.3f}{p99:>10.3f}"
+              f"{np.mean(scanned):>10.1%}{np.mean(correct):>11.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dense index recall against latency for several nprobe values.")
+    parser.add_argument("--pairs", type=int, nargs="+", default=[15000], help="Synthetic corpus sizes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--per-lang", type=int, default=100, help="Queries per language (English form is used)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 10**9])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--components", type=int, default=128)
+    parser.add_argument("--lists", type=int, help="IVF lists (default: 4 * sqrt(pairs))")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for pairs in args.pairs:
+            run(pairs, args.seed, args.per_lang, args.nprobe, args.top_k, args.components, args.lists, workdir)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
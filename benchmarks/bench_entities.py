@@ -0,0 +1,95 @@
+"""
+Entity pre-filtering of TF-IDF scoring: latency and accuracy against scoring
+every question.
+
+    python -m benchmarks.bench_entities --pairs 15000 60000
+
+For each corpus size, builds an index of a synthetic corpus
+(`benchmarks.synthetic_corpus`) with its entity index (`src/ner_model.py`),
+then scores the English form of a query set (`benchmarks.query_sets`) one
+query at a time, with the filter off ("full") and on ("filtered"). It reports:
+
+    entities        gazetteer size, and the share of queries that mention one
+    candidates      mean fraction of the corpus a filtered query is scored against
+    p50/p99 ms      per-query latency (tagging and vectorising included)
+    top-1 acc       top-1 row's answer among the query's expected answers
+    agreement       share of queries whose top-1 row is the same as full scoring's
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.query_sets import answer_digest, make_query_set
+from benchmarks.synthetic_corpus import generate_corpus, write_corpus
+from src.ner_model import build_entity_index
+from src.retrieval_model import MedicalQARetrievalModel
+from src.text_normalization import clean_text
+
+
+def _run(model, queries, top_k):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.extend(model._score_queries([model._clean_text(query)], top_k))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, latencies
+
+
+def run(pairs, seed, per_lang, top_k, workdir):
+    corpus = generate_corpus(pairs, seed)
+    index_dir = os.path.join(workdir, f"index_{pairs}_{seed}")
+    if not os.path.exists(index_dir):
+        data_path = write_corpus(corpus, os.path.join(workdir, f"corpus_{pairs}_{seed}.parquet"))
+        MedicalQARetrievalModel(data_path=data_path).save_index(index_dir)
+    start = time.perf_counter()
+    entities = build_entity_index(index_dir)
+    build_s = time.perf_counter() - start
+    records = make_query_set(corpus, per_lang, seed)
+    queries = [record['english'] for record in records]
+    del corpus
+
+    candidates = [entities.candidates(clean_text(query)) for query in queries]
+    hits = [len(rows) / pairs for rows in candidates if rows is not None]
+    print(f"\n{pairs} pairs: {len(entities)} entities indexed in {build_s:.1f}s, "
+          f"{len(hits) / len(queries):.1%} of {len(queries)} queries mention one, "
+          f"candidates {np.mean(hits) if hits else 1:.2%} of the corpus")
+
+    print(f"{'scoring':>10}{'p50 ms':>10}{'p99 ms':>10}{'top-1 acc':>11}{'agreement':>11}")
+    reference = None
+    for name, entity_filter in (('full', False), ('filtered', True)):
+        model = MedicalQARetrievalModel.load_index(index_dir, entity_filter=entity_filter)
+        answers = model._texts('answer')
+        _run(model, queries[:20], top_k)  # warm the page cache
+        results, latencies = _run(model, queries, top_k)
+        top1 = [rows[0] if len(rows) else -1 for rows, _ in results]
+        if reference is None:
+            reference = top1
+        correct = [row >= 0 and answer_digest(answers.iloc[row]) in record['expected_answers']
+                   for row, record in zip(top1, records)]
+        agreement = np.mean([a == b for a, b in zip(top1, reference)])
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"{name:>10}{p50:>10.3f}{p99:>10.3f}{np.mean(correct):>11.3f}{agreement:>11.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latency and accuracy of entity pre-filtered TF-IDF scoring.")
+    parser.add_argument("--pairs", type=int, nargs="+", default=[15000], help="Synthetic corpus sizes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--per-lang", type=int, default=100, help="Queries per language (English form is used)")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--workdir", help="Keep the corpora and indexes here (default: a temp dir)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        os.makedirs(workdir, exist_ok=True)
+        for pairs in args.pairs:
+            run(pairs, args.seed, args.per_lang, args.top_k, workdir)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
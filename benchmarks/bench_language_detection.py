@@ -0,0 +1,83 @@
+"""
+Per-call cost of `detect_language` against the implementation it replaced.
+
+    python -m benchmarks.bench_language_detection
+
+Reports cold (first sight of each query, cache cleared) and warm (repeated query)
+timings, plus how often the two implementations agree.
+"""
+import time
+
+from langdetect import detect
+
+from src import language_detection
+from src.language_detection import MEDICAL_TERMS, SUPPORTED_LANGUAGES, detect_language
+
+QUERIES = [
+    "What are the symptoms of diabetes?",
+    "How is high blood pressure treated?",
+    "What causes fever and joint pain in children?",
+    "Is glaucoma inherited?",
+    "¿Cuáles son los síntomas del cáncer de pulmón?",
+    "cuáles son los síntomas de la diabetes",
+    "¿Qué tratamiento hay para la hipertensión?",
+    "tratamiento de la fiebre",
+    "मधुमेह के लक्षण क्या हैं",
+    "उच्च रक्तचाप के लक्षण क्या हैं?",
+    "कैंसर का उपचार",
+    "Quels sont les symptômes de l'hypertension artérielle?",
+    "quels sont les symptômes du diabète",
+    "traitement de la maladie de Crohn",
+    "diabetes",
+    "asthma",
+    # One French diacritic in an English question must not make it French.
+    "What is Behçet syndrome?",
+    "What are the treatments for Sjögren syndrome and Ménière disease?",
+]
+
+
+def legacy_detect_language(text):
+    """`MedicalQARetrievalModel.detect_language` before the shared detector."""
+    if not text.strip():
+        return 'en'
+    try:
+        lang = detect(text)
+        if lang in SUPPORTED_LANGUAGES:
+            return lang
+        text_lower = text.lower()
+        for lang_code, terms in MEDICAL_TERMS.items():
+            if any(term in text_lower for term in terms):
+                return lang_code
+    except Exception:
+        pass
+    return 'en'
+
+
+def per_call_us(fn, queries, repeat, clear=None):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        if clear:
+            clear()
+        for query in queries:
+            fn(query)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1e6
+
+
+def main(repeat=20):
+    legacy = per_call_us(legacy_detect_language, QUERIES, repeat)
+    cold = per_call_us(detect_language, QUERIES, repeat, clear=language_detection._detect.cache_clear)
+    warm = per_call_us(detect_language, QUERIES, repeat)
+
+    agree = sum(legacy_detect_language(q) == detect_language(q) for q in QUERIES)
+    print(f"legacy detect_language: {legacy:10.1f} us/call")
+    print(f"new, cold cache:        {cold:10.1f} us/call ({legacy / cold:.0f}x)")
+    print(f"new, warm cache:        {warm:10.1f} us/call ({legacy / warm:.0f}x)")
+    print(f"agreement with legacy:  {agree}/{len(QUERIES)}")
+    for query in QUERIES:
+        old, new = legacy_detect_language(query), detect_language(query)
+        if old != new:
+            print(f"  {query!r}: legacy={old} new={new}")
+
+
+if __name__ == "__main__":
+    main()
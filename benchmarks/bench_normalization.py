@@ -0,0 +1,60 @@
+"""
+Corpus cleaning: the old row-wise `DataFrame.apply` against `clean_series`.
+
+    python -m benchmarks.bench_normalization --data data/processed_medquad_qa.parquet
+
+Checks that batch and per-query cleaning give identical output on every row,
+then reports the build-time speed-up.
+"""
+import argparse
+import re
+import time
+
+import pandas as pd
+
+from src.text_normalization import clean_series, clean_text
+
+
+def legacy_clean_text(text, lang='en'):
+    """`MedicalQARetrievalModel._clean_text` before the shared module."""
+    if not isinstance(text, str):
+        return ""
+    text = text.lower()
+    if lang == 'hi':
+        text = re.sub(r'[^ऀ-ॿ\s.]', '', text)
+    else:
+        text = re.sub(r'[^A-zÀ-ſ\s.]', '', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default="data/processed_medquad_qa.parquet")
+    parser.add_argument("--repeat", type=int, default=1, help="Concatenate the corpus this many times")
+    args = parser.parse_args(argv)
+
+    df = pd.read_parquet(args.data) if args.data.endswith('.parquet') else pd.read_csv(args.data)
+    if 'lang' not in df.columns:
+        df['lang'] = 'en'
+    df = pd.concat([df] * args.repeat, ignore_index=True)
+
+    legacy, legacy_time = timed(lambda: df.apply(lambda row: legacy_clean_text(row['question'], row['lang']), axis=1))
+    batch, batch_time = timed(lambda: clean_series(df['question'], df['lang']))
+    per_query = [clean_text(q, lang) for q, lang in zip(df['question'], df['lang'])]
+
+    mismatches = sum(a != b for a, b in zip(legacy.tolist(), batch.tolist()))
+    mismatches += sum(a != b for a, b in zip(per_query, batch.tolist()))
+    print(f"{len(df)} questions, {mismatches} mismatches between legacy, batch and per-query cleaning")
+    print(f"legacy apply: {legacy_time:.3f}s  clean_series: {batch_time:.3f}s  ({legacy_time / batch_time:.1f}x)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
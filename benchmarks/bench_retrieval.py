@@ -0,0 +1,305 @@
+"""
+Retrieval benchmark and regression suite for `MedicalQARetrievalModel`.
+
+    python -m benchmarks.bench_retrieval --pairs 15000 --out results/main.json
+    python -m benchmarks.bench_retrieval --pairs 15000 --out results/branch.json --baseline results/main.json
+
+1. Generate the synthetic corpus (`benchmarks.synthetic_corpus`) and the
+   four-language query set (`benchmarks.query_sets`). Pass --queries to replay
+   a saved query set instead.
+2. Build phase, in a fresh process: fit the model and save the index, with
+   near-duplicate questions collapsed if --dedup is given. Reports the build
+   time, peak RSS, and the index's rows and size on disk.
+3. Serve phase, in another fresh process:
+   - Load the index. Reports startup time (imports included) and index load time.
+   - Answer every query with `get_answer`, one at a time. Reports p50/p99 latency
+     overall and per language.
+   - Replay the whole set through `get_answers` at each --batch-sizes. Reports
+     queries per second.
+   - Reports peak RSS and each query's top-1 answer.
+   All translation goes through `StubTranslator`, with the configured latency,
+   so runs are offline and repeatable.
+
+Quality is top-1 accuracy against the query set's expected answers. With
+--baseline it is also top-1 agreement with that earlier run, and a table of
+deltas is printed. Everything, including the per-query top-1s, is saved to
+--out as JSON, so results can be attached to a review.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.query_sets import answer_digest, load_query_set, make_query_set, save_query_set
+from benchmarks.stub_translator import StubTranslator
+from benchmarks.synthetic_corpus import generate_corpus, write_corpus
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _percentiles(latencies):
+    if not latencies:
+        return {}
+    p50, p99 = np.percentile(latencies, [50, 99])
+    return {'p50': float(p50), 'p99': float(p99), 'mean': float(np.mean(latencies)), 'n': len(latencies)}
+
+
+def _directory_mb(path):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names) / 2 ** 20
+
+
+def _build_phase(data_path, index_dir, engine, dedup_threshold=None):
+    from src.retrieval_model import MedicalQARetrievalModel
+
+    start = time.perf_counter()
+    model = MedicalQARetrievalModel(data_path=data_path, engine=engine, dedup_threshold=dedup_threshold)
+    model.save_index(index_dir)
+    if engine in ('dense', 'hybrid'):
+        from src.dense_index import build_dense_index
+        build_dense_index(index_dir)
+    return {'build_s': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb(),
+            'index_rows': int(model.question_vector.shape[0]), 'index_nnz': int(model.question_vector.nnz),
+            'index_mb': _directory_mb(index_dir)}
+
+
+def _open_model(index_dir, config, translator, scratch):
+    from src.answer_translations import AnswerTranslationStore
+    from src.retrieval_model import MedicalQARetrievalModel
+    from src.translation import TranslationCache
+
+    # Memory-only translation cache and an empty answer store: every run pays the same translation cost.
+    start = time.perf_counter()
+    model = MedicalQARetrievalModel.load_index(
+        index_dir, engine=config['engine'], nprobe=config['nprobe'], shards=config['shards'],
+        translator=translator, translation_cache=TranslationCache(path=None),
+        answer_translations=AnswerTranslationStore(os.path.join(scratch, "answers.sqlite")),
+    )
+    return model, time.perf_counter() - start
+
+
+def _serve_phase(index_dir, records, config):
+    from src.translation import TranslationCache
+
+    translator = StubTranslator(records, config['translator_latency_ms'], config['translator_jitter_ms'])
+    with tempfile.TemporaryDirectory() as scratch:
+        start = time.perf_counter()
+        model, load_s = _open_model(index_dir, config, translator, scratch)
+        startup_s = time.perf_counter() - start
+
+        # Lazy per-process work (e.g. the BM25 index) is paid here, not by the first measured query.
+        start = time.perf_counter()
+        model.get_answer(records[0]['query'])
+        first_query_s = time.perf_counter() - start
+        model.translation_cache = TranslationCache(path=None)
+
+        latencies = {lang: [] for lang in sorted({record['lang'] for record in records})}
+        top1 = {}
+        for record in records:
+            start = time.perf_counter()
+            results, _ = model.get_answer(record['query'])
+            latencies[record['lang']].append((time.perf_counter() - start) * 1000)
+            top1[record['id']] = [answer_digest(results[0]['answer']), results[0]['similarity_score']]
+
+        throughput = {}
+        queries = [record['query'] for record in records]
+        for batch_size in config['batch_sizes']:
+            model.translation_cache = TranslationCache(path=None)
+            start = time.perf_counter()
+            for i in range(0, len(queries), batch_size):
+                model.get_answers(queries[i:i + batch_size])
+            throughput[str(batch_size)] = len(queries) / (time.perf_counter() - start)
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        'startup_s': startup_s,
+        'index_load_s': load_s,
+        'first_query_s': first_query_s,
+        'latency_ms': {'all': _percentiles(all_latencies),
+                       **{lang: _percentiles(values) for lang, values in latencies.items()}},
+        'throughput_qps': throughput,
+        'peak_rss_mb': peak_rss_mb(),
+        'translator_calls': translator.calls,
+        'top1': top1,
+    }
+
+
+def _in_fresh_process(fn, *args):
+    # Spawned, not forked, so peak RSS covers only this phase.
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def _quality(records, top1, baseline=None):
+    by_lang = {}
+    for record in records:
+        correct = top1[record['id']][0] in record['expected_answers']
+        by_lang.setdefault(record['lang'], []).append(correct)
+    quality = {
+        'top1_accuracy': float(np.mean([c for values in by_lang.values() for c in values])),
+        'top1_accuracy_by_lang': {lang: float(np.mean(values)) for lang, values in sorted(by_lang.items())},
+    }
+    if baseline is not None:
+        common = [query_id for query_id in top1 if query_id in baseline['top1']]
+        same = [query_id for query_id in common if top1[query_id][0] == baseline['top1'][query_id][0]]
+        quality['top1_agreement'] = len(same) / len(common) if common else None
+        quality['disagreements'] = sorted(set(common) - set(same))[:20]
+    return quality
+
+
+def _git_revision():
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        revision = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return revision + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+COMPARED = [
+    ("build time (s)", ('build', 'build_s')),
+    ("index rows", ('build', 'index_rows')),
+    ("index size (MB)", ('build', 'index_mb')),
+    ("startup (s)", ('serve', 'startup_s')),
+    ("index load (s)", ('serve', 'index_load_s')),
+    ("p50 latency (ms)", ('serve', 'latency_ms', 'all', 'p50')),
+    ("p99 latency (ms)", ('serve', 'latency_ms', 'all', 'p99')),
+    ("serve peak RSS (MB)", ('serve', 'peak_rss_mb')),
+    ("top-1 accuracy", ('quality', 'top1_accuracy')),
+]
+
+
+def _lookup(results, path):
+    for key in path:
+        if not isinstance(results, dict) or key not in results:
+            return None
+        results = results[key]
+    return results
+
+
+def print_summary(results, baseline=None):
+    rows = COMPARED + [(f"throughput @{size} (q/s)", ('serve', 'throughput_qps', size))
+                       for size in results['serve']['throughput_qps']]
+    print(f"{'metric':<24}{'current':>12}" + (f"{'baseline':>12}{'change':>10}" if baseline else ""))
+    for label, path in rows:
+        current = _lookup(results, path)
+        line = f"{label:<24}{current:>12.4g}"
+        if baseline:
+            previous = _lookup(baseline, path)
+            if previous is not None:
+                change = f"{(current - previous) / previous * 100:+.1f}%" if previous else "n/a"
+                line += f"{previous:>12.4g}{change:>10}"
+        print(line)
+    if 'top1_agreement' in results['quality']:
+        print(f"{'top-1 agreement':<24}{results['quality']['top1_agreement']:>12.4g}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark retrieval latency, throughput and quality.")
+    parser.add_argument("--pairs", type=int, default=15000, help="Synthetic corpus size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--per-lang", type=int, default=250, help="Queries per language")
+    parser.add_argument("--queries", help="Replay a saved query set (JSON lines) instead of generating one")
+    parser.add_argument("--data", help="Benchmark this corpus file instead of generating one (needs --queries)")
+    parser.add_argument("--engine", choices=['tfidf', 'bm25', 'dense', 'hybrid'], default='tfidf')
+    parser.add_argument("--nprobe", type=int, help="IVF lists scanned per query by the dense engines")
+    parser.add_argument("--shards", type=int, default=1, help="Score TF-IDF over this many processes")
+    parser.add_argument("--dedup", type=float, metavar="THRESHOLD",
+                        help="Collapse near-duplicate questions at build time (see src/dedup.py)")
+    parser.add_argument("--translator-latency-ms", type=float, default=20.0)
+    parser.add_argument("--translator-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64])
+    parser.add_argument("--workdir", help="Keep the corpus, query set and index here (default: a temp dir)")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    parser.add_argument("--out", required=True, help="Results JSON")
+    args = parser.parse_args(argv)
+    if args.data and not args.queries:
+        parser.error("--data needs --queries: expected answers come from the query set")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        os.makedirs(workdir, exist_ok=True)
+
+        data_path = args.data
+        if args.queries:
+            records = load_query_set(args.queries)
+        if not data_path:
+            data_path = os.path.join(workdir, f"corpus_{args.pairs}_{args.seed}.parquet")
+            if os.path.exists(data_path):
+                corpus = pd.read_parquet(data_path)
+            else:
+                corpus = generate_corpus(args.pairs, args.seed)
+                write_corpus(corpus, data_path)
+            if not args.queries:
+                records = make_query_set(corpus, args.per_lang, args.seed)
+                save_query_set(records, os.path.join(workdir, "queries.jsonl"))
+            del corpus
+
+        config = {
+            'pairs': args.pairs if not args.data else None,
+            'data': args.data,
+            'seed': args.seed,
+            'queries': args.queries,
+            'n_queries': len(records),
+            'engine': args.engine,
+            'nprobe': args.nprobe,
+            'shards': args.shards,
+            'dedup_threshold': args.dedup,
+            'translator_latency_ms': args.translator_latency_ms,
+            'translator_jitter_ms': args.translator_jitter_ms,
+            'batch_sizes': args.batch_sizes,
+        }
+        index_dir = os.path.join(workdir, "index")
+        print(f"Building index for {data_path}...")
+        build = _in_fresh_process(_build_phase, data_path, index_dir, args.engine, args.dedup)
+        print(f"Serving {len(records)} queries...")
+        serve = _in_fresh_process(_serve_phase, index_dir, records, config)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    top1 = serve.pop('top1')
+    results = {
+        'meta': {
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'baseline': args.baseline,
+        },
+        'config': config,
+        'build': build,
+        'serve': serve,
+        'quality': _quality(records, top1, baseline),
+        'top1': top1,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+    print_summary(results, baseline)
+    print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
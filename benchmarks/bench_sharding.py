@@ -0,0 +1,100 @@
+"""
+Sharded TF-IDF scoring: throughput at several shard counts, checked against the
+single-process path.
+
+    python -m benchmarks.bench_sharding --pairs 500000 --shards 1 2 4 8 --batch-size 64
+
+Builds (or reuses, with --workdir) an index of a synthetic corpus
+(`benchmarks.synthetic_corpus`), then scores the English form of a query set
+(`benchmarks.query_sets`) in batches of --batch-size. For each shard count it
+reports:
+
+    q/s             queries scored per second (vectorising included)
+    p50/p99 ms      per-batch latency
+    private MB      memory the shard workers hold privately (Linux only; the
+                    index itself is shared through the page cache, so this
+                    stays small whatever the corpus size)
+    identical       every batch returns the same rows and scores as 1 shard
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.query_sets import make_query_set
+from benchmarks.synthetic_corpus import generate_corpus, write_corpus
+from src.retrieval_model import MedicalQARetrievalModel
+
+
+def _private_mb(pids):
+    """Private (unshared) memory of processes, from /proc; None where that is not available."""
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup", 'r') as f:
+                total += sum(int(line.split()[1]) for line in f if line.startswith(("Private_Clean", "Private_Dirty")))
+        except OSError:
+            return None
+    return total / 1024
+
+
+def _run(model, batches, top_k):
+    latencies, results = [], []
+    start = time.perf_counter()
+    for batch in batches:
+        batch_start = time.perf_counter()
+        results.extend(model._score_queries(batch, top_k))
+        latencies.append((time.perf_counter() - batch_start) * 1000)
+    return results, sum(len(batch) for batch in batches) / (time.perf_counter() - start), latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput of sharded TF-IDF scoring against one process.")
+    parser.add_argument("--pairs", type=int, default=200000, help="Synthetic corpus size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--per-lang", type=int, default=250, help="Queries per language (English form is used)")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--workdir", help="Keep the corpus and index here (default: a temp dir)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        os.makedirs(workdir, exist_ok=True)
+        corpus = generate_corpus(args.pairs, args.seed)
+        index_dir = os.path.join(workdir, f"index_{args.pairs}_{args.seed}")
+        if not os.path.exists(index_dir):
+            data_path = write_corpus(corpus, os.path.join(workdir, f"corpus_{args.pairs}_{args.seed}.parquet"))
+            MedicalQARetrievalModel(data_path=data_path).save_index(index_dir)
+        records = make_query_set(corpus, args.per_lang, args.seed)
+        del corpus
+
+        reference = None
+        print(f"{args.pairs} pairs, {len(records)} queries in batches of {args.batch_size}")
+        print(f"{'shards':>8}{'q/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'private MB':>12}{'identical':>11}")
+        for shards in args.shards:
+            model = MedicalQARetrievalModel.load_index(index_dir, shards=shards)
+            cleaned = [model._clean_text(record['english']) for record in records]
+            batches = [cleaned[i:i + args.batch_size] for i in range(0, len(cleaned), args.batch_size)]
+            _run(model, batches[:1], args.top_k)  # warm the page cache and the workers
+            results, throughput, latencies = _run(model, batches, args.top_k)
+
+            if reference is None:
+                reference = results
+            identical = all(np.array_equal(a[0], b[0]) and np.array_equal(a[1], b[1])
+                            for a, b in zip(results, reference))
+            private = None
+            if model.sharded_search is not None:
+                private = _private_mb([process.pid for process in model.sharded_search._pool._processes.values()])
+                model.sharded_search.close()
+            p50, p99 = np.percentile(latencies, [50, 99])
+            private = f"{private:.1f}" if private is not None else "-"
+            print(f"{shards:>8}{throughput:>10.0f}{p50:>10.2f}{p99:>10.2f}{private:>12}{str(identical):>11}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
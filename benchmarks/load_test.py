@@ -0,0 +1,113 @@
+"""
+Closed-loop load test for `src.server`.
+
+    python -m src.server --index model/index --workers 2 --translator stub &
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --concurrency 64 --requests 2000
+
+Each of `--concurrency` clients keeps one keep-alive connection open and sends
+its next request as soon as the previous answer arrives. The script reports
+throughput, latency percentiles of successful requests, and how many requests
+were rejected by backpressure (503) or failed. Run the server with
+`--translator stub` so that non-English queries pay a fixed, local translation
+latency instead of Google Translate's.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+DEFAULT_QUERIES = [
+    "what are symptoms of diabetes",
+    "how is high blood pressure treated",
+    "what causes asthma",
+    "cuáles son los síntomas de la diabetes",
+    "मधुमेह के लक्षण क्या हैं",
+    "quels sont les symptômes du diabète",
+]
+
+
+async def _request(reader, writer, host, body):
+    writer.write(
+        f"POST /answer HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def _client(url, queries, remaining, latencies, statuses, top_k):
+    reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+    try:
+        while next(remaining, None) is not None:
+            body = json.dumps({'query': next(queries), 'top_k': top_k}).encode('utf-8')
+            start = time.perf_counter()
+            try:
+                status = await _request(reader, writer, url.netloc, body)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                statuses['error'] = statuses.get('error', 0) + 1
+                writer.close()
+                reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+                continue
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def run_load_test(url, queries, requests=1000, concurrency=32, top_k=1):
+    url = urlparse(url)
+    queries = itertools.cycle(queries)
+    remaining = iter(range(requests))
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(url, queries, remaining, latencies, statuses, top_k) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    report = {
+        'requests': requests,
+        'concurrency': concurrency,
+        'elapsed_s': elapsed,
+        'throughput_rps': requests / elapsed,
+        'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+    }
+    if latencies:
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+        report.update(p50_ms=p50, p90_ms=p90, p99_ms=p99, max_ms=max(latencies) * 1000)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the medical Q&A JSON API.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=1)
+    parser.add_argument("--queries", help="File with one query per line (default: a small built-in mix)")
+    args = parser.parse_args(argv)
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, 'r', encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    report = asyncio.run(run_load_test(args.url, queries, args.requests, args.concurrency, args.top_k))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
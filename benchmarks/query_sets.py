@@ -0,0 +1,117 @@
+"""
+Replayable benchmark queries in all four supported languages.
+
+    python -m benchmarks.query_sets --pairs 15000 --per-lang 250 --out /tmp/queries.jsonl
+
+Queries are drawn from a synthetic corpus (`benchmarks.synthetic_corpus`) with
+a fixed seed. Each one asks about a row's focus and question type, in a
+paraphrase rather than the corpus wording. Every record carries:
+
+    id, lang, query         what is sent to the model
+    english                 what a translator would turn the query into
+    expected_answers        SHA-1s of the answers that count as correct (the row
+                            and any duplicates of its question)
+
+Saved as JSON lines, so the exact same queries can be replayed against another
+build.
+"""
+import argparse
+import hashlib
+import json
+import random
+
+from benchmarks.synthetic_corpus import QUESTION_TYPES, generate_corpus
+
+LANGUAGES = ['en', 'es', 'hi', 'fr']
+
+# qtype -> {lang: paraphrase}; 'en' is also what the stub translator returns for the others.
+PARAPHRASES = {
+    'information': {'en': "what is {focus}", 'es': "¿Qué es {focus}?",
+                    'fr': "Qu'est-ce que {focus} ?", 'hi': "{focus} क्या है?"},
+    'symptoms': {'en': "what symptoms does {focus} have", 'es': "¿Cuáles son los síntomas de {focus}?",
+                 'fr': "Quels sont les symptômes de {focus} ?", 'hi': "{focus} के लक्षण क्या हैं?"},
+    'causes': {'en': "what is the cause of {focus}", 'es': "¿Qué causa {focus}?",
+               'fr': "Qu'est-ce qui cause {focus} ?", 'hi': "{focus} का कारण क्या है?"},
+    'susceptibility': {'en': "who is at risk of getting {focus}", 'es': "¿Quién está en riesgo de {focus}?",
+                       'fr': "Qui est à risque de {focus} ?", 'hi': "{focus} का खतरा किसे है?"},
+    'exams and tests': {'en': "how do doctors diagnose {focus}", 'es': "¿Cómo se diagnostica {focus}?",
+                        'fr': "Comment diagnostiquer {focus} ?", 'hi': "{focus} का निदान कैसे होता है?"},
+    'treatment': {'en': "what treatments are there for {focus}", 'es': "¿Cuál es el tratamiento para {focus}?",
+                  'fr': "Quel est le traitement de {focus} ?", 'hi': "{focus} का उपचार क्या है?"},
+    'prevention': {'en': "how can I prevent {focus}", 'es': "¿Cómo prevenir {focus}?",
+                   'fr': "Comment prévenir {focus} ?", 'hi': "{focus} से कैसे बचें?"},
+    'outlook': {'en': "what is the outlook for people with {focus}", 'es': "¿Cuál es el pronóstico de {focus}?",
+                'fr': "Quel est le pronostic de {focus} ?", 'hi': "{focus} का पूर्वानुमान क्या है?"},
+    'inheritance': {'en': "can {focus} be inherited", 'es': "¿Es {focus} hereditaria?",
+                    'fr': "{focus} est-elle héréditaire ?", 'hi': "क्या {focus} वंशानुगत है?"},
+    'frequency': {'en': "how many people are affected by {focus}", 'es': "¿Cuántas personas tienen {focus}?",
+                  'fr': "Combien de personnes sont atteintes de {focus} ?", 'hi': "{focus} से कितने लोग प्रभावित हैं?"},
+    'genetic changes': {'en': "what genetic changes are related to {focus}",
+                        'es': "¿Qué cambios genéticos están relacionados con {focus}?",
+                        'fr': "Quels changements génétiques sont liés à {focus} ?",
+                        'hi': "{focus} से जुड़े आनुवंशिक परिवर्तन क्या हैं?"},
+    'complications': {'en': "what complications can {focus} cause", 'es': "¿Cuáles son las complicaciones de {focus}?",
+                      'fr': "Quelles sont les complications de {focus} ?", 'hi': "{focus} की जटिलताएं क्या हैं?"},
+    'research': {'en': "what clinical trials are being done for {focus}",
+                 'es': "¿Qué investigaciones se hacen sobre {focus}?",
+                 'fr': "Quelles recherches sont menées sur {focus} ?", 'hi': "{focus} पर क्या शोध हो रहा है?"},
+    'stages': {'en': "what are the stages of {focus}", 'es': "¿Cuáles son las etapas de {focus}?",
+               'fr': "Quels sont les stades de {focus} ?", 'hi': "{focus} के चरण क्या हैं?"},
+    'considerations': {'en': "what to do for {focus}", 'es': "¿Qué hacer en caso de {focus}?",
+                       'fr': "Que faire en cas de {focus} ?", 'hi': "{focus} के लिए क्या करें?"},
+}
+assert set(PARAPHRASES) == set(QUESTION_TYPES)
+
+
+def answer_digest(answer):
+    return hashlib.sha1(answer.encode('utf-8')).hexdigest()
+
+
+def make_query_set(corpus, per_lang=250, seed=0):
+    """`per_lang` queries per language, each aimed at a random corpus row."""
+    rng = random.Random(seed)
+    acceptable = {}
+    for question, answer in zip(corpus['question'], corpus['answer']):
+        acceptable.setdefault(question, set()).add(answer_digest(answer))
+
+    records = []
+    for lang in LANGUAGES:
+        for row in rng.sample(range(len(corpus)), per_lang):
+            focus, qtype = corpus['focus'].iloc[row], corpus['qtype'].iloc[row]
+            records.append({
+                'id': f"{lang}-{len(records):05d}",
+                'lang': lang,
+                'query': PARAPHRASES[qtype][lang].format(focus=focus),
+                'english': PARAPHRASES[qtype]['en'].format(focus=focus),
+                'expected_answers': sorted(acceptable[corpus['question'].iloc[row]]),
+            })
+    return records
+
+
+def save_query_set(records, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def load_query_set(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a replayable multilingual query set.")
+    parser.add_argument("--pairs", type=int, default=15000, help="Size of the synthetic corpus to draw from")
+    parser.add_argument("--corpus-seed", type=int, default=0)
+    parser.add_argument("--per-lang", type=int, default=250)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args(argv)
+
+    records = make_query_set(generate_corpus(args.pairs, args.corpus_seed), args.per_lang, args.seed)
+    save_query_set(records, args.out)
+    print(f"{len(records)} queries written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
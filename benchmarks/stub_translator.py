@@ -0,0 +1,11 @@
+"""
+Offline stand-in for `google_translate` with configurable latency.
+
+Benchmarks plug it in as the model's `translator`, so runs need no network and
+translation costs the same every time. The class lives in `src/translation.py`
+so the server's `--translator stub` does not depend on this package; it is
+re-exported here for the benchmarks.
+"""
+from src.translation import StubTranslator
+
+__all__ = ['StubTranslator']
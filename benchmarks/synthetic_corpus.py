@@ -0,0 +1,146 @@
+"""
+Synthetic MedQuAD-shaped corpus for benchmarks at any scale.
+
+    python -m benchmarks.synthetic_corpus --pairs 1000000 --out /tmp/medquad_1m.parquet
+
+Each row has the columns `src.data_loaders` produces (question, answer,
+source_file), plus MedQuAD's `focus` (the disease) and `qtype` (the question
+type). Every focus gets a random subset of the MedQuAD question types, worded
+with MedQuAD's own templates. Answers are a few to a few dozen sentences drawn
+from a medical sentence bank, so their lengths vary like the real ones do.
+
+Focus names are built from syllables and a medical suffix, using letters only
+(the cleaners drop digits). There are enough for 10M+ pairs, and each name is
+unique. A small share of rows repeat an earlier question with a lightly edited
+answer, the way MedQuAD repeats topics across sources. The output depends only
+on (pairs, seed).
+"""
+import argparse
+import random
+
+import pandas as pd
+
+# qtype -> MedQuAD question template.
+QUESTION_TYPES = {
+    'information': "What is (are) {focus} ?",
+    'symptoms': "What are the symptoms of {focus} ?",
+    'causes': "What causes {focus} ?",
+    'susceptibility': "Who is at risk for {focus}? ",
+    'exams and tests': "How to diagnose {focus} ?",
+    'treatment': "What are the treatments for {focus} ?",
+    'prevention': "How to prevent {focus} ?",
+    'outlook': "What is the outlook for {focus} ?",
+    'inheritance': "Is {focus} inherited ?",
+    'frequency': "How many people are affected by {focus} ?",
+    'genetic changes': "What are the genetic changes related to {focus} ?",
+    'complications': "What are the complications of {focus} ?",
+    'research': "What research (or clinical trials) is being done for {focus} ?",
+    'stages': "What are the stages of {focus} ?",
+    'considerations': "What to do for {focus} ?",
+}
+
+SOURCES = ['1_CancerGov_QA', '2_GARD_QA', '3_GHR_QA', '4_MPlus_Health_Topics_QA', '5_NIDDK_QA',
+           '6_NINDS_QA', '7_SeniorHealth_QA', '8_NHLBI_QA_XML', '9_CDC_QA']
+
+_SYLLABLES = [c + v for c in "bcdfghklmnprstvz" for v in "aeiou"]
+_SUFFIXES = ['itis', 'osis', 'emia', 'oma', 'pathy', 'algia', ' syndrome', ' disease']
+
+_WORDS = ("blood heart lung kidney liver brain nerve muscle bone skin joint immune cell tissue gene protein "
+          "hormone insulin infection inflammation fever pain fatigue swelling rash cough headache nausea "
+          "therapy surgery medication vaccine screening biopsy scan diet exercise sleep stress weight "
+          "children adults women men elderly patients families doctors nurses specialists").split()
+
+_SENTENCES = [
+    "{Focus} is a condition that affects the {w1} and the {w2}.",
+    "People with {focus} may notice {w1} and {w2} that comes and goes.",
+    "The exact cause of {focus} is not fully understood, but {w1} and {w2} appear to play a role.",
+    "Doctors diagnose {focus} with a physical exam, a review of symptoms, and tests of the {w1}.",
+    "Treatment for {focus} depends on the {w1} involved and may include {w2}.",
+    "Some cases of {focus} run in families because of changes in a {w1} gene.",
+    "{Focus} is more common in {w1} than in {w2}.",
+    "Complications of {focus} can involve the {w1} if the condition is not treated.",
+    "Researchers are studying how {w1} and {w2} influence {focus}.",
+    "Keeping track of {w1} and {w2} can help people manage {focus}.",
+    "Your doctor may refer you to specialists in {w1} care.",
+    "Regular {w1} and attention to {w2} lower the risk of problems.",
+    "Symptoms such as {w1} or {w2} should be discussed with a doctor.",
+    "There is no single test for {focus}; several exams of the {w1} may be needed.",
+    "Clinical trials are testing new {w1} options for {focus}.",
+]
+
+
+def focus_name(index):
+    """The `index`-th focus name; distinct for every index below 80**3 * 8."""
+    # Spread consecutive indexes over the name space so neighbours look unrelated.
+    index = (index * 7919) % (len(_SYLLABLES) ** 3 * len(_SUFFIXES))
+    index, suffix = divmod(index, len(_SUFFIXES))
+    index, third = divmod(index, len(_SYLLABLES))
+    first, second = divmod(index, len(_SYLLABLES))
+    return _SYLLABLES[first] + _SYLLABLES[second] + _SYLLABLES[third] + _SUFFIXES[suffix]
+
+
+def _answer(rng, focus, qtype):
+    sentences = [rng.choice(_SENTENCES) for _ in range(max(2, int(rng.lognormvariate(2.0, 0.7))))]
+    words = [rng.choice(_WORDS) for _ in range(2 * len(sentences))]
+    body = " ".join(
+        sentence.format(focus=focus, Focus=focus.capitalize(), w1=words[2 * i], w2=words[2 * i + 1])
+        for i, sentence in enumerate(sentences)
+    )
+    return f"{focus.capitalize()} ({qtype}): {body}"
+
+
+def generate_corpus(pairs, seed=0, duplicate_rate=0.03):
+    """DataFrame of `pairs` rows: question, answer, source_file, focus, qtype."""
+    rng = random.Random(seed)
+    qtypes = list(QUESTION_TYPES)
+    rows = {'question': [], 'answer': [], 'source_file': [], 'focus': [], 'qtype': []}
+    focus_index = 0
+    while len(rows['question']) < pairs:
+        focus = focus_name(focus_index)
+        source = rng.choice(SOURCES)
+        for qtype in rng.sample(qtypes, rng.randint(4, len(qtypes))):
+            if len(rows['question']) >= pairs:
+                break
+            if rows['question'] and rng.random() < duplicate_rate:
+                # Repeat an earlier question from another source, answer lightly edited.
+                other = rng.randrange(len(rows['question']))
+                question, answer = rows['question'][other], rows['answer'][other]
+                answer = answer + " " + rng.choice(_SENTENCES).format(
+                    focus=rows['focus'][other], Focus=rows['focus'][other].capitalize(),
+                    w1=rng.choice(_WORDS), w2=rng.choice(_WORDS))
+                focus_of, qtype_of = rows['focus'][other], rows['qtype'][other]
+            else:
+                question, answer = QUESTION_TYPES[qtype].format(focus=focus), _answer(rng, focus, qtype)
+                focus_of, qtype_of = focus, qtype
+            rows['question'].append(question)
+            rows['answer'].append(answer)
+            rows['source_file'].append(f"{source}/{focus_index:07d}.xml")
+            rows['focus'].append(focus_of)
+            rows['qtype'].append(qtype_of)
+        focus_index += 1
+    return pd.DataFrame(rows)
+
+
+def write_corpus(df, path):
+    if path.endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic MedQuAD-shaped Q&A corpus.")
+    parser.add_argument("--pairs", type=int, default=15000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--duplicate-rate", type=float, default=0.03)
+    parser.add_argument("--out", required=True, help="Output .csv or .parquet")
+    args = parser.parse_args(argv)
+
+    df = generate_corpus(args.pairs, args.seed, args.duplicate_rate)
+    write_corpus(df, args.out)
+    print(f"{len(df)} pairs ({df['focus'].nunique()} foci) written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
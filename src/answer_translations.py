@@ -0,0 +1,152 @@
+"""
+Offline pre-translated answers.
+
+A batch job translates every distinct corpus answer into each non-English
+language in `SUPPORTED_LANGUAGES` and stores the result in a SQLite file keyed by
+(lang, sha256 of the answer). `get_answer` looks answers up here first and only
+falls back to live translation for entries that are missing.
+
+The job is idempotent and resumable: entries already in the store are skipped,
+results are flushed in small batches as they complete, and answers whose
+translation was incomplete are left out so a later run retries them.
+
+    python -m src.answer_translations --index model/index --workers 8
+"""
+import argparse
+import hashlib
+import logging
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.language_detection import SUPPORTED_LANGUAGES
+from src.metrics import configure_logging
+from src.translation import ChunkedTranslator, connect_sqlite, google_translate, normalize_for_key, pack_chunks
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = os.path.join("model", "answer_translations.sqlite")
+TARGET_LANGUAGES = [lang for lang in SUPPORTED_LANGUAGES if lang != 'en']
+
+
+def answer_key(answer):
+    return hashlib.sha256(normalize_for_key(answer).encode('utf-8')).hexdigest()
+
+
+class AnswerTranslationStore:
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " lang TEXT NOT NULL, key TEXT NOT NULL, translation BLOB NOT NULL,"
+            " PRIMARY KEY (lang, key)) WITHOUT ROWID"
+        )
+
+    @classmethod
+    def open_default(cls):
+        """The prebuilt store if the batch job has been run, otherwise None."""
+        return cls(DEFAULT_STORE_PATH) if os.path.exists(DEFAULT_STORE_PATH) else None
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect_sqlite(self.path)
+        return conn
+
+    def get(self, lang, answer):
+        row = self._connection().execute(
+            "SELECT translation FROM answers WHERE lang = ? AND key = ?", (lang, answer_key(answer))
+        ).fetchone()
+        return zlib.decompress(row[0]).decode('utf-8') if row else None
+
+    def keys(self, lang):
+        return {row[0] for row in self._connection().execute("SELECT key FROM answers WHERE lang = ?", (lang,))}
+
+    def put_many(self, entries):
+        """Insert (lang, key, translation) tuples; existing entries are left untouched."""
+        if not entries:
+            return
+        conn = self._connection()
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT OR IGNORE INTO answers (lang, key, translation) VALUES (?, ?, ?)",
+            [(lang, key, zlib.compress(text.encode('utf-8'))) for lang, key, text in entries]
+        )
+        conn.execute("COMMIT")
+
+    def count(self, lang=None):
+        if lang is None:
+            return self._connection().execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        return self._connection().execute("SELECT COUNT(*) FROM answers WHERE lang = ?", (lang,)).fetchone()[0]
+
+
+def build_answer_translations(answers, store, languages=TARGET_LANGUAGES, translator=google_translate,
+                              workers=8, flush_every=50):
+    """Translate every distinct answer missing from `store`. Returns the number of failures."""
+    unique = {}
+    for answer in answers:
+        if isinstance(answer, str) and answer.strip():
+            unique.setdefault(answer_key(answer), answer)
+
+    # Every outer worker may have all of its answer's chunks in flight at once; a smaller
+    # chunk pool would queue them past the translator's round timeout and fail them.
+    max_chunks = max((len(pack_chunks(answer)) for answer in unique.values()), default=1)
+    chunked = ChunkedTranslator(translator, max_workers=workers * max_chunks)
+    failures = 0
+    try:
+        for lang in languages:
+            done = store.keys(lang)
+            todo = [(key, answer) for key, answer in unique.items() if key not in done]
+            logger.info("[%s] %d of %d answers already translated", lang, len(unique) - len(todo), len(unique))
+
+            start, batch = time.perf_counter(), []
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(chunked.translate, answer, 'en', lang): key for key, answer in todo}
+                for completed, future in enumerate(as_completed(futures), 1):
+                    try:
+                        translation, failed_chunks = future.result()
+                    except Exception as e:
+                        logger.warning("[%s] Translation failed: %s", lang, e)
+                        failures += 1
+                        continue
+                    if failed_chunks:
+                        failures += 1
+                        continue
+                    batch.append((lang, futures[future], translation))
+                    if len(batch) >= flush_every:
+                        store.put_many(batch)
+                        batch = []
+                        logger.info("[%s] %d/%d (%.1fs)", lang, completed, len(todo), time.perf_counter() - start)
+            store.put_many(batch)
+    finally:
+        chunked.shutdown()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-translate corpus answers for every supported language.")
+    parser.add_argument("--index", default="model/index", help="Index directory built by src.index_store")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH)
+    parser.add_argument("--langs", nargs="+", default=TARGET_LANGUAGES, choices=TARGET_LANGUAGES)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    from src.index_store import load_index
+
+    answers = load_index(args.index)['answers']
+    store = AnswerTranslationStore(args.store)
+    failures = build_answer_translations(answers, store, args.langs, workers=args.workers)
+    for lang in args.langs:
+        print(f"[{lang}] {store.count(lang)} answers stored")
+    if failures:
+        print(f"{failures} answers could not be translated; re-run to retry them.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
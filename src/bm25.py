@@ -0,0 +1,141 @@
+"""
+BM25 scorer over an inverted index of the cleaned questions.
+
+Posting lists live in three flat numpy arrays: `term_offsets` (where each term's
+list starts), `doc_ids` (sorted int32 document ids) and `impacts` (the
+precomputed float32 BM25 contribution of the term to that document). A query is
+scored term-at-a-time with MaxScore pruning: terms are visited from the highest
+upper bound down, and once the sum of the remaining upper bounds can no longer
+beat the current k-th best score, the remaining terms only update documents
+already in the candidate set. Query cost therefore follows the posting lists
+that are actually touched, not the corpus size.
+"""
+import time
+
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+
+from src.ranking import top_k_scores
+
+
+class BM25Index:
+    def __init__(self, documents, k1=1.2, b=0.75, stop_words='english'):
+        self.k1 = k1
+        self.b = b
+        counter = CountVectorizer(stop_words=stop_words)
+        counts = counter.fit_transform(documents).tocsc().astype(np.float32)
+        self.vocabulary = counter.vocabulary_
+        self.analyzer = counter.build_analyzer()
+
+        n_docs = counts.shape[0]
+        doc_len = np.asarray(counts.sum(axis=1)).ravel()
+        avg_len = doc_len.mean() if n_docs and doc_len.mean() > 0 else 1.0
+        df = np.diff(counts.indptr)
+        # Lucene-style IDF, never negative, so partial scores are lower bounds.
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        self.n_docs = n_docs
+        self.term_offsets = counts.indptr.astype(np.int64)
+        self.doc_ids = counts.indices.astype(np.int32)
+        tf = counts.data
+        norm = k1 * (1 - b + b * doc_len[self.doc_ids] / avg_len)
+        term_of_posting = np.repeat(np.arange(len(df)), df)
+        self.impacts = (idf[term_of_posting] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+        self.upper_bounds = np.zeros(len(df), dtype=np.float32)
+        nonempty = df > 0
+        self.upper_bounds[nonempty] = np.maximum.reduceat(self.impacts, self.term_offsets[:-1][nonempty])
+
+    def _postings(self, term_id):
+        start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        return self.doc_ids[start:end], self.impacts[start:end]
+
+    def query_terms(self, query):
+        terms = {self.vocabulary[token] for token in self.analyzer(query) if token in self.vocabulary}
+        return sorted(terms, key=lambda t: -self.upper_bounds[t])
+
+    def search(self, query, top_k=1, prune=True):
+        """Return (doc_ids, scores) of the top_k documents, best first."""
+        terms = self.query_terms(query)
+        cand_docs = np.empty(0, dtype=np.int32)
+        cand_scores = np.empty(0, dtype=np.float32)
+        if not terms:
+            return cand_docs, cand_scores
+
+        remaining = np.cumsum(self.upper_bounds[terms][::-1])[::-1]
+        for i, term in enumerate(terms):
+            docs, impacts = self._postings(term)
+            threshold = -np.inf
+            if prune and len(cand_scores) >= top_k:
+                threshold = np.partition(cand_scores, len(cand_scores) - top_k)[len(cand_scores) - top_k]
+
+            if remaining[i] < threshold:
+                # Unseen documents can no longer reach the top k: only update candidates.
+                pos = np.searchsorted(docs, cand_docs)
+                pos[pos == len(docs)] = 0
+                hit = docs[pos] == cand_docs if len(docs) else np.zeros(len(cand_docs), dtype=bool)
+                cand_scores[hit] += impacts[pos[hit]]
+                rest = remaining[i + 1] if i + 1 < len(terms) else 0.0
+                keep = cand_scores + rest >= threshold
+                cand_docs, cand_scores = cand_docs[keep], cand_scores[keep]
+            else:
+                merged, inverse = np.unique(np.concatenate([cand_docs, docs]), return_inverse=True)
+                cand_scores = np.bincount(
+                    inverse, weights=np.concatenate([cand_scores, impacts]), minlength=len(merged)
+                ).astype(np.float32)
+                cand_docs = merged.astype(np.int32)
+
+        return top_k_scores(cand_docs, cand_scores, top_k)
+
+
+def recall_against_tfidf(model, queries, top_k=5):
+    """Mean recall@k of the BM25 ranking, taking the cosine ranking as the reference."""
+    bm25 = model.get_bm25_index()
+    reference = model._score_queries(queries, top_k, engine='tfidf')
+    recalls = []
+    for query, (ref_docs, _) in zip(queries, reference):
+        if not len(ref_docs):
+            continue
+        docs, _ = bm25.search(query, top_k)
+        recalls.append(len(set(ref_docs.tolist()) & set(docs.tolist())) / len(ref_docs))
+    return float(np.mean(recalls)) if recalls else 0.0
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+
+    from src.retrieval_model import MedicalQARetrievalModel
+
+    parser = argparse.ArgumentParser(description="Compare BM25 against the TF-IDF cosine ranking.")
+    parser.add_argument("--index", default="model/index")
+    parser.add_argument("--data", default="data/processed_medquad_qa.parquet")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    model = MedicalQARetrievalModel.load_or_build(args.data, args.index)
+    random.seed(0)
+    questions = model._texts('question_clean').tolist()
+    queries = []
+    for question in random.sample(questions, min(args.queries, len(questions))):
+        words = question.split()
+        # Drop a word so queries are not verbatim copies of indexed questions.
+        if len(words) > 2:
+            words.pop(random.randrange(len(words)))
+        queries.append(" ".join(words))
+
+    bm25 = model.get_bm25_index()
+    mismatches = 0
+    for query in queries:
+        pruned = bm25.search(query, args.top_k)
+        full = bm25.search(query, args.top_k, prune=False)
+        mismatches += not np.array_equal(pruned[0], full[0])
+    print(f"MaxScore vs exhaustive BM25 mismatches: {mismatches}/{len(queries)}")
+
+    for engine in ('tfidf', 'bm25'):
+        start = time.perf_counter()
+        model._score_queries(queries, args.top_k, engine=engine)
+        elapsed = (time.perf_counter() - start) / len(queries) * 1000
+        print(f"{engine}: {elapsed:.3f} ms/query")
+    print(f"BM25 recall@{args.top_k} vs cosine: {recall_against_tfidf(model, queries, args.top_k):.3f}")
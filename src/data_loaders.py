@@ -1,125 +1,229 @@
 import os
 import json
+import logging
 import re
+import hashlib
+import time
 import pandas as pd
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from src.text_normalization import clean_source_text
 
+logger = logging.getLogger(__name__)
 
-def clean_text(text):
-
-    if not isinstance(text, str):
-        return ""
-    text = text.lower()
-    text = re.sub(r'[^a-z0-9\s]', '', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
-
-
-def load_medquad_data(data_dir="../data/MedQuAD/"):
+QA_DIR_PATTERN = re.compile(r'^(?:[1-9]|1[0-2])_.*_QA$')
+COLUMNS = ['question', 'answer', 'source_file']
 
-    qa_pairs = []
-    print(f"DEBUG: Starting load from data_dir: {data_dir}")
 
+def clean_text(text):
+    return clean_source_text(text)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _child_text(element, tag):
+    child = element.find(tag)
+    return child.text if child is not None and child.text else ""
+
+
+def _parse_json(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    for topic in data.get('data', []):
+        for paragraph in topic.get('paragraphs', []):
+            for qa in paragraph.get('qas', []):
+                question = qa.get('question')
+                answers = qa.get('answers', [])
+                answer_text = " ".join([ans['text'] for ans in answers if 'text' in ans])
+                yield question, answer_text
+
+
+def _parse_xml(file_path):
+    """Stream QA pairs out of a MedQuAD XML file.
+
+    Uses `iterparse` and clears every pair once it has been read, so memory stays
+    flat however large the file is. Both layouts are supported: `Document` files
+    (QAPairs/QAPair/Question+Answer) and SQuAD-like `MedQuAD` files
+    (data/paragraphs/qas/question+answers/answer/text).
+    """
+    root_tag = None
+    for event, element in ET.iterparse(file_path, events=('start', 'end')):
+        if root_tag is None:
+            root_tag = element.tag
+            if root_tag not in ('Document', 'MedQuAD'):
+                logger.warning("Unknown XML root tag '%s' in file: %s. Skipping.", root_tag, file_path)
+                return
+            continue
+        if event != 'end':
+            continue
+
+        if root_tag == 'Document' and element.tag == 'QAPair':
+            yield _child_text(element, 'Question'), _child_text(element, 'Answer')
+            element.clear()
+        elif root_tag == 'MedQuAD' and element.tag == 'qas':
+            answers_list = []
+            answers_element = element.find('answers')
+            if answers_element is not None:
+                for answer_elem in answers_element.findall('answer'):
+                    text = _child_text(answer_elem, 'text')
+                    if text:
+                        answers_list.append(text)
+            yield _child_text(element, 'question'), " ".join(answers_list)
+            element.clear()
+
+
+def parse_file(file_path):
+    """Return the cleaned (question, answer) pairs of one MedQuAD file."""
+    if file_path.endswith('.json'):
+        pairs = _parse_json(file_path)
+    elif file_path.endswith('.xml'):
+        pairs = _parse_xml(file_path)
+    else:
+        return []
+    return [(clean_text(question), clean_text(answer)) for question, answer in pairs if question and answer]
+
+
+def _ingest_file(job):
+    """Worker: hash a file and parse it unless its content matches `known_sha256`."""
+    file_path, known_sha256 = job
+    try:
+        sha256 = _file_sha256(file_path)
+        if sha256 == known_sha256:
+            return file_path, sha256, None, None
+        return file_path, sha256, parse_file(file_path), None
+    except ET.ParseError as e:
+        return file_path, None, [], f"XML parsing failed: {e}"
+    except json.JSONDecodeError as e:
+        return file_path, None, [], f"JSON parsing failed: {e}"
+    except Exception as e:
+        return file_path, None, [], f"General error: {e}"
+
+
+def iter_source_files(data_dir):
     for root, dirs, files in os.walk(data_dir):
-        base_name = os.path.basename(root)
-
-        if base_name.startswith(
-                ('1_', '2_', '3_', '4_', '5_', '6_', '7_', '8_', '9_', '10_', '11_', '12_')) and base_name.endswith(
-                '_QA'):
-            print(f"DEBUG:    Matching QA directory found: {base_name}")
-            for file_name in files:
-                file_path = os.path.join(root, file_name)
-
-                try:
-                    if file_name.endswith('.json'):
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-
-                            for topic in data.get('data', []):
-                                for paragraph in topic.get('paragraphs', []):
-                                    for qa in paragraph.get('qas', []):
-                                        question = qa.get('question')
-                                        answers = qa.get('answers', [])
-                                        answer_text = " ".join([ans['text'] for ans in answers if 'text' in ans])
-
-                                        if question and answer_text:
-                                            qa_pairs.append({
-                                                'question': clean_text(question),
-                                                'answer': clean_text(answer_text)
-                                            })
-
-                    elif file_name.endswith('.xml'):
-                        tree = ET.parse(file_path)
-                        root_xml = tree.getroot()
-
-                        if root_xml.tag == 'Document':
-                            print(f"DEBUG:        Processing 'Document' type XML: {file_name}")
-                            qa_pairs_element = root_xml.find('QAPairs')
-                            if qa_pairs_element is not None:
-                                for qapair_element in qa_pairs_element.findall('QAPair'):
-                                    question_element = qapair_element.find('Question')
-                                    question = question_element.text if question_element is not None else ""
-
-                                    answer_element = qapair_element.find('Answer')
-                                    answer_text = answer_element.text if answer_element is not None else ""
-
-                                    if question and answer_text:
-                                        qa_pairs.append({
-                                            'question': clean_text(question),
-                                            'answer': clean_text(answer_text)
-                                        })
-                        elif root_xml.tag == 'MedQuAD':
-                            print(f"DEBUG:        Processing 'MedQuAD' type XML: {file_name}")
-                            for data_element in root_xml.findall('data'):
-                                for paragraph_element in data_element.findall('paragraphs'):
-                                    for qa_element in paragraph_element.findall('qas'):
-                                        question_element = qa_element.find('question')
-                                        question = question_element.text if question_element is not None else ""
-
-                                        answers_list = []
-                                        answers_element = qa_element.find('answers')
-                                        if answers_element is not None:
-                                            for answer_elem in answers_element.findall('answer'):
-                                                text_elem = answer_elem.find('text')
-                                                if text_elem is not None:
-                                                    answers_list.append(text_elem.text)
-
-                                        answer_text = " ".join(answers_list)
-
-                                        if question and answer_text:
-                                            qa_pairs.append({
-                                                'question': clean_text(question),
-                                                'answer': clean_text(answer_text)
-                                            })
-                        else:
-                            print(
-                                f"DEBUG: Unknown XML root tag '{root_xml.tag}' in file: {file_name}. Skipping.")
-
-                    else:
-                        print(f"DEBUG: Skipping unsupported file type: {file_name}")
-                        pass
-
-                except ET.ParseError as e:
-                    print(f"ERROR: XML parsing failed for {file_name}: {e}")
-                except json.JSONDecodeError as e:
-                    print(f"ERROR: JSON parsing failed for {file_name}: {e}")
-                except Exception as e:
-                    print(f"ERROR: General error loading {file_name}: {e}")
-                    continue
-
-    print(f"Total {len(qa_pairs)} question-answer pairs loaded.")
-    return pd.DataFrame(qa_pairs)
+        dirs.sort()  # walk in the same order on every filesystem
+        if not QA_DIR_PATTERN.match(os.path.basename(root)):
+            continue
+        for file_name in sorted(files):
+            if file_name.endswith(('.xml', '.json')):
+                yield os.path.join(root, file_name)
+
+
+def _run_jobs(jobs, workers):
+    if not jobs:
+        return []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_ingest_file, jobs, chunksize=32))
+
+
+def _pairs_frame(parsed):
+    columns = {name: [] for name in COLUMNS}
+    for source_file, pairs in parsed:
+        for question, answer in pairs:
+            columns['question'].append(question)
+            columns['answer'].append(answer)
+            columns['source_file'].append(source_file)
+    return pd.DataFrame(columns, columns=COLUMNS)
+
+
+def _sorted_by_source(df):
+    """Rows ordered by source file, each file's rows in document order.
+
+    Ranking ties and the dedup representative go to the lowest row, so the order
+    must not depend on the filesystem or on which files a run happened to re-parse.
+    """
+    return df.sort_values('source_file', kind='stable', ignore_index=True)
+
+
+def load_medquad_data(data_dir="../data/MedQuAD/", workers=None):
+    """Parse every QA file under `data_dir` in a process pool and return one DataFrame."""
+    results = _run_jobs([(path, None) for path in iter_source_files(data_dir)], workers)
+    for file_path, _, _, error in results:
+        if error:
+            logger.error("%s (%s)", error, file_path)
+
+    df = _sorted_by_source(_pairs_frame((os.path.relpath(path, data_dir), pairs) for path, _, pairs, _ in results))
+    logger.info("Total %d question-answer pairs loaded.", len(df))
+    return df
+
+
+def ingest_medquad(data_dir="../data/MedQuAD/", output_path="../data/processed_medquad_qa.parquet", workers=None):
+    """Incrementally (re)build the Parquet corpus at `output_path`.
+
+    A manifest next to the output records each source file's size, mtime and
+    SHA-256. Files whose size and mtime are unchanged are skipped outright; the
+    others are hashed in the pool and only re-parsed if their content changed.
+    Rows of changed or deleted files are replaced in the existing output, which is
+    kept sorted by source file so that it always equals a full rebuild.
+    """
+    manifest_path = output_path + ".manifest.json"
+    manifest = {}
+    existing = pd.DataFrame(columns=COLUMNS)
+    if os.path.exists(manifest_path) and os.path.exists(output_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        existing = pd.read_parquet(output_path)
+
+    current, jobs = {}, []
+    for path in iter_source_files(data_dir):
+        rel_path = os.path.relpath(path, data_dir)
+        stat = os.stat(path)
+        entry = manifest.get(rel_path)
+        current[rel_path] = {'size': stat.st_size, 'mtime': stat.st_mtime,
+                             'sha256': entry['sha256'] if entry else None}
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            continue
+        jobs.append((path, entry['sha256'] if entry else None))
+
+    start = time.perf_counter()
+    n_files = len(current)
+    parsed, errors = [], 0
+    for file_path, sha256, pairs, error in _run_jobs(jobs, workers):
+        rel_path = os.path.relpath(file_path, data_dir)
+        if error:
+            logger.error("%s (%s)", error, rel_path)
+            errors += 1
+            # Forget the file so the next run retries it.
+            current.pop(rel_path, None)
+            parsed.append((rel_path, []))
+            continue
+        current[rel_path]['sha256'] = sha256
+        if pairs is not None:
+            parsed.append((rel_path, pairs))
+
+    replaced = {rel_path for rel_path, _ in parsed} | (set(manifest) - set(current))
+    kept = existing[~existing['source_file'].isin(replaced)]
+    df = _sorted_by_source(pd.concat([kept, _pairs_frame(parsed)], ignore_index=True))
+
+    df.to_parquet(output_path, index=False)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(current, f)
+
+    logger.info("Re-parsed %d of %d files (%d errors, %d removed) in %.2fs; %d question-answer pairs in %s",
+                len(parsed) - errors, n_files, errors, len(set(manifest) - set(current)),
+                time.perf_counter() - start, len(df), output_path)
+    return df
 
 
 if __name__ == "__main__":
+    from src.metrics import configure_logging
+
+    configure_logging()
     print("Starting data loading process...")
-    df = load_medquad_data(data_dir="../data/MedQuAD/")
-    output_file_path_csv = "../data/processed_medquad_qa.csv"
+    data_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+    df = ingest_medquad(data_dir=os.path.join(data_root, "MedQuAD"),
+                        output_path=os.path.join(data_root, "processed_medquad_qa.parquet"))
 
     if not df.empty:
         print("\n--- Sample Loaded Data ---")
         print(df.head())
         print(f"\nShape of DataFrame: {df.shape}")
-        df.to_csv(output_file_path_csv, index=False, encoding='utf-8')
     else:
-        print("No data loaded. Please check your `data_dir` path and MedQuAD files/structure.")
\ No newline at end of file
+        print("No data loaded. Please check your `data_dir` path and MedQuAD files/structure.")
@@ -0,0 +1,216 @@
+"""
+Build-time collapsing of near-duplicate questions with MinHash/LSH.
+
+MedQuAD repeats the same question across sources ("What are the symptoms of X?"
+in GARD, GHR and MedlinePlus). Every copy adds a row to the question matrix and
+to scoring work without adding anything a query can match. This module finds
+the copies and keeps one row per cluster. The row keeps all of the cluster's
+answers and their source row ids.
+
+Each question is shingled into its index terms: the word 1-3 grams left after
+the vectorizer's stop-word removal. Similarity is the Jaccard overlap of those
+sets, so two questions are near-duplicates when the TF-IDF index would see them
+as nearly the same document. "What is (are) X ?" and "What is X?" are
+identical, while "symptoms of X" and "symptoms of Y" share only one term in five.
+
+    1. Every shingle set is reduced to a `num_perm`-value MinHash signature.
+    2. Signatures are cut into bands. Questions that agree on a whole band share a
+       bucket, which makes them candidates (`lsh_params` sizes the bands for the
+       threshold).
+    3. Rows are taken in order. Each one joins its most similar candidate
+       representative (the earliest on ties) in the same language, if their exact
+       Jaccard similarity reaches `threshold`. Otherwise it becomes a
+       representative itself.
+
+Identical shingle sets short-cut to their first occurrence. The representative
+is the lowest row of its cluster, and that row's answer is the one served.
+Without collapsing, exact copies tie and the lowest row wins anyway, so for
+exact copies the answers do not change.
+
+Report what collapsing would do to a corpus with:
+
+    python -m src.dedup --data data/processed_medquad_qa.parquet --threshold 0.8
+"""
+import argparse
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from src.metrics import configure_logging
+from src.text_normalization import clean_series
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_NUM_PERM = 128
+_PRIME = (1 << 31) - 1
+_SIGNATURE_BLOCK = 4096
+
+
+def default_analyzer():
+    """Word 1-3 grams without English stop words: the terms `MedicalQARetrievalModel` indexes."""
+    return TfidfVectorizer(ngram_range=(1, 3), stop_words='english').build_analyzer()
+
+
+def shingle_hashes(text, analyzer):
+    """Sorted unique 31-bit hashes of a text's shingles."""
+    terms = {zlib.crc32(term.encode('utf-8')) & _PRIME for term in analyzer(text)}
+    return np.array(sorted(terms), dtype=np.int64)
+
+
+def lsh_params(threshold, num_perm):
+    """(bands, rows) with bands * rows <= num_perm, weighing missed pairs above `threshold`
+    and false candidates below it equally."""
+    similarity = np.linspace(0, 1, 201)
+    best, best_cost = (1, num_perm), np.inf
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        candidate = 1 - (1 - similarity ** rows) ** bands
+        cost = np.where(similarity < threshold, candidate, 1 - candidate).sum()
+        if cost < best_cost:
+            best, best_cost = (bands, rows), cost
+    return best
+
+
+class MinHasher:
+    def __init__(self, num_perm=DEFAULT_NUM_PERM, seed=0):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, _PRIME, size=num_perm, dtype=np.int64)
+        self.b = rng.integers(0, _PRIME, size=num_perm, dtype=np.int64)
+
+    def signatures(self, shingle_sets):
+        """(n, num_perm) int64 MinHash signatures; empty sets get all -1 and never collide."""
+        signatures = np.full((len(shingle_sets), self.num_perm), -1, dtype=np.int64)
+        for start in range(0, len(shingle_sets), _SIGNATURE_BLOCK):
+            block = shingle_sets[start:start + _SIGNATURE_BLOCK]
+            sizes = np.array([len(hashes) for hashes in block])
+            nonempty = np.flatnonzero(sizes)
+            if not len(nonempty):
+                continue
+            hashes = np.concatenate([block[i] for i in nonempty])
+            # (a * x + b) mod p over every shingle at once, then the minimum per set.
+            permuted = (np.outer(hashes, self.a) + self.b) % _PRIME
+            offsets = np.concatenate([[0], np.cumsum(sizes[nonempty])[:-1]])
+            signatures[start + nonempty] = np.minimum.reduceat(permuted, offsets, axis=0)
+        return signatures
+
+
+def _jaccard(a, b):
+    if not len(a) or not len(b):
+        return 0.0
+    shared = len(np.intersect1d(a, b, assume_unique=True))
+    return shared / (len(a) + len(b) - shared)
+
+
+def cluster_near_duplicates(texts, langs=None, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM,
+                            analyzer=None, seed=0):
+    """Cluster representative (its lowest row) for every row, as an int64 array."""
+    analyzer = analyzer or default_analyzer()
+    langs = [lang if isinstance(lang, str) else None for lang in langs] if langs is not None else [None] * len(texts)
+    shingle_sets = [shingle_hashes(text, analyzer) for text in texts]
+    signatures = MinHasher(num_perm, seed).signatures(shingle_sets)
+    bands, rows = lsh_params(threshold, num_perm)
+
+    representative = np.arange(len(texts), dtype=np.int64)
+    exact = {}
+    buckets = [{} for _ in range(bands)]
+    for i, hashes in enumerate(shingle_sets):
+        if not len(hashes):
+            continue
+        key = (langs[i], hashes.tobytes())
+        if key in exact:
+            representative[i] = exact[key]
+            continue
+        band_keys = [signatures[i, band * rows:(band + 1) * rows].tobytes() for band in range(bands)]
+        candidates = {rep for band, band_key in enumerate(band_keys) for rep in buckets[band].get(band_key, ())}
+        best, best_similarity = None, 0.0
+        for rep in sorted(candidates):
+            if langs[rep] == langs[i]:
+                similarity = _jaccard(hashes, shingle_sets[rep])
+                if similarity > best_similarity:
+                    best, best_similarity = rep, similarity
+        if best is not None and best_similarity >= threshold:
+            representative[i] = best
+            exact[key] = best
+            continue
+        exact[key] = i
+        for band, band_key in enumerate(band_keys):
+            buckets[band].setdefault(band_key, []).append(i)
+    return representative
+
+
+def collapse(df, representative):
+    """One row per cluster: the representative's columns plus `answers` and `answer_ids`,
+    the answers and source row ids of every member, representative first."""
+    order = np.argsort(representative, kind='stable')
+    keep = np.flatnonzero(representative == np.arange(len(df)))
+    members = np.split(order, np.flatnonzero(np.diff(representative[order])) + 1)
+    answers = df['answer'].to_numpy()
+    collapsed = df.iloc[keep].reset_index(drop=True)
+    collapsed['answers'] = [list(answers[rows]) for rows in members]
+    collapsed['answer_ids'] = [rows.tolist() for rows in members]
+    return collapsed
+
+
+def collapse_near_duplicates(df, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM, analyzer=None, seed=0):
+    """`df` with near-duplicate questions (its `question_clean` column) collapsed; see `collapse`."""
+    representative = cluster_near_duplicates(df['question_clean'], df['lang'], threshold, num_perm, analyzer, seed)
+    return collapse(df, representative)
+
+
+def report(df, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM, examples=10, seed=0):
+    """Print how much a corpus shrinks when collapsed, and its least similar merges."""
+    analyzer = default_analyzer()
+    start = time.perf_counter()
+    representative = cluster_near_duplicates(df['question_clean'], df['lang'], threshold, num_perm, analyzer, seed)
+    elapsed = time.perf_counter() - start
+    cluster_sizes = np.bincount(representative)[np.unique(representative)]
+    kept = len(cluster_sizes)
+
+    vectorizer = TfidfVectorizer(ngram_range=(1, 3), max_features=50000, stop_words='english', dtype=np.float32)
+    full = vectorizer.fit_transform(df['question_clean'])
+    collapsed = vectorizer.fit_transform(df['question_clean'].iloc[np.flatnonzero(representative == np.arange(len(df)))])
+
+    def megabytes(matrix):
+        return (matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes) / 2 ** 20
+
+    print(f"threshold {threshold}, {num_perm} permutations, LSH {lsh_params(threshold, num_perm)} "
+          f"(bands, rows): clustered in {elapsed:.2f}s")
+    print(f"questions      {len(df):>10} -> {kept:<10} ({1 - kept / len(df):.1%} fewer rows)")
+    print(f"matrix nnz     {full.nnz:>10} -> {collapsed.nnz:<10} ({1 - collapsed.nnz / max(full.nnz, 1):.1%} smaller)")
+    print(f"matrix MB      {megabytes(full):>10.2f} -> {megabytes(collapsed):<10.2f}")
+    print(f"clusters > 1   {int((cluster_sizes > 1).sum()):>10}   largest {int(cluster_sizes.max())}")
+
+    merged = np.flatnonzero(representative != np.arange(len(df)))
+    if examples and len(merged):
+        similarities = [_jaccard(shingle_hashes(df['question_clean'].iloc[i], analyzer),
+                                 shingle_hashes(df['question_clean'].iloc[representative[i]], analyzer))
+                        for i in merged]
+        print("\nLeast similar merges (check these before lowering the threshold):")
+        for k in np.argsort(similarities, kind='stable')[:examples]:
+            i = merged[k]
+            print(f"  {similarities[k]:.2f}  {df['question'].iloc[i]!r}  ->  {df['question'].iloc[representative[i]]!r}")
+    return representative
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report how near-duplicate collapsing would shrink the index.")
+    parser.add_argument("--data", default="data/processed_medquad_qa.parquet")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Minimum Jaccard similarity")
+    parser.add_argument("--num-perm", type=int, default=DEFAULT_NUM_PERM)
+    parser.add_argument("--examples", type=int, default=10)
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    df = pd.read_parquet(args.data) if args.data.endswith('.parquet') else pd.read_csv(args.data)
+    if 'lang' not in df.columns:
+        df['lang'] = 'en'
+    df['question_clean'] = clean_series(df['question'], df['lang']).to_numpy()
+    report(df, args.threshold, args.num_perm, args.examples)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,230 @@
+"""
+Dense (semantic) retrieval: an LSA projection of the TF-IDF space, searched
+through an in-project IVF index with int8 codes.
+
+Embeddings are built locally on the CPU, with nothing to download. A
+TruncatedSVD is fitted on the question TF-IDF matrix stacked with a sample of
+the answers (in the same vocabulary). Terms that co-occur in answers ("high
+blood pressure" ... "hypertension") therefore land close together, even when
+no question uses both. Questions and queries are both embedded as
+`tfidf @ projection`, then L2-normalised, so a dot product is a cosine.
+
+The IVF index splits the embeddings into about 4 * sqrt(n) k-means lists. A
+query scores the list centroids, then scans only the `nprobe` closest lists.
+That is roughly nprobe * sqrt(n) / 4 rows instead of n, so latency grows
+sublinearly with the corpus. Raising `nprobe` trades latency for recall, and
+`nprobe = n_lists` is an exhaustive scan. Vectors are stored as per-dimension
+scaled int8 codes, a quarter of float32, laid out list by list so each probe
+reads one contiguous slice.
+
+On disk, under `<index_dir>/dense/`:
+
+    manifest.json       format version, n_docs, n_components, n_lists
+    projection.npy      (n_features, n_components) float32 LSA projection
+    centroids.npy       (n_lists, n_components) float32, L2-normalised
+    list_offsets.npy    (n_lists + 1,) int64, list c is rows [offsets[c], offsets[c + 1])
+    list_rows.npy       corpus row id of each code, in list order (int32)
+    positions.npy       position of each corpus row in list order (int32)
+    codes.npy           (n_docs, n_components) int8, in list order
+    scale.npy           (n_components,) float32 dequantisation scale
+
+Build it next to an index with:
+
+    python -m src.dense_index --index model/index
+
+or pass `--dense` to `python -m src.index_store build`. Without a prebuilt
+dense index, the 'dense' and 'hybrid' engines fit one in memory on first use.
+"""
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+
+from src import index_store
+from src.metrics import configure_logging
+from src.ranking import top_k_scores
+from src.text_normalization import clean_series
+
+logger = logging.getLogger(__name__)
+
+DENSE_DIR = "dense"
+DENSE_FORMAT_VERSION = 1
+DEFAULT_COMPONENTS = 128
+DEFAULT_NPROBE = 16
+# Rows whose answers are added to the SVD fit, and rows used to train the k-means lists.
+FIT_SAMPLE = 200000
+KMEANS_SAMPLE = 100000
+_ASSIGN_BLOCK = 8192
+
+
+def _default_lists(n_docs):
+    return max(1, min(n_docs, int(4 * np.sqrt(n_docs))))
+
+
+class DenseIndex:
+    def __init__(self, projection, centroids, list_offsets, list_rows, positions, codes, scale,
+                 nprobe=DEFAULT_NPROBE):
+        self.projection = projection
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.positions = positions
+        self.codes = codes
+        self.scale = scale
+        self.nprobe = nprobe
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, question_vector, fit_matrix=None, n_components=DEFAULT_COMPONENTS, n_lists=None, seed=0):
+        """Fit the projection on `fit_matrix` (default: the questions) and index every question."""
+        question_vector = sp.csr_matrix(question_vector)
+        n_docs, n_features = question_vector.shape
+        n_components = max(1, min(n_components, n_features - 1))
+        svd = TruncatedSVD(n_components, random_state=seed)
+        svd.fit(fit_matrix if fit_matrix is not None else question_vector)
+        projection = np.ascontiguousarray(svd.components_.T, dtype=np.float32)
+        embeddings = normalize(np.asarray(question_vector @ projection, dtype=np.float32))
+
+        n_lists = min(n_lists or _default_lists(n_docs), n_docs)
+        rng = np.random.default_rng(seed)
+        train = embeddings[rng.choice(n_docs, size=min(n_docs, KMEANS_SAMPLE), replace=False)]
+        kmeans = MiniBatchKMeans(n_lists, random_state=seed, batch_size=4096, n_init=1).fit(train)
+        centroids = normalize(kmeans.cluster_centers_.astype(np.float32))
+
+        assignment = np.empty(n_docs, dtype=np.int64)
+        for start in range(0, n_docs, _ASSIGN_BLOCK):
+            assignment[start:start + _ASSIGN_BLOCK] = np.argmax(
+                embeddings[start:start + _ASSIGN_BLOCK] @ centroids.T, axis=1)
+        list_rows = np.argsort(assignment, kind='stable').astype(np.int32)
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))])
+        positions = np.empty(n_docs, dtype=np.int32)
+        positions[list_rows] = np.arange(n_docs, dtype=np.int32)
+
+        peak = np.abs(embeddings).max(axis=0)
+        scale = np.where(peak > 0, peak / 127, 1.0).astype(np.float32)
+        codes = np.round(embeddings[list_rows] / scale).astype(np.int8)
+        return cls(projection, centroids, list_offsets, list_rows, positions, codes, scale)
+
+    def embed(self, query_matrix):
+        """L2-normalised embeddings of TF-IDF query rows."""
+        return normalize(np.asarray(query_matrix @ self.projection, dtype=np.float32))
+
+    def _probe(self, embedding, nprobe):
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        centroid_scores = self.centroids @ embedding
+        if nprobe < self.n_lists:
+            return np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        return np.arange(self.n_lists)
+
+    def search(self, embedding, top_k, nprobe=None):
+        """(row ids, approximate cosine scores) of the best `top_k` rows in the probed lists."""
+        weights = embedding * self.scale
+        row_ids, scores = [], []
+        for c in self._probe(embedding, nprobe):
+            start, end = self.list_offsets[c], self.list_offsets[c + 1]
+            if start == end:
+                continue
+            row_ids.append(self.list_rows[start:end])
+            scores.append(self.codes[start:end] @ weights)
+        if not row_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return top_k_scores(np.concatenate(row_ids), np.concatenate(scores), top_k)
+
+    def search_batch(self, embeddings, top_k, nprobe=None):
+        return [self.search(embedding, top_k, nprobe) for embedding in embeddings]
+
+    def score_rows(self, embedding, rows):
+        """Approximate cosine scores of specific corpus rows."""
+        return self.codes[self.positions[rows]] @ (embedding * self.scale)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name in ('projection', 'centroids', 'list_offsets', 'list_rows', 'positions', 'codes', 'scale'):
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        manifest = {
+            'format_version': DENSE_FORMAT_VERSION,
+            'n_docs': int(len(self.positions)),
+            'n_components': int(self.projection.shape[1]),
+            'n_lists': int(self.n_lists),
+        }
+        with open(os.path.join(directory, index_store.MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, index_store.MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != DENSE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported dense index format {manifest.get('format_version')} in {directory}")
+
+        def array(name, mmap_mode='r'):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+
+        # The small arrays are read into memory; the per-row ones stay memory-mapped.
+        return cls(array('projection', None), array('centroids', None), array('list_offsets', None),
+                   array('list_rows'), array('positions'), array('codes'), array('scale', None))
+
+
+def fit_dense_index(question_vector, vectorizer, answers, n_components=DEFAULT_COMPONENTS, n_lists=None,
+                    seed=0, fit_sample=FIT_SAMPLE):
+    """Fit on the questions plus a sample of answers (indexable by row, e.g. a TextStore)."""
+    n_docs = question_vector.shape[0]
+    rng = np.random.default_rng(seed)
+    sample = np.sort(rng.choice(n_docs, size=min(n_docs, fit_sample), replace=False))
+    answer_matrix = vectorizer.transform(clean_series([answers[int(i)] for i in sample]))
+    fit_matrix = sp.vstack([sp.csr_matrix(question_vector)[sample], answer_matrix], format='csr')
+    return DenseIndex.build(question_vector, fit_matrix, n_components, n_lists, seed)
+
+
+def build_dense_index(index_dir, n_components=DEFAULT_COMPONENTS, n_lists=None, seed=0):
+    from src.retrieval_model import MedicalQARetrievalModel
+
+    model = MedicalQARetrievalModel.load_index(index_dir)
+    logger.info("Fitting %d-component dense index over %d questions...", n_components, len(model.df))
+    dense = fit_dense_index(model.question_vector, model.vectorizer, model.text_stores['answer'],
+                            n_components, n_lists, seed)
+    dense.save(os.path.join(index_dir, DENSE_DIR))
+    logger.info("Dense index saved (%d rows, %d components, %d lists)",
+                len(dense.positions), dense.projection.shape[1], dense.n_lists)
+    return dense
+
+
+def load_dense_index(index_dir, n_docs):
+    """The dense index under `index_dir` if there is one for this corpus, otherwise None."""
+    directory = os.path.join(index_dir, DENSE_DIR)
+    if not os.path.exists(os.path.join(directory, index_store.MANIFEST_FILE)):
+        return None
+    try:
+        dense = DenseIndex.load(directory)
+    except ValueError as e:
+        logger.warning("Ignoring dense index: %s", e)
+        return None
+    if len(dense.positions) != n_docs:
+        logger.warning("Ignoring dense index: built for a different corpus, rebuild it.")
+        return None
+    return dense
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the dense LSA/IVF index next to a retrieval index.")
+    parser.add_argument("--index", default=index_store.DEFAULT_INDEX_DIR)
+    parser.add_argument("--components", type=int, default=DEFAULT_COMPONENTS)
+    parser.add_argument("--lists", type=int, help="IVF lists (default: 4 * sqrt(n_docs))")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    configure_logging()
+    build_dense_index(args.index, args.components, args.lists, args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
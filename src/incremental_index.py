@@ -0,0 +1,176 @@
+"""
+Incremental updates for the TF-IDF question index.
+
+`IncrementalIndex` lets documents be appended and deleted without refitting the
+vectorizer. It keeps:
+
+    base        the question matrix with its IDF weighting divided back out, so
+                each row is proportional to the document's raw term counts
+    doc_freq    per-term document frequency over the live documents
+    live        a tombstone mask; deleted rows stay in place until compaction
+
+New documents are counted against the frozen vocabulary and appended to `base`.
+IDF weights are only recomputed, and rows re-normalised, on the next query after
+a change (`refresh`), which costs one pass over the non-zeros and no tokenisation.
+`compact` drops tombstoned rows and is run off the request path by the model.
+
+Tolerance against a full rebuild: when the added documents introduce no n-gram
+outside the fitted vocabulary, document frequencies, IDF weights and row norms are
+exactly those of a refit (terms left in no live document get zero weight, as if
+dropped), and cosine scores agree with a full rebuild to within
+`REBUILD_TOLERANCE`. That is float32 rounding only: the bookkeeping is float64,
+and what `refresh` hands back is float32 like the index. tests/test_incremental_index.py
+checks this after adds, deletes and a compaction.
+
+The bound does not hold once `max_features` (50000 in the model) truncates the
+vocabulary. A refit keeps the most frequent terms of the new corpus, so added or
+deleted documents can change which terms survive, while this index keeps the
+original cut. N-grams that are new to the corpus are likewise ignored until the
+next full build; `oov_rate` reports how much of the added text that affected.
+"""
+import threading
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+REBUILD_TOLERANCE = 1e-6
+
+# Compact once this share of the rows are tombstones.
+COMPACT_RATIO = 0.2
+
+
+class IncrementalIndex:
+    def __init__(self, vectorizer, question_vector, lock=None):
+        self.vectorizer = vectorizer
+        self.lock = lock or threading.RLock()
+        matrix = sp.csr_matrix(question_vector, dtype=np.float64, copy=True)
+        idf = np.asarray(vectorizer.idf_, dtype=np.float64)
+        inverse_idf = np.divide(1.0, idf, out=np.zeros_like(idf), where=idf > 0)
+        self.base = (matrix @ sp.diags(inverse_idf)).tocsr()
+        self.doc_freq = np.bincount(matrix.indices, minlength=matrix.shape[1]).astype(np.int64)
+        self.live = np.ones(matrix.shape[0], dtype=bool)
+        self.dirty = False
+        self.generation = 0
+        self.added_tokens = 0
+        self.added_oov_tokens = 0
+
+    def _count(self, cleaned_texts):
+        # The CountVectorizer half of the fitted TfidfVectorizer: raw counts, frozen vocabulary.
+        return CountVectorizer.transform(self.vectorizer, cleaned_texts)
+
+    def add(self, cleaned_texts):
+        """Append documents; returns their row positions."""
+        counts = self._count(cleaned_texts).astype(np.float64)
+        analyzer = self.vectorizer.build_analyzer()
+        total = sum(len(analyzer(text)) for text in cleaned_texts)
+        with self.lock:
+            start = self.base.shape[0]
+            self.base = sp.vstack([self.base, counts], format='csr')
+            self.doc_freq += np.bincount(counts.indices, minlength=len(self.doc_freq))
+            self.live = np.concatenate([self.live, np.ones(counts.shape[0], dtype=bool)])
+            self.added_tokens += total
+            self.added_oov_tokens += total - int(counts.sum())
+            self.dirty = True
+            self.generation += 1
+            return np.arange(start, start + counts.shape[0])
+
+    def delete(self, rows):
+        """Tombstone rows; returns how many were live."""
+        with self.lock:
+            rows = np.unique(np.asarray(rows, dtype=np.int64))
+            rows = rows[self.live[rows]]
+            if len(rows):
+                self.doc_freq -= np.bincount(self.base[rows].indices, minlength=len(self.doc_freq))
+                self.live[rows] = False
+                self.dirty = True
+                self.generation += 1
+            return len(rows)
+
+    def refresh(self):
+        """Return (question_vector, idf) if anything changed since the last refresh, else None."""
+        with self.lock:
+            if not self.dirty:
+                return None
+            n_docs = int(self.live.sum())
+            # Same smoothed IDF as TfidfVectorizer(smooth_idf=True).
+            idf = np.log((1 + n_docs) / (1 + self.doc_freq)) + 1
+            # A refit would drop terms no live document contains; zero them so they
+            # cannot inflate query norms.
+            idf[self.doc_freq == 0] = 0.0
+            weighted = sp.diags(self.live.astype(np.float64)) @ self.base @ sp.diags(idf)
+            matrix = normalize(weighted.tocsr(), norm='l2', copy=False).astype(np.float32)
+            matrix.eliminate_zeros()
+            self.dirty = False
+            return matrix, idf.astype(np.float32)
+
+    def needs_compaction(self):
+        return len(self.live) and (~self.live).sum() / len(self.live) >= COMPACT_RATIO
+
+    def compact(self, swap):
+        """Drop tombstoned rows. `swap(keep_mask)` is called under the lock to update the
+        caller's own per-row state; nothing is swapped if the index changed meanwhile."""
+        with self.lock:
+            generation, base, live = self.generation, self.base, self.live.copy()
+        compacted = base[live]
+        with self.lock:
+            if generation != self.generation:
+                return False
+            self.base = compacted
+            self.live = np.ones(compacted.shape[0], dtype=bool)
+            self.dirty = True
+            self.generation += 1
+            swap(live)
+            return True
+
+    def oov_rate(self):
+        return self.added_oov_tokens / self.added_tokens if self.added_tokens else 0.0
+
+
+def max_score_difference(model, rebuilt, cleaned_queries):
+    """Largest absolute cosine-score difference between an updated model and a full rebuild
+    over the updated model's live documents (in the same order)."""
+    with model.index_lock:
+        model._refresh_index()
+        live = np.flatnonzero(model.updates.live) if model.updates is not None else slice(None)
+        updated = (model.vectorizer.transform(cleaned_queries) @ model.question_vector[live].T).toarray()
+    reference = (rebuilt.vectorizer.transform(cleaned_queries) @ rebuilt.question_vector.T).toarray()
+    return float(np.abs(updated - reference).max())
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import tempfile
+
+    from src.retrieval_model import MedicalQARetrievalModel
+
+    parser = argparse.ArgumentParser(description="Check incremental updates against a full rebuild.")
+    parser.add_argument("--data", default="data/processed_medquad_qa.parquet")
+    args = parser.parse_args()
+
+    model = MedicalQARetrievalModel(data_path=args.data)
+    corpus = model.df[['question', 'answer', 'lang']].copy()
+
+    # Re-add a slice of existing questions (no new n-grams) and delete another slice.
+    added = corpus.sample(frac=0.1, random_state=0)
+    doc_ids = model.add_documents(added['question'].tolist(), added['answer'].tolist(), added['lang'].tolist())
+    deleted = model.df['doc_id'].sample(frac=0.05, random_state=1).tolist()
+    model.delete_documents(deleted)
+    if model._compaction_thread is not None:
+        model._compaction_thread.join()
+
+    live_rows = model.df[model.updates.live][['question', 'answer', 'lang']]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "live.csv")
+        live_rows.to_csv(path, index=False)
+        rebuilt = MedicalQARetrievalModel(data_path=path)
+
+    queries = model.df['question_clean'].sample(n=min(500, len(model.df)), random_state=2).tolist()
+    same_vocabulary = rebuilt.vectorizer.vocabulary_ == model.vectorizer.vocabulary_
+    difference = max_score_difference(model, rebuilt, queries)
+    print(f"Added {len(doc_ids)}, deleted {len(deleted)}, OOV rate {model.updates.oov_rate():.4f}")
+    print(f"Same vocabulary as rebuild: {same_vocabulary}; max score difference: {difference:.2e} "
+          f"(tolerance {REBUILD_TOLERANCE:.0e})")
+    raise SystemExit(0 if difference <= REBUILD_TOLERANCE else 1)
@@ -0,0 +1,372 @@
+"""
+On-disk retrieval index.
+
+An index directory holds everything `MedicalQARetrievalModel` needs to answer
+queries without re-reading the CSV or refitting TF-IDF:
+
+    manifest.json            format version, source checksum, vectorizer params
+    matrix_data.npy          CSR data of the question TF-IDF matrix (float32)
+    matrix_indices.npy       CSR column indices (int32)
+    matrix_indptr.npy        CSR row pointers (int32, int64 past 2**31 non-zeros)
+    vocab.txt                one term per line, in column order
+    idf.npy                  IDF weight per column
+    lang_codes.npy           int8 language per row, an index into manifest
+                             'languages' (-1: any other language)
+    <name>.bin / .offsets.npy  offset-indexed UTF-8 text stores
+                             (questions, questions_clean, answers)
+    answer_indptr.npy        row i's answers are answers[indptr[i]:indptr[i + 1]],
+                             the served one first (several when near-duplicate
+                             questions were collapsed, see `src/dedup.py`)
+    answer_ids.npy           source corpus row of each answer (-1: added later)
+
+Arrays are opened with `np.load(mmap_mode='r')` so several processes that load
+the same index share the page cache instead of holding private copies. Text is
+only decoded for the rows that are read, so a loaded model never holds the
+corpus as Python strings.
+
+Build from the command line:
+
+    python -m src.index_store build --data data/processed_medquad_qa.parquet --out model/index
+    python -m src.index_store check --data data/processed_medquad_qa.parquet --out model/index
+
+Add `--native` to the build to also create the per-language question indexes
+described in `src/native_index.py`, `--dense` for the semantic index in
+`src/dense_index.py`, `--entities` for the entity pre-filter in
+`src/ner_model.py`, and `--dedup` to collapse near-duplicate questions
+(`src/dedup.py`).
+"""
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from src.dedup import DEFAULT_THRESHOLD as DEDUP_THRESHOLD
+from src.language_detection import SUPPORTED_LANGUAGES
+from src.metrics import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# 2: float32/int32 matrix, int8 language codes. 3: grouped answers.
+INDEX_FORMAT_VERSION = 3
+MANIFEST_FILE = "manifest.json"
+DEFAULT_INDEX_DIR = os.path.join("model", "index")
+# Written by `python -m src.data_loaders`.
+DEFAULT_DATA_PATH = os.path.join("data", "processed_medquad_qa.parquet")
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def describe_source(path):
+    stat = os.stat(path)
+    return {
+        'path': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'sha256': file_checksum(path),
+    }
+
+
+class TextStore:
+    """Read-only sequence of strings backed by a UTF-8 blob and an offsets array.
+
+    Row `i` is `blob[offsets[i]:offsets[i + 1]]`, decoded on access, so only the
+    rows that are actually read are ever turned into Python strings.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.offsets = np.load(prefix + ".offsets.npy", mmap_mode='r')
+        self._file = open(prefix + ".bin", 'rb')
+        if os.fstat(self._file.fileno()).st_size:
+            self._blob = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._blob = b''
+
+    @staticmethod
+    def write(prefix, texts):
+        offsets = [0]
+        with open(prefix + ".bin", 'wb') as f:
+            for text in texts:
+                data = (text if isinstance(text, str) else "").encode('utf-8')
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+        np.save(prefix + ".offsets.npy", np.asarray(offsets, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        start, end = int(self.offsets[idx]), int(self.offsets[idx + 1])
+        return self._blob[start:end].decode('utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+        self._file.close()
+
+
+class AnswerGroups:
+    """Row-aligned view of the grouped answer store.
+
+    Indexing and iterating give each row's served answer, so it stands in for a plain
+    answer column; `group` and `group_ids` give all of a row's answers and their source rows.
+    """
+
+    def __init__(self, texts, indptr, ids):
+        self.texts = texts
+        self.indptr = indptr
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __getitem__(self, idx):
+        return self.texts[int(self.indptr[idx])]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def group(self, idx):
+        return [self.texts[j] for j in range(int(self.indptr[idx]), int(self.indptr[idx + 1]))]
+
+    def group_ids(self, idx):
+        return self.ids[int(self.indptr[idx]):int(self.indptr[idx + 1])].tolist()
+
+    def close(self):
+        self.texts.close()
+
+
+def _answer_groups(df):
+    """(answers, indptr, ids) flattened from `answers`/`answer_ids` list columns, or one answer per row."""
+    if 'answers' not in df.columns:
+        return list(df['answer']), np.arange(len(df) + 1, dtype=np.int64), np.arange(len(df), dtype=np.int64)
+    sizes = [len(group) for group in df['answers']]
+    answers = [answer for group in df['answers'] for answer in group]
+    ids = [answer_id for group in df['answer_ids'] for answer_id in group]
+    return answers, np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64), np.asarray(ids, dtype=np.int64)
+
+
+def lang_codes(langs):
+    """int8 codes into SUPPORTED_LANGUAGES for a column of language strings; -1 for anything else."""
+    return pd.Categorical(langs, categories=SUPPORTED_LANGUAGES).codes.astype(np.int8)
+
+
+def save_matrix(directory, matrix, vocabulary, idf):
+    """Write a TF-IDF matrix as raw float32/int32 CSR arrays plus its vocabulary and IDF weights."""
+    matrix = sp.csr_matrix(matrix, dtype=np.float32)
+    matrix.sort_indices()
+    index_dtype = np.int32 if matrix.nnz < 2 ** 31 else np.int64
+    np.save(os.path.join(directory, "matrix_data.npy"), matrix.data)
+    np.save(os.path.join(directory, "matrix_indices.npy"), matrix.indices.astype(index_dtype, copy=False))
+    np.save(os.path.join(directory, "matrix_indptr.npy"), matrix.indptr.astype(index_dtype, copy=False))
+
+    terms = [None] * len(vocabulary)
+    for term, col in vocabulary.items():
+        terms[col] = term
+    with open(os.path.join(directory, "vocab.txt"), 'w', encoding='utf-8') as f:
+        f.write("\n".join(terms))
+    np.save(os.path.join(directory, "idf.npy"), np.asarray(idf))
+    return matrix
+
+
+def load_matrix(directory, shape):
+    """Memory-map a matrix written by `save_matrix`; returns (matrix, vocabulary, idf)."""
+    def array(name):
+        return np.load(os.path.join(directory, name), mmap_mode='r')
+
+    matrix = sp.csr_matrix(
+        (array("matrix_data.npy"), array("matrix_indices.npy"), array("matrix_indptr.npy")),
+        shape=tuple(shape), copy=False
+    )
+    with open(os.path.join(directory, "vocab.txt"), 'r', encoding='utf-8') as f:
+        terms = f.read().split("\n") if shape[1] else []
+    return matrix, {term: col for col, term in enumerate(terms)}, array("idf.npy")
+
+
+def save_index(index_dir, question_vector, vocabulary, idf, df, vectorizer_params, source_path=None,
+               dedup_threshold=None):
+    """Write an index directory atomically (build into a temp dir, then swap).
+
+    `df` may carry `answers` and `answer_ids` list columns (see `src.dedup.collapse`);
+    otherwise each row has its `answer` alone. Sub-indexes of the old index (native,
+    dense, entities) describe the old rows and are dropped with it.
+    """
+    index_dir = os.path.normpath(index_dir)
+    tmp_dir = index_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    matrix = save_matrix(tmp_dir, question_vector, vocabulary, idf)
+
+    np.save(os.path.join(tmp_dir, "lang_codes.npy"), lang_codes(df['lang']))
+    TextStore.write(os.path.join(tmp_dir, "questions"), df['question'])
+    TextStore.write(os.path.join(tmp_dir, "questions_clean"), df['question_clean'])
+    answers, answer_indptr, answer_ids = _answer_groups(df)
+    TextStore.write(os.path.join(tmp_dir, "answers"), answers)
+    np.save(os.path.join(tmp_dir, "answer_indptr.npy"), answer_indptr)
+    np.save(os.path.join(tmp_dir, "answer_ids.npy"), answer_ids)
+
+    manifest = {
+        'format_version': INDEX_FORMAT_VERSION,
+        'created': time.time(),
+        'n_docs': int(matrix.shape[0]),
+        'n_features': int(matrix.shape[1]),
+        'n_answers': len(answers),
+        'dedup_threshold': dedup_threshold,
+        'vectorizer': vectorizer_params,
+        'languages': SUPPORTED_LANGUAGES,
+        'source': describe_source(source_path) if source_path and os.path.exists(source_path) else None,
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    old_dir = index_dir + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(index_dir):
+        dropped = sorted(name for name in os.listdir(index_dir) if os.path.isdir(os.path.join(index_dir, name)))
+        if dropped:
+            logger.warning("Rebuilt %s without its sub-indexes (%s), which belong to the old rows; rebuild them "
+                           "with `python -m src.index_store build --force` and their flags.",
+                           index_dir, ", ".join(dropped))
+        os.rename(index_dir, old_dir)
+    os.rename(tmp_dir, index_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return index_dir
+
+
+def read_manifest(index_dir):
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Index manifest not found: {path}")
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != INDEX_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported index format {manifest.get('format_version')} in {index_dir} "
+            f"(expected {INDEX_FORMAT_VERSION}); rebuild the index."
+        )
+    return manifest
+
+
+def load_index(index_dir):
+    """Open an index directory. Large arrays are memory-mapped, not copied."""
+    manifest = read_manifest(index_dir)
+    question_vector, vocabulary, idf = load_matrix(index_dir, (manifest['n_docs'], manifest['n_features']))
+
+    return {
+        'manifest': manifest,
+        'question_vector': question_vector,
+        'vocabulary': vocabulary,
+        'idf': idf,
+        'lang_codes': np.load(os.path.join(index_dir, "lang_codes.npy")),
+        'questions': TextStore(os.path.join(index_dir, "questions")),
+        'questions_clean': TextStore(os.path.join(index_dir, "questions_clean")),
+        'answers': AnswerGroups(TextStore(os.path.join(index_dir, "answers")),
+                                np.load(os.path.join(index_dir, "answer_indptr.npy"), mmap_mode='r'),
+                                np.load(os.path.join(index_dir, "answer_ids.npy"), mmap_mode='r')),
+    }
+
+
+def built_dedup_threshold(index_dir):
+    """The dedup threshold an index was built with (None: not collapsed, or no readable index)."""
+    try:
+        return read_manifest(index_dir).get('dedup_threshold')
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def index_is_stale(index_dir, data_path, dedup_threshold=None):
+    """True if the index is missing, from another format, built from a different corpus,
+    or collapsed at another `dedup_threshold` (None: not collapsed).
+
+    Size and mtime are compared first; the checksum is only computed when they differ,
+    so the common "nothing changed" case does not read the whole CSV.
+    """
+    try:
+        manifest = read_manifest(index_dir)
+    except (FileNotFoundError, ValueError):
+        return True
+    if manifest.get('dedup_threshold') != dedup_threshold:
+        return True
+
+    source = manifest.get('source')
+    if not source or not os.path.exists(data_path):
+        return True
+
+    stat = os.stat(data_path)
+    if stat.st_size != source['size']:
+        return True
+    if stat.st_mtime == source['mtime']:
+        return False
+    return file_checksum(data_path) != source['sha256']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or check the on-disk retrieval index.")
+    parser.add_argument("command", choices=["build", "check"])
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH, help="Processed Q&A corpus (Parquet or CSV)")
+    parser.add_argument("--out", default=DEFAULT_INDEX_DIR, help="Index directory")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the index is up to date")
+    parser.add_argument("--native", nargs="*", metavar="LANG",
+                        help="Also build native-language question indexes (default: es hi fr)")
+    parser.add_argument("--dense", action="store_true", help="Also build the dense (LSA/IVF) index")
+    parser.add_argument("--entities", action="store_true", help="Also build the medical entity index")
+    parser.add_argument("--dedup", type=float, nargs="?", const=DEDUP_THRESHOLD, metavar="THRESHOLD",
+                        help=f"Collapse near-duplicate questions at this Jaccard similarity ({DEDUP_THRESHOLD}); "
+                             "an index collapsed at another threshold, or not at all, counts as stale")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    stale = index_is_stale(args.out, args.data, args.dedup)
+    if args.command == "check":
+        print(f"Index {args.out} is {'stale' if stale else 'up to date'} for {args.data}")
+        return 1 if stale else 0
+
+    if not stale and not args.force:
+        print(f"Index {args.out} is up to date; use --force to rebuild.")
+    else:
+        from src.retrieval_model import MedicalQARetrievalModel
+
+        start = time.perf_counter()
+        model = MedicalQARetrievalModel(data_path=args.data, dedup_threshold=args.dedup)
+        model.save_index(args.out)
+        print(f"Index built in {time.perf_counter() - start:.2f}s")
+
+    skipped = []
+    if args.native is not None:
+        from src.native_index import NATIVE_LANGUAGES, build_native_indexes
+        skipped = build_native_indexes(args.out, args.native or NATIVE_LANGUAGES)
+    if args.dense:
+        from src.dense_index import build_dense_index
+        build_dense_index(args.out)
+    if args.entities:
+        from src.ner_model import build_entity_index
+        build_entity_index(args.out)
+    if skipped:
+        print(f"Native indexes skipped for: {', '.join(skipped)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,120 @@
+"""
+Query language detection shared by the retrieval model and `language_utils`.
+
+Cheapest evidence first:
+
+1. Devanagari script means Hindi, with no further work.
+2. Latin-script text whose whole-word medical terms from `MEDICAL_TERMS` belong
+   to exactly one language is decided without langdetect, unless it carries a
+   diacritic used only by another of es/fr. One compiled regex covers all the terms.
+   A diacritic alone never decides: a single name like "Behçet" in an English
+   question would otherwise send it to French.
+3. Anything else goes to langdetect. If langdetect gives an unsupported
+   language, a diacritic or term signal for exactly one language wins, then the
+   first language with any keyword hit, as before.
+
+Results are memoised in an LRU cache, since popular questions repeat.
+"""
+import logging
+import re
+from functools import lru_cache
+
+from langdetect import detect, DetectorFactory
+
+logger = logging.getLogger(__name__)
+
+# Seed for consistent langdetect results
+DetectorFactory.seed = 0
+
+# Define supported languages
+SUPPORTED_LANGUAGES = ['en', 'es', 'hi', 'fr']
+
+# Language-specific medical terms for fallback detection
+MEDICAL_TERMS = {
+    'en': ["symptom", "treatment", "diagnosis", "disease", "medicine",
+           "fever", "pain", "blood pressure", "hypertension", "diabetes"],
+    'es': ["síntoma", "tratamiento", "diagnóstico", "enfermedad", "medicina",
+           "fiebre", "dolor", "presión arterial", "hipertensión", "diabetes"],
+    'hi': ["लक्षण", "उपचार", "निदान", "रोग", "दवा",
+           "बुखार", "दर्द", "रक्तचाप", "उच्च रक्तचाप", "मधुमेह"],
+    'fr': ["symptôme", "traitement", "diagnostic", "maladie", "médecine",
+           "fièvre", "douleur", "pression artérielle", "hypertension", "diabète"]
+}
+
+# Listed under one language but also an everyday word in another supported one.
+AMBIGUOUS_TERMS = {"diagnostic"}
+
+DETECTION_CACHE_SIZE = 4096
+
+_DEVANAGARI = re.compile(r'[\u0900-\u097F]')
+_DIACRITICS = {
+    'es': re.compile(r'[ñ¿¡áíóú]'),
+    'fr': re.compile(r'[çœèêëîïûùâôà]'),
+}
+
+_TERM_LANGUAGES = {}
+for _lang, _terms in MEDICAL_TERMS.items():
+    for _term in _terms:
+        _TERM_LANGUAGES.setdefault(_term, set()).add(_lang)
+
+# Longest terms first so "उच्च रक्तचाप" wins over "रक्तचाप"; whole words, optional plural.
+_TERMS_PATTERN = re.compile(
+    r'(?<!\w)(' + '|'.join(re.escape(term) for term in sorted(_TERM_LANGUAGES, key=len, reverse=True))
+    + r')(?:s|es)?(?!\w)'
+)
+
+
+def _matched_terms(text_lower):
+    return [match.group(1) for match in _TERMS_PATTERN.finditer(text_lower)]
+
+
+def _diacritic_signals(text_lower):
+    return {lang for lang, pattern in _DIACRITICS.items() if pattern.search(text_lower)}
+
+
+def _term_signals(terms):
+    """Languages with an unambiguous medical term in the text."""
+    langs = set()
+    for term in terms:
+        term_langs = _TERM_LANGUAGES[term]
+        if len(term_langs) == 1 and term not in AMBIGUOUS_TERMS:
+            langs |= term_langs
+    return langs
+
+
+@lru_cache(maxsize=DETECTION_CACHE_SIZE)
+def _detect(text):
+    if _DEVANAGARI.search(text):
+        return 'hi'
+
+    text_lower = text.lower()
+    terms = _matched_terms(text_lower)
+    term_langs = _term_signals(terms)
+    diacritic_langs = _diacritic_signals(text_lower)
+    if len(term_langs) == 1 and diacritic_langs <= term_langs:
+        return next(iter(term_langs))
+
+    try:
+        lang = detect(text)
+        if lang in SUPPORTED_LANGUAGES:
+            return lang
+    except Exception as e:
+        logger.debug("[Language Detection Error] %s", e)
+
+    signals = term_langs | diacritic_langs
+    if len(signals) == 1:
+        return signals.pop()
+
+    # Fallback via keyword matching, in MEDICAL_TERMS order
+    matched_langs = set().union(*(_TERM_LANGUAGES[term] for term in terms)) if terms else set()
+    for lang_code in MEDICAL_TERMS:
+        if lang_code in matched_langs:
+            return lang_code
+    return 'en'
+
+
+def detect_language(text):
+    """Detect the language of the input text; always returns one of SUPPORTED_LANGUAGES."""
+    if not isinstance(text, str) or not text.strip():
+        return 'en'
+    return _detect(text.strip())
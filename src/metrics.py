@@ -0,0 +1,280 @@
+"""
+In-process instrumentation for the query path.
+
+    with metrics.stage('vectorize'):
+        ...
+    metrics.TRANSLATIONS.inc(src='es', dest='en', outcome='cache_hit')
+    print(metrics.REGISTRY.render())        # Prometheus text exposition format
+
+Stage timers feed `medqa_stage_seconds{stage=...}`. Counters and histograms are
+plain thread-safe objects in one process-wide registry, so recording costs a dict
+lookup and a bisect under a lock, with no I/O. `set_enabled(False)` or
+MEDQA_METRICS=0 turns every timer into a shared no-op.
+
+Slow queries: `add_slow_query_hook(fn, threshold)` makes every traced call
+(`get_answers`, or one server request) collect its own per-stage breakdown.
+`fn(record)` is called for each one that took at least `threshold` seconds.
+`SlowQueryLog` is a ready-made hook that keeps the most recent records and can
+append them to a JSON-lines file. Tracing is off while no hook is registered.
+"""
+import bisect
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Cosine scores live in [0, 1]; BM25 scores reach well above it.
+SCORE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_enabled = os.environ.get("MEDQA_METRICS", "1") != "0"
+
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def configure_logging(level=None):
+    """Log setup for the command-line entry points; MEDQA_LOG_LEVEL overrides the default INFO."""
+    level = level or os.environ.get("MEDQA_LOG_LEVEL", "INFO")
+    logging.basicConfig(level=level.upper() if isinstance(level, str) else level, format=LOG_FORMAT)
+
+
+def _label_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not _enabled:
+            return
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels[name]) for name in self.labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        # Per label set: [per-bucket counts (last one is +Inf), sum, count].
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not _enabled:
+            return
+        key = tuple(str(labels[name]) for name in self.labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        series = self._series.get(tuple(str(labels[name]) for name in self.labels))
+        return series[2] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += bucket_count
+                    labels = _label_text(self.labels, key, [("le", bound)])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_label_text(self.labels, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._get_or_create(Counter, name, help, labels)
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS, labels=()):
+        return self._get_or_create(Histogram, name, help, buckets, labels)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "medqa_stage_seconds", "Time spent in each stage of the query pipeline.", LATENCY_BUCKETS, ("stage",))
+TRANSLATIONS = REGISTRY.counter(
+    "medqa_translations_total", "Translation requests by outcome.", ("src", "dest", "outcome"))
+FALLBACKS = REGISTRY.counter(
+    "medqa_fallbacks_total", "Answers degraded to a canned message or untranslated text.", ("reason",))
+TOP_SCORES = REGISTRY.histogram(
+    "medqa_top_score", "Best candidate score per query, before the threshold.", SCORE_BUCKETS, ("engine",))
+QUERIES = REGISTRY.counter("medqa_queries_total", "Queries answered.", ("lang", "route"))
+ENTITY_FILTER = REGISTRY.counter(
+    "medqa_entity_filter_total", "TF-IDF queries scored against their entities' questions, or in full.", ("outcome",))
+
+
+# --- stage timers and slow-query tracing -------------------------------------
+
+_current_trace = contextvars.ContextVar("medqa_trace", default=None)
+_slow_query_hooks = []
+
+
+class QueryTrace:
+    """Per-stage wall time of one traced call."""
+
+    def __init__(self, queries):
+        self.queries = list(queries)
+        self.stages = {}
+        self.start = time.perf_counter()
+
+    def add(self, stage_name, seconds):
+        self.stages[stage_name] = self.stages.get(stage_name, 0.0) + seconds
+
+    def record(self):
+        return {
+            "queries": self.queries,
+            "total_ms": (time.perf_counter() - self.start) * 1000,
+            "stages_ms": {name: seconds * 1000 for name, seconds in self.stages.items()},
+        }
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(elapsed, stage=self.name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(self.name, elapsed)
+        return False
+
+
+class _NoOp:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_OP = _NoOp()
+
+
+def stage(name):
+    """Context manager timing one pipeline stage."""
+    return _Stage(name) if _enabled else _NO_OP
+
+
+class _Traced:
+    def __init__(self, queries):
+        self.queries = queries
+        self.token = None
+
+    def __enter__(self):
+        if _slow_query_hooks and _current_trace.get() is None:
+            self.token = _current_trace.set(QueryTrace(self.queries))
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.token is None:
+            return False
+        trace = _current_trace.get()
+        _current_trace.reset(self.token)
+        elapsed = time.perf_counter() - trace.start
+        for hook, threshold in list(_slow_query_hooks):
+            if elapsed >= threshold:
+                try:
+                    hook(trace.record())
+                except Exception:
+                    logger.exception("Slow-query hook failed")
+        return False
+
+
+def trace_queries(queries):
+    """Trace the enclosed calls for the slow-query hooks; nested traces join the outer one."""
+    return _Traced(queries)
+
+
+def add_slow_query_hook(hook, threshold=1.0):
+    _slow_query_hooks.append((hook, threshold))
+
+
+def remove_slow_query_hook(hook):
+    _slow_query_hooks[:] = [(fn, threshold) for fn, threshold in _slow_query_hooks if fn is not hook]
+
+
+class SlowQueryLog:
+    """Slow-query hook that keeps the last `maxlen` records and optionally appends them to a JSON-lines file."""
+
+    def __init__(self, path=None, maxlen=100):
+        self.path = path
+        self.records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        logger.warning("Slow query (%.1f ms): %s", record["total_ms"],
+                       ", ".join(f"{name}={ms:.1f}ms" for name, ms in record["stages_ms"].items()))
+        with self._lock:
+            self.records.append(record)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
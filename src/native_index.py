@@ -0,0 +1,194 @@
+"""
+Per-language question indexes.
+
+Every corpus question is translated once, at build time, into es/hi/fr and
+indexed with a tokenizer suited to that language's script. A query detected as
+one of those languages is then matched directly against its own index, with no
+translation round trip; row `i` of every native index is document `i` of the
+main index, so hits map straight back to the shared answers. When the native
+index has no good match, `get_answer` falls back to translate-then-search.
+
+Native indexes live under `<index_dir>/native/<lang>/` in the same CSR format as
+the main index and are built with:
+
+    python -m src.native_index --index model/index --langs es hi fr
+"""
+import argparse
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from src import index_store
+from src.metrics import configure_logging
+from src.text_normalization import clean_native, clean_native_series
+from src.translation import get_default_cache, google_translate
+
+logger = logging.getLogger(__name__)
+
+NATIVE_DIR = "native"
+NATIVE_LANGUAGES = ['es', 'hi', 'fr']
+
+# Word patterns per script. Devanagari vowel signs and viramas are combining marks,
+# not `\w`, so the default sklearn pattern would split Hindi words apart; the dandas
+# (U+0964/U+0965) are sentence punctuation and excluded.
+TOKEN_PATTERNS = {
+    'es': r"(?u)\b\w\w+\b",
+    'fr': r"(?u)\b\w\w+\b",
+    'hi': r"[\u0900-\u0963\u0966-\u097F]+",
+}
+
+STOP_WORDS = {
+    'es': ["el", "la", "los", "las", "un", "una", "unos", "unas", "de", "del", "al", "y", "o", "que", "qué",
+           "cuál", "cuáles", "cómo", "cuándo", "quién", "quiénes", "es", "son", "en", "por", "para", "con",
+           "se", "su", "sus", "lo", "le", "les", "hay", "puede", "pueden", "está", "están", "este", "esta"],
+    'fr': ["le", "la", "les", "un", "une", "des", "de", "du", "et", "ou", "que", "qu", "quel", "quelle",
+           "quels", "quelles", "est", "sont", "en", "pour", "par", "avec", "se", "sa", "son", "ses", "ce",
+           "ces", "au", "aux", "comment", "qui", "quoi", "il", "elle", "ils", "elles", "peut", "peuvent", "on"],
+    'hi': ["के", "का", "की", "को", "में", "से", "है", "हैं", "और", "या", "क्या", "कैसे", "कौन", "कब", "एक",
+           "यह", "वह", "ये", "वे", "पर", "भी", "तो", "ही", "लिए", "होता", "होती", "होते", "हो", "था", "थी",
+           "थे", "कर", "करें", "करने", "किया", "जा", "जाता", "जाती", "जाते", "सकता", "सकते", "सकती", "इस",
+           "उस", "इन", "उन", "नहीं", "किसी", "कोई"],
+}
+
+def _vectorizer_params(lang):
+    return {
+        'ngram_range': [1, 2],
+        'max_features': 50000,
+        'token_pattern': TOKEN_PATTERNS[lang],
+        'stop_words': STOP_WORDS[lang],
+    }
+
+
+def _make_vectorizer(params):
+    params = dict(params)
+    params['ngram_range'] = tuple(params['ngram_range'])
+    return TfidfVectorizer(dtype=np.float32, **params)
+
+
+class NativeQuestionIndex:
+    def __init__(self, lang, vectorizer, question_vector):
+        self.lang = lang
+        self.vectorizer = vectorizer
+        self.question_vector = question_vector
+
+    @classmethod
+    def build(cls, lang, translated_questions):
+        vectorizer = _make_vectorizer(_vectorizer_params(lang))
+        question_vector = vectorizer.fit_transform(clean_native_series(translated_questions, lang))
+        return cls(lang, vectorizer, question_vector)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        matrix = index_store.save_matrix(
+            directory, self.question_vector, self.vectorizer.vocabulary_, self.vectorizer.idf_
+        )
+        manifest = {
+            'format_version': index_store.INDEX_FORMAT_VERSION,
+            'lang': self.lang,
+            'n_docs': int(matrix.shape[0]),
+            'n_features': int(matrix.shape[1]),
+            'vectorizer': _vectorizer_params(self.lang),
+        }
+        with open(os.path.join(directory, index_store.MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory):
+        manifest = index_store.read_manifest(directory)
+        question_vector, vocabulary, idf = index_store.load_matrix(
+            directory, (manifest['n_docs'], manifest['n_features'])
+        )
+        vectorizer = _make_vectorizer(manifest['vectorizer'])
+        vectorizer.vocabulary_ = vocabulary
+        vectorizer.idf_ = idf
+        return cls(manifest['lang'], vectorizer, question_vector)
+
+    def transform(self, queries):
+        return self.vectorizer.transform([clean_native(query, self.lang) for query in queries])
+
+
+def load_native_indexes(index_dir, n_docs):
+    """Native indexes found under `index_dir` whose row count matches the main index."""
+    indexes = {}
+    for lang in NATIVE_LANGUAGES:
+        directory = os.path.join(index_dir, NATIVE_DIR, lang)
+        if not os.path.exists(os.path.join(directory, index_store.MANIFEST_FILE)):
+            continue
+        try:
+            native = NativeQuestionIndex.load(directory)
+        except ValueError as e:
+            logger.warning("Ignoring native '%s' index: %s", lang, e)
+            continue
+        if native.question_vector.shape[0] != n_docs:
+            logger.warning("Ignoring native '%s' index: built for a different corpus, rebuild it.", lang)
+            continue
+        indexes[lang] = native
+    return indexes
+
+
+def translate_questions(questions, lang, translator=google_translate, cache=None, workers=8):
+    """Translate questions through the persistent cache, so an interrupted build resumes cheaply.
+
+    Questions that fail to translate come back as "" and simply never match.
+    """
+    cache = cache if cache is not None else get_default_cache()
+
+    def translate(question):
+        if not isinstance(question, str) or not question.strip():
+            return ""
+        try:
+            return cache.translate(question, 'en', lang, translator)
+        except Exception as e:
+            logger.warning("[%s] Question translation failed: %s", lang, e)
+            return ""
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(translate, questions))
+
+
+def build_native_indexes(index_dir, languages=NATIVE_LANGUAGES, translator=google_translate, cache=None,
+                         workers=8):
+    """Build and save a native index per language; returns the languages that had to be skipped.
+
+    A language whose translations all failed (or leave no indexable term) is skipped
+    with a warning, and the other languages are still built.
+    """
+    questions = list(index_store.load_index(index_dir)['questions'])
+    skipped = []
+    for lang in languages:
+        logger.info("[%s] Translating %d questions...", lang, len(questions))
+        translated = translate_questions(questions, lang, translator, cache, workers)
+        missing = sum(1 for text in translated if not text)
+        if missing == len(translated):
+            logger.warning("[%s] Skipping native index: all %d question translations failed", lang, missing)
+            skipped.append(lang)
+            continue
+        try:
+            native = NativeQuestionIndex.build(lang, translated)
+        except ValueError as e:
+            logger.warning("[%s] Skipping native index (%d of %d question translations failed): %s",
+                           lang, missing, len(translated), e)
+            skipped.append(lang)
+            continue
+        native.save(os.path.join(index_dir, NATIVE_DIR, lang))
+        logger.info("[%s] Native index saved (%d untranslated questions)", lang, missing)
+    return skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build per-language question indexes.")
+    parser.add_argument("--index", default=index_store.DEFAULT_INDEX_DIR)
+    parser.add_argument("--langs", nargs="+", default=NATIVE_LANGUAGES, choices=NATIVE_LANGUAGES)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args(argv)
+    configure_logging()
+    skipped = build_native_indexes(args.index, args.langs, workers=args.workers)
+    return 1 if skipped else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
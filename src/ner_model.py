@@ -0,0 +1,313 @@
+"""
+Dictionary (gazetteer) medical entity recognition, and an entity -> question
+inverted index that narrows TF-IDF scoring to the questions a query is about.
+
+The gazetteer is mined from the corpus:
+
+    disease     the focus of every question asked in one of MedQuAD's templates
+                ("What are the symptoms of X ?", "Is X inherited ?", ...)
+    symptom     `SYMPTOM_TERMS` that occur anywhere in the corpus
+    treatment   `TREATMENT_TERMS` that occur anywhere in the corpus
+
+Terms are in cleaned form (`src.text_normalization.clean_text`). They are compiled
+into one word-level trie. `EntityTagger.tag` walks it from each token and takes
+the longest match, then skips past it; `EntityTagger.entity_ids` keeps every
+match instead, nested and overlapping ones included ("chest pain" and "pain").
+Either is at most `MAX_TERM_TOKENS` steps per token, so tagging is linear in the
+query's length and independent of the gazetteer's size. A trailing "s" is
+dropped from a word the trie does not know, so simple plurals match too.
+
+At build time each entity keeps the sorted rows of every question that mentions
+it, nested mentions included, so "What causes chest pain?" is posted under both
+"chest pain" and "pain". A query that mentions any entity, again counting nested
+ones, is scored only against the union of those rows. The rows it keeps score
+exactly as under full scoring, and every question sharing an entity with the
+query is among them; a question that shares only non-entity words with the
+query can be missed. A query with no entity, or whose entities index no
+question, falls back to full scoring.
+
+On disk, under `<index_dir>/entities/`:
+
+    manifest.json       format version, n_docs, n_entities
+    terms.tsv           one "<type>\\t<term>" line per entity, in id order
+    posting_offsets.npy (n_entities + 1,) int64, entity e is rows[offsets[e]:offsets[e + 1]]
+    posting_rows.npy    question rows, sorted within each entity (int32)
+
+Build it next to an index with:
+
+    python -m src.ner_model --index model/index
+    python -m src.ner_model --index model/index --tag "what are the symptoms of diabetes"
+"""
+import argparse
+import json
+import logging
+import os
+import re
+
+import numpy as np
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+from src import index_store
+from src.metrics import configure_logging
+from src.text_normalization import clean_text
+
+logger = logging.getLogger(__name__)
+
+ENTITY_DIR = "entities"
+ENTITY_FORMAT_VERSION = 2
+ENTITY_TYPES = ['disease', 'symptom', 'treatment']
+MAX_TERM_TOKENS = 6
+
+SYMPTOM_TERMS = [
+    "fever", "pain", "chest pain", "abdominal pain", "back pain", "joint pain", "headache", "migraine",
+    "cough", "fatigue", "nausea", "vomiting", "diarrhea", "constipation", "rash", "itching", "swelling",
+    "dizziness", "shortness of breath", "wheezing", "fainting", "seizures", "numbness", "tingling",
+    "weakness", "muscle weakness", "weight loss", "weight gain", "blurred vision", "hearing loss",
+    "jaundice", "bleeding", "bruising", "chills", "sweating", "insomnia", "confusion", "memory loss",
+    "tremor", "palpitations", "high blood pressure", "low blood pressure", "frequent urination",
+    "sore throat", "runny nose", "loss of appetite", "anxiety", "depression", "hair loss", "inflammation",
+]
+TREATMENT_TERMS = [
+    "surgery", "chemotherapy", "radiation therapy", "radiotherapy", "immunotherapy", "physical therapy",
+    "occupational therapy", "speech therapy", "medication", "antibiotics", "antivirals", "insulin",
+    "vaccine", "vaccination", "dialysis", "transplant", "kidney transplant", "bone marrow transplant",
+    "stem cell transplant", "blood transfusion", "hormone therapy", "gene therapy", "corticosteroids",
+    "steroids", "pain relievers", "anticonvulsants", "antidepressants", "diuretics", "beta blockers",
+    "statins", "aspirin", "ibuprofen", "acetaminophen", "oxygen therapy", "diet", "exercise",
+    "counseling", "rehabilitation", "enzyme replacement therapy", "biopsy",
+]
+
+# MedQuAD question templates, cleaned; the group is the question's focus. Specific
+# templates come before "what is (.+)", which would otherwise swallow them.
+FOCUS_PATTERNS = [re.compile(pattern) for pattern in (
+    r"what is are (.+)",
+    r"what are the symptoms of (.+)",
+    r"what are the treatments for (.+)",
+    r"what are the complications of (.+)",
+    r"what are the stages of (.+)",
+    r"what are the genetic changes related to (.+)",
+    r"what is the outlook for (.+)",
+    r"what research or clinical trials is being done for (.+)",
+    r"what causes (.+)",
+    r"what to do for (.+)",
+    r"who is at risk for (.+)",
+    r"how to diagnose (.+)",
+    r"how to prevent (.+)",
+    r"how many people are affected by (.+)",
+    r"is (.+) inherited",
+    r"do you have information about (.+)",
+    r"what is (.+)",
+)]
+_WORD = re.compile(r"[^\W\d_]+")
+
+
+def _words(text):
+    return _WORD.findall(text)
+
+
+def question_focus(question_clean):
+    """The focus of a cleaned templated question, or None."""
+    for pattern in FOCUS_PATTERNS:
+        match = pattern.fullmatch(question_clean)
+        if match:
+            focus = " ".join(_words(match.group(1)))
+            words = focus.split()
+            if len(focus) >= 3 and len(words) <= MAX_TERM_TOKENS and not set(words) <= ENGLISH_STOP_WORDS:
+                return focus
+            return None
+    return None
+
+
+def mine_gazetteer(questions_clean, texts=()):
+    """{term: type} from question foci, plus the seed terms found in the questions or `texts`."""
+    gazetteer = {}
+    for question in questions_clean:
+        focus = question_focus(question)
+        if focus:
+            gazetteer.setdefault(focus, 'disease')
+
+    # One pass over the corpus vocabulary decides which seed terms it contains.
+    vocabulary = set()
+    for text in list(questions_clean) + list(texts):
+        vocabulary.update(_words(text.lower()))
+    for entity_type, terms in (('symptom', SYMPTOM_TERMS), ('treatment', TREATMENT_TERMS)):
+        for term in terms:
+            if set(term.split()) <= vocabulary:
+                gazetteer.setdefault(term, entity_type)
+    return gazetteer
+
+
+class EntityTagger:
+    """Longest-match tagging over a word trie of the gazetteer terms."""
+
+    def __init__(self, terms):
+        self.trie = {}
+        for entity_id, term in enumerate(terms):
+            node = self.trie
+            for word in term.split():
+                node = node.setdefault(word, {})
+            node[None] = entity_id
+
+    @staticmethod
+    def _step(node, word):
+        child = node.get(word)
+        if child is None and word.endswith('s'):
+            child = node.get(word[:-1])
+        return child
+
+    def tag(self, text):
+        """(start word, end word, entity id) of each entity in a cleaned text, left to right."""
+        words = _words(text)
+        found = []
+        i = 0
+        while i < len(words):
+            node, match = self.trie, None
+            for j in range(i, min(i + MAX_TERM_TOKENS, len(words))):
+                node = self._step(node, words[j])
+                if node is None:
+                    break
+                if None in node:
+                    match = (i, j + 1, node[None])
+            if match:
+                found.append(match)
+                i = match[1]
+            else:
+                i += 1
+        return found
+
+    def entity_ids(self, text):
+        """Ids of every entity in a cleaned text, nested and overlapping matches included."""
+        words = _words(text)
+        found = set()
+        for i in range(len(words)):
+            node = self.trie
+            for j in range(i, min(i + MAX_TERM_TOKENS, len(words))):
+                node = self._step(node, words[j])
+                if node is None:
+                    break
+                if None in node:
+                    found.add(node[None])
+        return found
+
+
+class EntityIndex:
+    def __init__(self, terms, types, posting_offsets, posting_rows, n_docs):
+        self.terms = terms
+        self.types = types
+        self.posting_offsets = posting_offsets
+        self.posting_rows = posting_rows
+        self.n_docs = n_docs
+        self.tagger = EntityTagger(terms)
+
+    @classmethod
+    def build(cls, questions_clean, texts=()):
+        """Mine the gazetteer from the corpus and index every question by its entities."""
+        gazetteer = mine_gazetteer(questions_clean, texts)
+        terms = sorted(gazetteer)
+        types = [gazetteer[term] for term in terms]
+        tagger = EntityTagger(terms)
+        postings = [[] for _ in terms]
+        for row, question in enumerate(questions_clean):
+            for entity_id in tagger.entity_ids(question):
+                postings[entity_id].append(row)
+        offsets = np.concatenate([[0], np.cumsum([len(rows) for rows in postings])]).astype(np.int64)
+        rows = np.fromiter((row for rows in postings for row in rows), dtype=np.int32, count=int(offsets[-1]))
+        return cls(terms, types, offsets, rows, len(questions_clean))
+
+    def __len__(self):
+        return len(self.terms)
+
+    def extract(self, text):
+        """[(term, type)] of the entities in raw text."""
+        return [(self.terms[entity_id], self.types[entity_id]) for _, _, entity_id in self.tagger.tag(clean_text(text))]
+
+    def rows(self, entity_id):
+        return self.posting_rows[self.posting_offsets[entity_id]:self.posting_offsets[entity_id + 1]]
+
+    def candidates(self, query_clean):
+        """Sorted rows of the questions sharing an entity with a cleaned query, or None for full scoring."""
+        postings = [self.rows(entity_id) for entity_id in self.tagger.entity_ids(query_clean)]
+        postings = [rows for rows in postings if len(rows)]
+        if not postings:
+            return None
+        return postings[0] if len(postings) == 1 else np.unique(np.concatenate(postings))
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "terms.tsv"), 'w', encoding='utf-8') as f:
+            f.write("".join(f"{entity_type}\t{term}\n" for term, entity_type in zip(self.terms, self.types)))
+        np.save(os.path.join(directory, "posting_offsets.npy"), self.posting_offsets)
+        np.save(os.path.join(directory, "posting_rows.npy"), self.posting_rows)
+        manifest = {
+            'format_version': ENTITY_FORMAT_VERSION,
+            'n_docs': int(self.n_docs),
+            'n_entities': len(self.terms),
+            'by_type': {entity_type: self.types.count(entity_type) for entity_type in ENTITY_TYPES},
+        }
+        with open(os.path.join(directory, index_store.MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, index_store.MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != ENTITY_FORMAT_VERSION:
+            raise ValueError(f"Unsupported entity index format {manifest.get('format_version')} in {directory}")
+        terms, types = [], []
+        with open(os.path.join(directory, "terms.tsv"), 'r', encoding='utf-8') as f:
+            for line in f:
+                entity_type, term = line.rstrip("\n").split("\t")
+                types.append(entity_type)
+                terms.append(term)
+        return cls(terms, types, np.load(os.path.join(directory, "posting_offsets.npy")),
+                   np.load(os.path.join(directory, "posting_rows.npy"), mmap_mode='r'), manifest['n_docs'])
+
+
+def build_entity_index(index_dir):
+    parts = index_store.load_index(index_dir)
+    logger.info("Mining entities from %d questions and their answers...", parts['manifest']['n_docs'])
+    entities = EntityIndex.build(list(parts['questions_clean']), parts['answers'])
+    entities.save(os.path.join(index_dir, ENTITY_DIR))
+    counts = {entity_type: entities.types.count(entity_type) for entity_type in ENTITY_TYPES}
+    logger.info("Entity index saved (%d entities: %s)", len(entities), counts)
+    return entities
+
+
+def load_entity_index(index_dir, n_docs):
+    """The entity index under `index_dir` if there is one for this corpus, otherwise None."""
+    directory = os.path.join(index_dir, ENTITY_DIR)
+    if not os.path.exists(os.path.join(directory, index_store.MANIFEST_FILE)):
+        return None
+    try:
+        entities = EntityIndex.load(directory)
+    except ValueError as e:
+        logger.warning("Ignoring entity index: %s", e)
+        return None
+    if entities.n_docs != n_docs:
+        logger.warning("Ignoring entity index: built for a different corpus, rebuild it.")
+        return None
+    return entities
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the entity index next to a retrieval index, or tag text.")
+    parser.add_argument("--index", default=index_store.DEFAULT_INDEX_DIR)
+    parser.add_argument("--tag", metavar="TEXT", help="Print the entities in TEXT instead of building")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    if args.tag is None:
+        build_entity_index(args.index)
+        return 0
+    entities = load_entity_index(args.index, index_store.read_manifest(args.index)['n_docs'])
+    if entities is None:
+        print(f"No entity index in {args.index}; build it first.")
+        return 1
+    for term, entity_type in entities.extract(args.tag):
+        entity_id = entities.terms.index(term)
+        print(f"{entity_type:<10} {term}  ({len(entities.rows(entity_id))} questions)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,26 @@
+import numpy as np
+
+
+def top_k_scores(indices, scores, k):
+    """Pick the k best (index, score) pairs, best first.
+
+    Uses `argpartition` so only the candidates are sorted, never the whole row.
+    Ties are broken by the lower document index, which keeps every scorer that
+    goes through here (single query, batch, shards) in exactly the same order.
+    """
+    indices = np.asarray(indices)
+    scores = np.asarray(scores)
+    if k <= 0 or not len(scores):
+        return indices[:0], scores[:0]
+
+    if k < len(scores):
+        part = np.argpartition(scores, len(scores) - k)[len(scores) - k:]
+        kth = scores[part].min()
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)
+        ties = ties[np.argsort(indices[ties], kind='stable')][:k - len(above)]
+        keep = np.concatenate([above, ties])
+        indices, scores = indices[keep], scores[keep]
+
+    order = np.lexsort((indices, -scores))
+    return indices[order], scores[order]
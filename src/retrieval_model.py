@@ -1,161 +1,555 @@
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import os
-import re
 import pickle
+import threading
+import logging
+import numpy as np
 from pathlib import Path
-from deep_translator import GoogleTranslator
-from langdetect import detect, DetectorFactory
-
-# Ensure consistent language detection
-DetectorFactory.seed = 0
-
-# Supported languages
-SUPPORTED_LANGUAGES = ['en', 'es', 'hi', 'fr']
-
-# Medical terms for language detection enhancement
-MEDICAL_TERMS = {
-    'en': ["symptom", "treatment", "diagnosis", "disease", "medicine",
-           "fever", "pain", "blood pressure", "hypertension", "diabetes"],
-    'es': ["síntoma", "tratamiento", "diagnóstico", "enfermedad", "medicina",
-           "fiebre", "dolor", "presión arterial", "hipertensión", "diabetes"],
-    'hi': ["लक्षण", "उपचार", "निदान", "रोग", "दवा",
-           "बुखार", "दर्द", "रक्तचाप", "उच्च रक्तचाप", "मधुमेह"],
-    'fr': ["symptôme", "traitement", "diagnostic", "maladie", "médecine",
-           "fièvre", "douleur", "pression artérielle", "hypertension", "diabète"]
+from src import index_store, metrics
+from src.answer_translations import AnswerTranslationStore
+from src.bm25 import BM25Index
+from src.dedup import collapse_near_duplicates
+from src.dense_index import fit_dense_index, load_dense_index
+from src.incremental_index import IncrementalIndex
+from src.language_detection import MEDICAL_TERMS, SUPPORTED_LANGUAGES, detect_language
+from src.native_index import load_native_indexes
+from src.ner_model import load_entity_index
+from src.ranking import top_k_scores
+from src.sharded_search import ShardedSearch
+from src.text_normalization import clean_series, clean_text
+from src.translation import ChunkedTranslator, get_default_cache, google_translate
+
+# Scoring engines and the minimum score an answer needs to be returned.
+# Cosine similarity lives in [0, 1]; BM25 scores are unbounded sums of IDF-weighted
+# term impacts, so its cut-off is roughly "more than one common term matched".
+# Dense (LSA) cosines run higher than sparse ones, because unrelated questions still
+# share topic directions. 'hybrid' is a weighted mean of the dense and TF-IDF cosines:
+# at the default equal weights, a row no sparse term matched needs a dense score of 0.6.
+SCORE_THRESHOLDS = {
+    'tfidf': 0.3,
+    'bm25': 3.0,
+    'dense': 0.6,
+    'hybrid': 0.3,
 }
+# Candidates taken from each side before hybrid scores are fused.
+HYBRID_POOL = 50
+
+logger = logging.getLogger(__name__)
+
+ENGLISH = SUPPORTED_LANGUAGES.index('en')
+
+
+def _lang_column(langs):
+    """Row languages as a categorical over SUPPORTED_LANGUAGES: int8 codes, anything else is NaN."""
+    return pd.Categorical(langs, categories=SUPPORTED_LANGUAGES)
 
 class MedicalQARetrievalModel:
-    def __init__(self, data_path="data/processed_medquad_qa.csv"):
+    def __init__(self, data_path=index_store.DEFAULT_DATA_PATH, dedup_threshold=None, **runtime):
+        """dedup_threshold: collapse questions at least this similar into one row (see `src/dedup.py`)."""
         self.data_path = data_path
+        self.dedup_threshold = dedup_threshold
         self.df = None
         self.vectorizer = TfidfVectorizer(
             ngram_range=(1, 3),
             max_features=50000,
-            stop_words='english'
+            stop_words='english',
+            dtype=np.float32
         )
         self.question_vector = None
+        # Text columns left on disk by `load_index` ('question', 'question_clean', 'answer').
+        self.text_stores = {}
         self.model_dir = "model"
         Path(self.model_dir).mkdir(exist_ok=True)
-        self.translator = GoogleTranslator()
+        self._init_runtime(**runtime)
 
         self._load_data()
+        if dedup_threshold:
+            self._collapse_duplicates()
         self._build_vectorizer()
 
+    def _init_runtime(self, engine='tfidf', translator=None, translation_cache=None, answer_translations=None,
+                      nprobe=None, dense_weight=0.5, shards=1, shard_workers=None, entity_filter=True):
+        """Set up per-process state that is never saved with the model.
+
+        engine: 'tfidf', 'bm25', 'dense' or 'hybrid'. translator: callable (text, src, dest) -> str.
+        translation_cache: a TranslationCache, defaulting to the shared one.
+        answer_translations: an AnswerTranslationStore, defaulting to the prebuilt one if present.
+        nprobe: IVF lists scanned per dense query (more is slower but closer to exhaustive).
+        dense_weight: weight of the dense cosine in 'hybrid' scores, the rest going to TF-IDF.
+        shards: split TF-IDF scoring over this many row shards scored in `shard_workers` processes
+        (see `src/sharded_search.py`); needs a model opened with `load_index`.
+        entity_filter: score TF-IDF queries that mention a known entity against the questions
+        sharing it only, when the index has an entity index (see `src/ner_model.py`).
+        """
+        if engine not in SCORE_THRESHOLDS:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {list(SCORE_THRESHOLDS)}")
+        self.engine = engine
+        self.nprobe = nprobe
+        self.dense_weight = dense_weight
+        self.bm25_index = None
+        self.dense_index = None
+        self.shards = shards
+        self.shard_workers = shard_workers
+        self.sharded_search = None
+        self.entity_filter = entity_filter
+        self.entity_index = None
+        self.native_indexes = {}
+        self.updates = None
+        self._compaction_thread = None
+        # Held while scores are turned into rows, so a compaction cannot swap rows in between.
+        self.index_lock = threading.RLock()
+        self.translate_fn = translator or google_translate
+        self.chunked_translator = ChunkedTranslator(self.translate_fn)
+        self.translation_cache = translation_cache if translation_cache is not None else get_default_cache()
+        self.answer_translations = (
+            answer_translations if answer_translations is not None else AnswerTranslationStore.open_default()
+        )
+
     def _load_data(self):
         if not os.path.exists(self.data_path):
             raise FileNotFoundError(f"Data file not found: {self.data_path}")
 
-        print(f"Loading data from {self.data_path} for retrieval model...")
-        self.df = pd.read_csv(self.data_path)
+        logger.info("Loading data from %s for retrieval model...", self.data_path)
+        if self.data_path.endswith('.parquet'):
+            self.df = pd.read_parquet(self.data_path)
+        else:
+            self.df = pd.read_csv(self.data_path)
 
         if self.df.empty:
             raise ValueError("Data file is empty")
 
         if 'lang' not in self.df.columns:
             self.df['lang'] = 'en'
+        self.df['lang'] = _lang_column(self.df['lang'])
 
-        self.df['question_clean'] = self.df.apply(
-            lambda row: self._clean_text(row['question'], row['lang']), axis=1
-        )
-        print(f"Loaded {len(self.df)} Q&A pairs.")
+        self.df['question_clean'] = clean_series(self.df['question'], self.df['lang']).to_numpy()
+        logger.info("Loaded %d Q&A pairs.", len(self.df))
+
+    def _collapse_duplicates(self):
+        n_pairs = len(self.df)
+        self.df = collapse_near_duplicates(self.df, self.dedup_threshold,
+                                           analyzer=self.vectorizer.build_analyzer())
+        logger.info("Collapsed %d Q&A pairs into %d questions (threshold %.2f)",
+                    n_pairs, len(self.df), self.dedup_threshold)
 
     def _clean_text(self, text, lang='en'):
-        if not isinstance(text, str):
-            return ""
-        text = text.lower()
-        if lang == 'hi':
-            text = re.sub(r'[^\u0900-\u097F\s.]', '', text)
-        else:
-            text = re.sub(r'[^\u0041-\u007A\u00C0-\u017F\s.]', '', text)
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text
+        return clean_text(text, lang)
 
     def _build_vectorizer(self):
-        print("Building tf-idf vectorizer...")
+        logger.info("Building tf-idf vectorizer...")
         self.question_vector = self.vectorizer.fit_transform(self.df['question_clean'])
-        print("TF-IDF vectorizer built successfully")
+        logger.info("TF-IDF vectorizer built successfully")
 
     def detect_language(self, text):
-        if not text.strip():
-            return 'en'
-        try:
-            lang = detect(text)
-            if lang in SUPPORTED_LANGUAGES:
-                return lang
-            text_lower = text.lower()
-            for lang_code, terms in MEDICAL_TERMS.items():
-                if any(term in text_lower for term in terms):
-                    return lang_code
-        except Exception as e:
-            print(f"Language detection error: {e}")
-        return 'en'
+        return detect_language(text)
 
     def translate_text(self, text, src, dest):
-        """Translate long texts using deep_translator with chunking."""
+        """Translate long texts in concurrent sentence-aligned chunks, going through the translation cache."""
         if src == dest or not text.strip():
             return text
 
+        cached = self.translation_cache.get(src, dest, text)
+        if cached is not None:
+            metrics.TRANSLATIONS.inc(src=src, dest=dest, outcome='cache_hit')
+            return cached
+
         try:
-            chunks = [text[i:i + 450] for i in range(0, len(text), 450)]
-            translator = GoogleTranslator(source=src, target=dest)
-            translated_chunks = [translator.translate(chunk) for chunk in chunks]
-            final_translation = ' '.join(translated_chunks)
-            print(f"Translated from {src} to {dest}: {final_translation}")
+            final_translation, failed_chunks = self.chunked_translator.translate(text, src, dest)
+            if failed_chunks:
+                logger.warning("Translation: %d chunk(s) left untranslated", failed_chunks)
+                metrics.TRANSLATIONS.inc(src=src, dest=dest, outcome='partial')
+            else:
+                self.translation_cache.put(src, dest, text, final_translation)
+                metrics.TRANSLATIONS.inc(src=src, dest=dest, outcome='translated')
+            logger.debug("Translated from %s to %s: %.200s", src, dest, final_translation)
             return final_translation
         except Exception as e:
-            print(f"Translation failed: {e}")
+            logger.warning("Translation failed: %s", e)
+            metrics.TRANSLATIONS.inc(src=src, dest=dest, outcome='failed')
+            metrics.FALLBACKS.inc(reason='untranslated')
             return text
 
+    def _prepare_query(self, user_query, user_lang):
+        """Return the cleaned English form of a query in `user_lang`."""
+        if user_lang != 'en':
+            with metrics.stage('translate_query'):
+                en_query = self.translate_text(user_query, user_lang, 'en')
+        else:
+            en_query = user_query
+        logger.debug("Query (en): %s", en_query)
 
-    def get_answer(self, user_query, top_k=1):
-        user_lang = self.detect_language(user_query)
-        print(f"Detected language: {user_lang}")
+        with metrics.stage('clean'):
+            return self._clean_text(en_query, 'en')
 
-        en_query = self.translate_text(user_query, user_lang, 'en') if user_lang != 'en' else user_query
-        print(f"Query (en): {en_query}")
+    def get_bm25_index(self):
+        if self.bm25_index is None:
+            logger.info("Building BM25 inverted index...")
+            self.bm25_index = BM25Index(self._texts('question_clean'))
+        return self.bm25_index
 
-        cleaned_query = self._clean_text(en_query, 'en')
-        if not cleaned_query:
-            fallback = "Please ask a valid medical question."
-            return [{"answer": self.translate_text(fallback, 'en', user_lang), "similarity_score": 0.0}], user_lang
+    def get_dense_index(self):
+        if self.dense_index is None:
+            logger.info("Fitting dense index...")
+            self.dense_index = fit_dense_index(self.question_vector, self.vectorizer, self._texts('answer'))
+        return self.dense_index
 
-        query_vector = self.vectorizer.transform([cleaned_query])
-        similarities = cosine_similarity(query_vector, self.question_vector).flatten()
-        top_k_indices = similarities.argsort()[-top_k:][::-1]
+    def get_sharded_search(self):
+        """The shard pool for TF-IDF scoring, or None when scoring stays in this process."""
+        if self.shards <= 1 or self.updates is not None:
+            return None  # appended and compacted rows only exist in memory
+        if self.sharded_search is None:
+            index_dir = getattr(self, 'index_dir', None)
+            if index_dir is None:
+                logger.warning("Sharded scoring needs a model opened with load_index; scoring in-process.")
+                self.shards = 1
+                return None
+            self.sharded_search = ShardedSearch(index_dir, self.shards, self.shard_workers)
+        return self.sharded_search
 
-        for idx in top_k_indices:
-            score = similarities[idx]
-            row = self.df.iloc[idx]
+    def _score_queries(self, cleaned_queries, top_k, engine=None):
+        """Score a batch of cleaned queries, returning (indices, scores) per query.
+
+        For TF-IDF this is one sparse-by-sparse product: both sides are L2-normalised
+        rows, so the dot product is the cosine similarity, and only the non-zero
+        entries of each row can be candidates.
+        """
+        engine = engine or self.engine
+        with self.index_lock:
+            self._refresh_index()
+            if engine == 'bm25':
+                bm25 = self.get_bm25_index()
+                with metrics.stage('bm25_search'):
+                    return [bm25.search(query, top_k) for query in cleaned_queries]
+
+            with metrics.stage('vectorize'):
+                query_matrix = self.vectorizer.transform(cleaned_queries)
+            if engine == 'dense':
+                dense = self.get_dense_index()
+                with metrics.stage('dense_search'):
+                    return dense.search_batch(dense.embed(query_matrix), top_k, self.nprobe)
+            if engine == 'tfidf':
+                return self._tfidf_search(cleaned_queries, query_matrix, top_k)
+            with metrics.stage('similarity'):
+                scores = query_matrix @ self.question_vector.T
+            return self._hybrid_search(query_matrix, scores, top_k)
+
+    def _tfidf_search(self, cleaned_queries, query_matrix, top_k):
+        """Score against the questions sharing an entity with the query, or every question if it has none.
+
+        Entity filtering is off while incremental updates are on: new rows are not in the entity index.
+        """
+        candidates = [None] * len(cleaned_queries)
+        if self.entity_filter and self.entity_index is not None and self.updates is None:
+            with metrics.stage('entity_tagging'):
+                candidates = [self.entity_index.candidates(query) for query in cleaned_queries]
+        full = [i for i, rows in enumerate(candidates) if rows is None]
+        filtered = [i for i, rows in enumerate(candidates) if rows is not None]
+        metrics.ENTITY_FILTER.inc(len(filtered), outcome='filtered')
+        metrics.ENTITY_FILTER.inc(len(full), outcome='full')
+
+        results = [None] * len(cleaned_queries)
+        if full:
+            ranked = self._score_all(query_matrix if not filtered else query_matrix[full], top_k)
+            for i, result in zip(full, ranked):
+                results[i] = result
+        if filtered:
+            with metrics.stage('entity_search'):
+                for i in filtered:
+                    rows = candidates[i]
+                    scores = (query_matrix[i] @ self.question_vector[rows].T).tocsr()
+                    results[i] = top_k_scores(rows[scores.indices], scores.data, top_k)
+        return results
+
+    def _score_all(self, query_matrix, top_k):
+        sharded = self.get_sharded_search()
+        if sharded is not None:
+            with metrics.stage('sharded_search'):
+                return sharded.search(query_matrix, top_k)
+        with metrics.stage('similarity'):
+            scores = query_matrix @ self.question_vector.T
+        with metrics.stage('top_k'):
+            return self._top_k_rows(scores, top_k)
+
+    def _hybrid_search(self, query_matrix, sparse_scores, top_k):
+        """Fuse dense and TF-IDF cosines over the union of both sides' best candidates.
+
+        Each side's candidates are scored on the other side too (a sparse row that was
+        never matched scores 0), so the fused score does not depend on which side found the row.
+        """
+        dense = self.get_dense_index()
+        pool = max(top_k, HYBRID_POOL)
+        weight = self.dense_weight
+        sparse_scores = sparse_scores.tocsr()
+        sparse_scores.sort_indices()
+        with metrics.stage('dense_search'):
+            embeddings = dense.embed(query_matrix)
+            dense_hits = dense.search_batch(embeddings, pool, self.nprobe)
+        results = []
+        with metrics.stage('top_k'):
+            for i, (dense_rows, _) in enumerate(dense_hits):
+                start, end = sparse_scores.indptr[i], sparse_scores.indptr[i + 1]
+                sparse_rows, sparse_values = sparse_scores.indices[start:end], sparse_scores.data[start:end]
+                sparse_top, _ = top_k_scores(sparse_rows, sparse_values, pool)
+                candidates = np.union1d(sparse_top, dense_rows).astype(sparse_rows.dtype, copy=False)
+                # Sparse score of each candidate: its entry in the sorted row, or 0.
+                position = np.searchsorted(sparse_rows, candidates)
+                hit = position < len(sparse_rows)
+                hit[hit] = sparse_rows[position[hit]] == candidates[hit]
+                sparse_part = np.zeros(len(candidates), dtype=np.float32)
+                sparse_part[hit] = sparse_values[position[hit]]
+                fused = weight * dense.score_rows(embeddings[i], candidates) + (1 - weight) * sparse_part
+                results.append(top_k_scores(candidates, fused, top_k))
+        return results
+
+    @staticmethod
+    def _top_k_rows(scores, top_k):
+        scores = scores.tocsr()
+        results = []
+        for i in range(scores.shape[0]):
+            start, end = scores.indptr[i], scores.indptr[i + 1]
+            results.append(top_k_scores(scores.indices[start:end], scores.data[start:end], top_k))
+        return results
+
+    def _find_answer(self, top_indices, top_scores, threshold):
+        """Return (answer text, score) of the best acceptable row, or None. Call under `index_lock`."""
+        lang_codes = self.df['lang'].cat.codes.to_numpy()
+        for idx, score in zip(top_indices, top_scores):
+            if self.updates is not None and not self.updates.live[idx]:
+                continue  # deleted, waiting for compaction
 
             # Ensure we only translate clean English answers
-            if row['lang'] != 'en':
+            if lang_codes[idx] != ENGLISH:
                 continue  # skip non-English sources for better translations
 
-            if score > 0.3:
-                answer = row['answer']
-                answer_translated = self.translate_text(answer, 'en', user_lang) if user_lang != 'en' else answer
-                return [{"answer": answer_translated, "similarity_score": float(score)}], user_lang
+            if score > threshold:
+                return self._answer_text(idx), float(score)
+        return None
+
+    def _format_answer(self, user_lang, hit):
+        if hit is None:
+            metrics.FALLBACKS.inc(reason='no_match')
+            fallback = "I couldn't find a relevant answer. Try rephrasing."
+            return [{"answer": self.translate_text(fallback, 'en', user_lang), "similarity_score": 0.0}], user_lang
+
+        answer, score = hit
+        with metrics.stage('translate_answer'):
+            answer_translated = self._translate_answer(answer, user_lang)
+        return [{"answer": answer_translated, "similarity_score": score}], user_lang
+
+    def _rank_and_find(self, cleaned_queries, top_k):
+        """Score cleaned English queries and resolve each to its answer hit (or None)."""
+        with self.index_lock:
+            ranked = self._score_queries(cleaned_queries, top_k)
+            threshold = SCORE_THRESHOLDS[self.engine]
+            with metrics.stage('answer_lookup'):
+                for _, top_scores in ranked:
+                    metrics.TOP_SCORES.observe(float(top_scores[0]) if len(top_scores) else 0.0, engine=self.engine)
+                return [self._find_answer(top_indices, top_scores, threshold) for top_indices, top_scores in ranked]
+
+    def _search_native(self, queries, user_langs, top_k):
+        """Answer queries straight from their own language's question index, with no query translation.
+
+        Returns {query position: result} for the queries that found a good native match.
+        """
+        found = self._native_hits(queries, user_langs, top_k)
+        return {i: self._format_answer(user_langs[i], hit) for i, hit in found.items()}
+
+    def _native_hits(self, queries, user_langs, top_k):
+        """{query position: answer hit} for the queries with a good match in their native index."""
+        by_lang = {}
+        for i, user_lang in enumerate(user_langs):
+            if user_lang in self.native_indexes:
+                by_lang.setdefault(user_lang, []).append(i)
+
+        found = {}
+        with self.index_lock:
+            for user_lang, positions in by_lang.items():
+                native = self.native_indexes.get(user_lang)
+                if native is None:
+                    continue
+                with metrics.stage('native_search'):
+                    query_matrix = native.transform([queries[i] for i in positions])
+                    ranked = self._top_k_rows(query_matrix @ native.question_vector.T, top_k)
+                for i, (top_indices, top_scores) in zip(positions, ranked):
+                    metrics.TOP_SCORES.observe(float(top_scores[0]) if len(top_scores) else 0.0, engine='native')
+                    hit = self._find_answer(top_indices, top_scores, SCORE_THRESHOLDS['tfidf'])
+                    if hit is not None:
+                        found[i] = hit
+        return found
 
-        fallback = "I couldn't find a relevant answer. Try rephrasing."
+    def _translate_answer(self, answer, user_lang):
+        """Prefer the offline pre-translated store; translate live only on a miss."""
+        if user_lang == 'en':
+            return answer
+        if self.answer_translations is not None:
+            translated = self.answer_translations.get(user_lang, answer)
+            if translated is not None:
+                metrics.TRANSLATIONS.inc(src='en', dest=user_lang, outcome='store_hit')
+                return translated
+        return self.translate_text(answer, 'en', user_lang)
+
+    def _empty_query_answer(self, user_lang):
+        metrics.FALLBACKS.inc(reason='empty_query')
+        fallback = "Please ask a valid medical question."
         return [{"answer": self.translate_text(fallback, 'en', user_lang), "similarity_score": 0.0}], user_lang
 
+    def get_answer(self, user_query, top_k=1):
+        return self.get_answers([user_query], top_k)[0]
+
+    def get_answers(self, queries, top_k=1):
+        """Answer a list of queries, returning one (results, detected language) pair per query.
+
+        Queries with a native-language index are tried there first; the rest, and native
+        misses, are translated to English and vectorised and scored together in one batch.
+        """
+        with metrics.trace_queries(queries):
+            with metrics.stage('detect_language'):
+                user_langs = [self.detect_language(query) for query in queries]
+            logger.debug("Detected languages: %s", user_langs)
+
+            results = self._search_native(queries, user_langs, top_k) if self.native_indexes else {}
+            for i in results:
+                metrics.QUERIES.inc(lang=user_langs[i], route='native')
+            remaining = [i for i in range(len(queries)) if i not in results]
+            cleaned = {i: self._prepare_query(queries[i], user_langs[i]) for i in remaining}
+
+            to_score = [i for i in remaining if cleaned[i]]
+            hits = dict(zip(to_score, self._rank_and_find([cleaned[i] for i in to_score], top_k))) if to_score else {}
+            for i in remaining:
+                if i not in hits:
+                    results[i] = self._empty_query_answer(user_langs[i])
+                    metrics.QUERIES.inc(lang=user_langs[i], route='empty')
+                else:
+                    results[i] = self._format_answer(user_langs[i], hits[i])
+                    metrics.QUERIES.inc(lang=user_langs[i], route='english')
+            return [results[i] for i in range(len(queries))]
+
+    def enable_updates(self):
+        """Switch the index to incremental mode (see `src/incremental_index.py`).
+
+        Documents get a stable `doc_id`; row positions change when deleted rows are compacted.
+        """
+        with self.index_lock:
+            if self.updates is None:
+                if self.sharded_search is not None:
+                    self.sharded_search.close()
+                    self.sharded_search = None
+                # Appended and compacted rows no longer line up with the on-disk stores.
+                answers = self.text_stores.get('answer')
+                if answers is not None:
+                    self.df['answers'] = [answers.group(i) for i in range(len(answers))]
+                    self.df['answer_ids'] = [answers.group_ids(i) for i in range(len(answers))]
+                for column in list(self.text_stores):
+                    self.df[column] = self._texts(column)
+                self.text_stores = {}
+                if 'doc_id' not in self.df.columns:
+                    self.df['doc_id'] = np.arange(len(self.df))
+                self.updates = IncrementalIndex(self.vectorizer, self.question_vector, lock=self.index_lock)
+            return self.updates
+
+    def add_documents(self, questions, answers, lang='en'):
+        """Append Q&A pairs without refitting; returns their doc ids."""
+        updates = self.enable_updates()
+        langs = [lang] * len(questions) if isinstance(lang, str) else list(lang)
+        cleaned = clean_series(list(questions), langs).tolist()
+        with self.index_lock:
+            updates.add(cleaned)
+            next_id = int(self.df['doc_id'].max()) + 1 if len(self.df) else 0
+            doc_ids = np.arange(next_id, next_id + len(questions))
+            new_rows = pd.DataFrame({
+                'question': list(questions), 'answer': list(answers), 'lang': _lang_column(langs),
+                'question_clean': cleaned, 'doc_id': doc_ids,
+            })
+            if 'answers' in self.df.columns:
+                new_rows['answers'] = [[answer] for answer in answers]
+                new_rows['answer_ids'] = [[-1] for _ in answers]
+            self.df = pd.concat([self.df, new_rows], ignore_index=True)
+            self.bm25_index = None
+            self.dense_index = None
+        return doc_ids.tolist()
+
+    def delete_documents(self, doc_ids):
+        """Tombstone documents by doc id; returns how many were deleted."""
+        updates = self.enable_updates()
+        with self.index_lock:
+            rows = np.flatnonzero(self.df['doc_id'].isin(list(doc_ids)).to_numpy())
+            deleted = updates.delete(rows)
+            self.bm25_index = None
+        if deleted and updates.needs_compaction():
+            self._start_compaction()
+        return deleted
+
+    def _start_compaction(self):
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        self._compaction_thread = threading.Thread(target=self.compact, name="index-compaction", daemon=True)
+        self._compaction_thread.start()
+
+    def compact(self):
+        """Drop deleted rows now. Runs in the background once enough rows are tombstoned."""
+        if self.updates is None:
+            return False
+
+        def swap(keep):
+            self.df = self.df[keep].reset_index(drop=True)
+            self.bm25_index = None
+            self.dense_index = None
+            # Native indexes are aligned to the original row order.
+            self.native_indexes = {}
+
+        return self.updates.compact(swap)
+
+    def _refresh_index(self):
+        if self.updates is not None:
+            refreshed = self.updates.refresh()
+            if refreshed is not None:
+                self.question_vector, self.vectorizer.idf_ = refreshed
+
+    def _answer_text(self, idx):
+        store = self.text_stores.get('answer')
+        if store is not None:
+            return store[idx]
+        return self.df['answer'].iloc[idx]
+
+    def _texts(self, column):
+        """A text column of the corpus, decoded from its on-disk store if the index was loaded lazily."""
+        if column in self.text_stores:
+            return pd.Series(list(self.text_stores[column]), dtype=object)
+        return self.df[column]
+
+    def _corpus_frame(self):
+        """The corpus as one self-contained frame: texts read back from the on-disk stores
+        and, for a collapsed index, each row's answer group in `answers` and `answer_ids`."""
+        df = self.df.copy()
+        answers = self.text_stores.get('answer')
+        if answers is not None:
+            df['answers'] = [answers.group(i) for i in range(len(answers))]
+            df['answer_ids'] = [answers.group_ids(i) for i in range(len(answers))]
+        for column in ('question', 'question_clean', 'answer'):
+            df[column] = self._texts(column).to_numpy()
+        return df
+
     def save_model(self, path=None):
         if not path:
             path = os.path.join(self.model_dir, "retrieval_model.pkl")
+        if self.updates is not None:
+            self.compact()
+            self._refresh_index()
+        # A model opened with `load_index` keeps its texts on disk; pickle them too.
         model_data = {
             'vectorizer': self.vectorizer,
             'question_vector': self.question_vector,
-            'df': self.df
+            'df': self._corpus_frame(),
+            'dedup_threshold': getattr(self, 'dedup_threshold', None),
         }
         with open(path, 'wb') as f:
             pickle.dump(model_data, f)
-        print(f"Model saved to {path}")
+        logger.info("Model saved to %s", path)
         return path
 
     @classmethod
-    def load_model(cls, path="model/retrieval_model.pkl"):
+    def load_model(cls, path="model/retrieval_model.pkl", **runtime):
         if not os.path.exists(path):
             raise FileNotFoundError(f"Model file not found: {path}")
         with open(path, 'rb') as f:
@@ -165,14 +559,102 @@ class MedicalQARetrievalModel:
         model.vectorizer = model_data['vectorizer']
         model.question_vector = model_data['question_vector']
         model.df = model_data['df']
+        model.df['lang'] = _lang_column(model.df['lang'])
+        model.text_stores = {}
+        model.dedup_threshold = model_data.get('dedup_threshold')
         model.model_dir = os.path.dirname(path)
-        model.translator = GoogleTranslator()
+        model._init_runtime(**runtime)
+
+        logger.info("Model loaded from %s", path)
+        return model
+
+    def _vectorizer_params(self):
+        params = self.vectorizer.get_params()
+        return {
+            'ngram_range': list(params['ngram_range']),
+            'max_features': params['max_features'],
+            'stop_words': params['stop_words'],
+        }
+
+    def save_index(self, index_dir=None):
+        """Write the memory-mappable index described in `src/index_store.py`."""
+        if not index_dir:
+            index_dir = os.path.join(self.model_dir, "index")
+        if self.updates is not None:
+            self.compact()
+            self._refresh_index()
+        index_store.save_index(
+            index_dir, self.question_vector, self.vectorizer.vocabulary_, self.vectorizer.idf_,
+            self._corpus_frame(), self._vectorizer_params(), source_path=getattr(self, 'data_path', None),
+            dedup_threshold=getattr(self, 'dedup_threshold', None)
+        )
+        logger.info("Index saved to %s", index_dir)
+        return index_dir
+
+    @classmethod
+    def load_index(cls, index_dir=index_store.DEFAULT_INDEX_DIR, **runtime):
+        parts = index_store.load_index(index_dir)
+        params = parts['manifest']['vectorizer']
 
-        print(f"Model loaded from {path}")
+        model = cls.__new__(cls)
+        model.vectorizer = TfidfVectorizer(
+            ngram_range=tuple(params['ngram_range']),
+            max_features=params['max_features'],
+            stop_words=params['stop_words'],
+            dtype=np.float32
+        )
+        model.vectorizer.vocabulary_ = parts['vocabulary']
+        model.vectorizer.idf_ = parts['idf']
+        model.question_vector = parts['question_vector']
+        # Only the int8 language codes live in memory; texts are read from the stores by row id.
+        languages = parts['manifest']['languages']
+        model.df = pd.DataFrame({'lang': _lang_column(pd.Categorical.from_codes(parts['lang_codes'], languages))})
+        model.text_stores = {
+            'question': parts['questions'],
+            'question_clean': parts['questions_clean'],
+            'answer': parts['answers'],
+        }
+        source = parts['manifest'].get('source') or {}
+        model.data_path = source.get('path')
+        model.dedup_threshold = parts['manifest'].get('dedup_threshold')
+        model.index_dir = index_dir
+        model.model_dir = os.path.dirname(os.path.normpath(index_dir))
+        model._init_runtime(**runtime)
+        model.native_indexes = load_native_indexes(index_dir, len(model.df))
+        model.entity_index = load_entity_index(index_dir, len(model.df))
+        # Start the shard workers now, while this process has no threads of its own yet.
+        model.get_sharded_search()
+        model.dense_index = load_dense_index(index_dir, len(model.df))
+
+        logger.info("Index loaded from %s (%d Q&A pairs)", index_dir, len(model.df))
         return model
 
+    @classmethod
+    def build_if_stale(cls, data_path=index_store.DEFAULT_DATA_PATH, index_dir=index_store.DEFAULT_INDEX_DIR,
+                       dedup_threshold=None):
+        """Rebuild the index if it is missing or stale; returns whether it did.
+
+        dedup_threshold defaults to the one the existing index was collapsed at, so a
+        rebuild keeps the index's build options.
+        """
+        if dedup_threshold is None:
+            dedup_threshold = index_store.built_dedup_threshold(index_dir)
+        if not index_store.index_is_stale(index_dir, data_path, dedup_threshold):
+            return False
+        logger.info("Index at %s is missing or stale; rebuilding from %s", index_dir, data_path)
+        cls(data_path=data_path, dedup_threshold=dedup_threshold).save_index(index_dir)
+        return True
+
+    @classmethod
+    def load_or_build(cls, data_path=index_store.DEFAULT_DATA_PATH, index_dir=index_store.DEFAULT_INDEX_DIR,
+                      dedup_threshold=None, **runtime):
+        """Open the prebuilt index, rebuilding it first if it is missing or stale (see `build_if_stale`)."""
+        cls.build_if_stale(data_path, index_dir, dedup_threshold)
+        return cls.load_index(index_dir, **runtime)
+
 # For testing
 if __name__ == "__main__":
+    metrics.configure_logging()
     model = MedicalQARetrievalModel()
     queries = [
         "what are symptoms of diabetes",                    # English
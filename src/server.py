@@ -0,0 +1,452 @@
+"""
+Headless JSON API in front of `MedicalQARetrievalModel`.
+
+    python -m src.server --index model/index --port 8000 --workers 2
+
+    POST /answer  {"query": "...", "top_k": 1}  ->  {"query", "lang", "results"}
+    GET  /health
+    GET  /metrics                                   Prometheus text format (see `src/metrics.py`)
+
+Built on asyncio streams alone, so it needs no web framework. Each request goes
+through the same stages as `get_answers`, but each stage runs where it belongs:
+
+- Language detection, query translation and answer translation run in a thread
+  pool off the event loop. Many requests' translations are in flight at once.
+- Vectorisation and scoring go through a `MicroBatcher`. It collects the cleaned
+  queries that arrive within `batch_window` seconds, up to `max_batch`, and
+  scores them with one sparse product on a dedicated thread. There is one
+  batcher for the English index and one for the native-language indexes.
+- Backpressure: once `max_pending` requests are in flight, new ones get an
+  immediate 503 with Retry-After instead of queueing without bound. Requests
+  that take longer than `request_timeout` get a 504.
+
+With `--workers N` the parent makes sure the on-disk index is up to date, binds
+the socket, and forks N worker processes that accept on it. Every worker opens
+the same memory-mapped index (see `src/index_store.py`), so the matrix and the
+text stores are shared through the page cache. Only the vocabulary and the
+small per-row arrays are held per process. Metrics are per process as well:
+/metrics reports the worker that happened to accept the scrape.
+
+For local load tests, `--translator stub` replaces Google Translate with the
+offline `StubTranslator` (`src/translation.py`) and its fixed, injected latency, so
+non-English requests do not depend on the network:
+
+    python -m src.server --index model/index --workers 2 --translator stub --translator-latency-ms 20
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import multiprocessing
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from src import index_store, metrics
+from src.dense_index import build_dense_index, load_dense_index
+from src.retrieval_model import MedicalQARetrievalModel
+from src.translation import StubTranslator, TranslationCache
+
+MAX_BODY_BYTES = 64 * 1024
+MAX_TOP_K = 10
+
+logger = logging.getLogger(__name__)
+
+HTTP_REQUESTS = metrics.REGISTRY.counter("medqa_http_requests_total", "HTTP requests by route and status.",
+                                         ("route", "status"))
+BATCH_SIZES = metrics.REGISTRY.histogram("medqa_batch_size", "Queries per scoring micro-batch.",
+                                         metrics.BATCH_SIZE_BUCKETS, ("index",))
+
+
+class MicroBatcher:
+    """Gather concurrent submissions and run `fn(items) -> results` on them in batches.
+
+    A batch is closed `window` seconds after its first item arrives, or as soon as
+    `max_batch` items are waiting. Batches run one at a time on `executor`, and
+    items that arrive meanwhile form the next batch.
+    """
+
+    def __init__(self, name, fn, executor, max_batch=64, window=0.005):
+        self.name = name
+        self.fn = fn
+        self.executor = executor
+        self.max_batch = max_batch
+        self.window = window
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.items = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((item, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            if self.queue.qsize() < self.max_batch - 1:
+                await asyncio.sleep(self.window)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            # Requests that timed out while waiting need no work.
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            BATCH_SIZES.observe(len(batch), index=self.name)
+            try:
+                results = await loop.run_in_executor(self.executor, self.fn, [item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+def _by_top_k(items, top_k_of):
+    groups = {}
+    for position, item in enumerate(items):
+        groups.setdefault(top_k_of(item), []).append(position)
+    return groups.items()
+
+
+class AnswerService:
+    """The asyncio request pipeline around one loaded model."""
+
+    def __init__(self, model, max_batch=64, batch_window=0.005, max_pending=256, translate_workers=32,
+                 request_timeout=30.0):
+        self.model = model
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.max_pending = max_pending
+        self.request_timeout = request_timeout
+        self.pending = 0
+        self.rejected = 0
+        # One scoring thread: batches are scored under the model's index lock anyway.
+        self.score_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="score")
+        self.io_executor = ThreadPoolExecutor(max_workers=translate_workers, thread_name_prefix="request")
+        self.english = None
+        self.native = None
+
+    async def start(self):
+        self.english = MicroBatcher('english', self._score_english, self.score_executor, self.max_batch,
+                                    self.batch_window)
+        self.native = MicroBatcher('native', self._score_native, self.score_executor, self.max_batch,
+                                   self.batch_window)
+        self.english.start()
+        self.native.start()
+
+    async def stop(self):
+        await self.english.stop()
+        await self.native.stop()
+        self.score_executor.shutdown(wait=False, cancel_futures=True)
+        self.io_executor.shutdown(wait=False, cancel_futures=True)
+
+    def _score_english(self, items):
+        """items: (cleaned English query, top_k) -> answer hit or None for each."""
+        hits = [None] * len(items)
+        for top_k, positions in _by_top_k(items, lambda item: item[1]):
+            found = self.model._rank_and_find([items[i][0] for i in positions], top_k)
+            for i, hit in zip(positions, found):
+                hits[i] = hit
+        return hits
+
+    def _score_native(self, items):
+        """items: (query, lang, top_k) -> answer hit from the native index, or None."""
+        hits = [None] * len(items)
+        for top_k, positions in _by_top_k(items, lambda item: item[2]):
+            found = self.model._native_hits([items[i][0] for i in positions], [items[i][1] for i in positions], top_k)
+            for n, i in enumerate(positions):
+                hits[i] = found.get(n)
+        return hits
+
+    async def _offload(self, fn, *args):
+        # Carry the request's trace into the pool thread.
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(self.io_executor, context.run, fn, *args)
+
+    async def answer(self, query, top_k=1):
+        """Same result as `model.get_answer(query, top_k)`."""
+        model = self.model
+        with metrics.trace_queries([query]):
+            with metrics.stage('detect_language'):
+                lang = await self._offload(model.detect_language, query)
+
+            hit = None
+            if lang in model.native_indexes:
+                # Queueing plus the shared batch's scoring time, as this request saw it.
+                with metrics.stage('native_batch'):
+                    hit = await self.native.submit((query, lang, top_k))
+            if hit is None:
+                cleaned = await self._offload(model._prepare_query, query, lang)
+                if not cleaned:
+                    metrics.QUERIES.inc(lang=lang, route='empty')
+                    return await self._offload(model._empty_query_answer, lang)
+                with metrics.stage('english_batch'):
+                    hit = await self.english.submit((cleaned, top_k))
+                metrics.QUERIES.inc(lang=lang, route='english')
+            else:
+                metrics.QUERIES.inc(lang=lang, route='native')
+            return await self._offload(model._format_answer, lang, hit)
+
+    def stats(self):
+        batches = self.english.batches + self.native.batches
+        items = self.english.items + self.native.items
+        return {
+            'pid': os.getpid(),
+            'pending': self.pending,
+            'rejected': self.rejected,
+            'batches': batches,
+            'mean_batch_size': items / batches if batches else 0.0,
+        }
+
+    async def handle_answer(self, payload):
+        """Return (status, body) for a POST /answer payload."""
+        if not isinstance(payload, dict) or not isinstance(payload.get('query'), str):
+            return HTTPStatus.BAD_REQUEST, {'error': "expected a JSON object with a string 'query'"}
+        top_k = payload.get('top_k', 1)
+        if not isinstance(top_k, int) or isinstance(top_k, bool) or not 1 <= top_k <= MAX_TOP_K:
+            return HTTPStatus.BAD_REQUEST, {'error': f"'top_k' must be an integer from 1 to {MAX_TOP_K}"}
+
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            return HTTPStatus.SERVICE_UNAVAILABLE, {'error': "server busy, retry later"}
+        self.pending += 1
+        try:
+            results, lang = await asyncio.wait_for(self.answer(payload['query'], top_k), self.request_timeout)
+        except asyncio.TimeoutError:
+            return HTTPStatus.GATEWAY_TIMEOUT, {'error': "request timed out"}
+        except Exception:
+            logger.exception("Request failed")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "internal error"}
+        finally:
+            self.pending -= 1
+        return HTTPStatus.OK, {'query': payload['query'], 'lang': lang, 'results': results}
+
+    async def route(self, method, path, body):
+        status, response = await self._route(method, path, body)
+        HTTP_REQUESTS.inc(route=path if path in ('/answer', '/health', '/metrics') else 'other', status=status.value)
+        return status, response
+
+    async def _route(self, method, path, body):
+        if path == '/metrics':
+            if method != 'GET':
+                return HTTPStatus.METHOD_NOT_ALLOWED, {'error': "use GET"}
+            return HTTPStatus.OK, metrics.REGISTRY.render()
+        if path == '/health':
+            if method != 'GET':
+                return HTTPStatus.METHOD_NOT_ALLOWED, {'error': "use GET"}
+            return HTTPStatus.OK, {'status': 'ok', **self.stats()}
+        if path == '/answer':
+            if method != 'POST':
+                return HTTPStatus.METHOD_NOT_ALLOWED, {'error': "use POST"}
+            try:
+                payload = json.loads(body or b'null')
+            except ValueError:
+                return HTTPStatus.BAD_REQUEST, {'error': "invalid JSON"}
+            return await self.handle_answer(payload)
+        return HTTPStatus.NOT_FOUND, {'error': f"no route for {path}"}
+
+
+async def _read_request(reader):
+    """Return (method, path, headers, body) or None when the client closed the connection."""
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    method, path, version = request_line.decode('latin-1').split()
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY_BYTES:
+        raise ValueError("request body too large")
+    body = await reader.readexactly(length) if length else b''
+    headers[':version'] = version
+    return method, path.split('?', 1)[0], headers, body
+
+
+def _response(status, body, keep_alive):
+    """Strings are sent as plain text (the metrics exposition format), anything else as JSON."""
+    if isinstance(body, str):
+        payload, content_type = body.encode('utf-8'), "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        payload, content_type = json.dumps(body, ensure_ascii=False).encode('utf-8'), "application/json; charset=utf-8"
+    head = [
+        f"HTTP/1.1 {status.value} {status.phrase}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(payload)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    if status == HTTPStatus.SERVICE_UNAVAILABLE:
+        head.append("Retry-After: 1")
+    return ("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + payload
+
+
+def _keep_alive(headers):
+    connection = headers.get('connection', '').lower()
+    if headers.get(':version') == 'HTTP/1.0':
+        return connection == 'keep-alive'
+    return connection != 'close'
+
+
+async def _handle_connection(service, reader, writer):
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except (ValueError, asyncio.LimitOverrunError, asyncio.IncompleteReadError):
+                writer.write(_response(HTTPStatus.BAD_REQUEST, {'error': "malformed request"}, False))
+                break
+            if request is None:
+                break
+            method, path, headers, body = request
+            keep_alive = _keep_alive(headers)
+            status, response = await service.route(method, path, body)
+            writer.write(_response(status, response, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run_server(model, sock, **options):
+    """Serve requests on an already bound socket until cancelled."""
+    service = AnswerService(model, **options)
+    await service.start()
+    server = await asyncio.start_server(
+        lambda reader, writer: _handle_connection(service, reader, writer), sock=sock, limit=MAX_BODY_BYTES
+    )
+    host, port = sock.getsockname()[:2]
+    logger.info("Worker %d listening on http://%s:%s", os.getpid(), host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def _worker(sock, index_dir, model_options, options, slow_query_ms=None, slow_query_log=None):
+    if slow_query_ms is not None:
+        metrics.add_slow_query_hook(metrics.SlowQueryLog(slow_query_log), slow_query_ms / 1000)
+    # Each worker opens its own SQLite connections; nothing opened before the fork is reused.
+    # A stand-in translator's output must not reach the shared on-disk cache.
+    cache = TranslationCache() if model_options.get('translator') is None else TranslationCache(path=None)
+    model = MedicalQARetrievalModel.load_index(index_dir, translation_cache=cache, **model_options)
+    try:
+        asyncio.run(run_server(model, sock, **options))
+    except KeyboardInterrupt:
+        pass
+
+
+def serve(data_path, index_dir=index_store.DEFAULT_INDEX_DIR, host="127.0.0.1", port=8000, workers=1,
+          engine='tfidf', nprobe=None, shards=1, translator=None, slow_query_ms=None, slow_query_log=None,
+          **options):
+    """Build the index if needed, then serve it from `workers` processes sharing one socket.
+
+    nprobe: IVF lists scanned per query by the 'dense' and 'hybrid' engines.
+    shards: TF-IDF scoring shards per worker, each scored in its own process.
+    translator: callable (text, src, dest) -> str used instead of Google Translate.
+
+    slow_query_ms: log (and append to `slow_query_log`, if given) the stage breakdown of
+    every request slower than this.
+    """
+    MedicalQARetrievalModel.build_if_stale(data_path, index_dir)
+    if engine in ('dense', 'hybrid'):
+        n_docs = index_store.read_manifest(index_dir)['n_docs']
+        if load_dense_index(index_dir, n_docs) is None:
+            # Fit once here rather than once per worker on its first query.
+            build_dense_index(index_dir)
+
+    sock = socket.create_server((host, port), backlog=1024)
+    model_options = {'engine': engine, 'nprobe': nprobe, 'shards': shards, 'translator': translator}
+    worker_args = (sock, index_dir, model_options, options, slow_query_ms, slow_query_log)
+    if workers <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        _worker(*worker_args)
+        return
+
+    context = multiprocessing.get_context('fork')
+    # Not daemonic: a worker's shard pool (see `src/sharded_search.py`) needs child processes.
+    processes = [context.Process(target=_worker, args=worker_args) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        sock.close()
+
+
+def _stub_translator(args):
+    records = ()
+    if args.translator_queries:
+        with open(args.translator_queries, 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    return StubTranslator(records, args.translator_latency_ms, args.translator_jitter_ms)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the medical Q&A model as a JSON API.")
+    parser.add_argument("--data", default=index_store.DEFAULT_DATA_PATH)
+    parser.add_argument("--index", default=index_store.DEFAULT_INDEX_DIR)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes sharing the socket and index")
+    parser.add_argument("--engine", choices=['tfidf', 'bm25', 'dense', 'hybrid'], default='tfidf')
+    parser.add_argument("--nprobe", type=int, help="IVF lists scanned per query by the dense engines")
+    parser.add_argument("--shards", type=int, default=1, help="Score TF-IDF in this many processes per worker")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--batch-window-ms", type=float, default=5.0)
+    parser.add_argument("--max-pending", type=int, default=256, help="In-flight requests per worker before 503s")
+    parser.add_argument("--translate-workers", type=int, default=32)
+    parser.add_argument("--request-timeout", type=float, default=30.0)
+    parser.add_argument("--translator", choices=['google', 'stub'], default='google',
+                        help="'stub': offline translator with injected latency, for load tests")
+    parser.add_argument("--translator-latency-ms", type=float, default=20.0, help="Stub latency per call")
+    parser.add_argument("--translator-jitter-ms", type=float, default=0.0, help="Extra random stub latency")
+    parser.add_argument("--translator-queries", metavar="PATH",
+                        help="JSON-lines query set (see benchmarks.query_sets) the stub maps to English; "
+                             "other text is unchanged")
+    parser.add_argument("--slow-query-ms", type=float, help="Log the stage breakdown of requests slower than this")
+    parser.add_argument("--slow-query-log", help="Also append slow-query records to this JSON-lines file")
+    args = parser.parse_args(argv)
+    metrics.configure_logging()
+
+    translator = _stub_translator(args) if args.translator == 'stub' else None
+    serve(args.data, args.index, args.host, args.port, args.workers, args.engine, args.nprobe, args.shards,
+          translator=translator, slow_query_ms=args.slow_query_ms, slow_query_log=args.slow_query_log,
+          max_batch=args.max_batch, batch_window=args.batch_window_ms / 1000, max_pending=args.max_pending,
+          translate_workers=args.translate_workers, request_timeout=args.request_timeout)
+
+
+if __name__ == "__main__":
+    main()
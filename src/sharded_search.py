@@ -0,0 +1,101 @@
+"""
+Multi-process TF-IDF scoring over row shards of the on-disk question matrix.
+
+The matrix is split into `n_shards` contiguous row ranges. Worker processes
+memory-map the index themselves (see `src/index_store.py`), so every shard is a
+view of the shared page cache and nothing is pickled or copied into them except
+the queries. A batch is scored as one task per shard. Each worker returns its
+shard's local top k, and the parent merges them with `top_k_scores`.
+
+The merge is exact. Ranking is score descending, then row ascending, so the
+global top k is the top k of the shards' local top ks. Each score is the same
+sparse dot product the single-process path computes, so rows and scores match
+it bit for bit.
+
+Sharding pays off once a batch takes longer to score than the per-batch IPC
+(a few hundred microseconds), which means corpora well beyond MedQuAD or large
+batches. For small indexes the in-process path is faster. Only a model loaded
+with `load_index` can shard, because the workers read the index from disk.
+
+    python -m benchmarks.bench_sharding --pairs 500000 --shards 1 2 4 8
+"""
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+from src import index_store
+from src.ranking import top_k_scores
+
+logger = logging.getLogger(__name__)
+
+# Per-worker state, set by `_open_shards` in each pool process.
+_shards = None
+
+
+def shard_bounds(n_rows, n_shards):
+    """Row boundaries of `n_shards` near-equal contiguous shards (`n_shards + 1` values)."""
+    n_shards = max(1, min(n_shards, n_rows or 1))
+    return np.linspace(0, n_rows, n_shards + 1).astype(np.int64)
+
+
+def _row_slice(matrix, start, end):
+    """Rows [start, end) of a CSR matrix, sharing its data and indices arrays (no copy of the non-zeros)."""
+    lo, hi = matrix.indptr[start], matrix.indptr[end]
+    indptr = np.asarray(matrix.indptr[start:end + 1]) - lo
+    return sp.csr_matrix((matrix.data[lo:hi], matrix.indices[lo:hi], indptr),
+                         shape=(end - start, matrix.shape[1]), copy=False)
+
+
+def _open_shards(index_dir, bounds):
+    global _shards
+    manifest = index_store.read_manifest(index_dir)
+    matrix, _, _ = index_store.load_matrix(index_dir, (manifest['n_docs'], manifest['n_features']))
+    _shards = [(int(start), _row_slice(matrix, start, end).T) for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _score_shard(shard_id, query_matrix, top_k):
+    start, shard_t = _shards[shard_id]
+    scores = (query_matrix @ shard_t).tocsr()
+    results = []
+    for i in range(scores.shape[0]):
+        lo, hi = scores.indptr[i], scores.indptr[i + 1]
+        indices, values = top_k_scores(scores.indices[lo:hi], scores.data[lo:hi], top_k)
+        results.append((indices + start, values))
+    return results
+
+
+class ShardedSearch:
+    def __init__(self, index_dir, n_shards, workers=None):
+        manifest = index_store.read_manifest(index_dir)
+        self.n_docs = manifest['n_docs']
+        self.bounds = shard_bounds(self.n_docs, n_shards)
+        self.n_shards = len(self.bounds) - 1
+        self.workers = workers or min(self.n_shards, os.cpu_count() or 1)
+        # Forked where possible: spawned workers would re-import the caller's main module
+        # (a Streamlit script, say). A forked pool starts all of its workers on the first
+        # submit, so do that now, before the caller starts any threads of its own.
+        method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(method),
+                                         initializer=_open_shards, initargs=(index_dir, self.bounds))
+        self._pool.submit(int).result()
+        logger.info("Scoring %d rows in %d shards over %d processes", self.n_docs, self.n_shards, self.workers)
+
+    def search(self, query_matrix, top_k):
+        """(indices, scores) per query row, identical to scoring the whole matrix in one go."""
+        query_matrix = sp.csr_matrix(query_matrix)
+        futures = [self._pool.submit(_score_shard, shard_id, query_matrix, top_k)
+                   for shard_id in range(self.n_shards)]
+        per_shard = [future.result() for future in futures]
+        results = []
+        for i in range(query_matrix.shape[0]):
+            indices = np.concatenate([shard[i][0] for shard in per_shard])
+            scores = np.concatenate([shard[i][1] for shard in per_shard])
+            results.append(top_k_scores(indices, scores, top_k))
+        return results
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,101 @@
+"""
+Text normalisation used to build the indexes and to clean queries.
+
+Every cleaner exists in two forms built on the same precompiled patterns:
+
+    clean_text(text, lang)            one query at a time
+    clean_series(texts, langs)        a whole column, grouped by language
+
+Batch mode joins a language group into one string with a separator the patterns
+leave alone, runs each regex once over it, and splits the result. That produces
+exactly what `clean_text` gives for each row, because no pattern can match
+across the separator. If an input already contains the separator, the group
+falls back to the per-row path. So indexing and querying always tokenize the
+same way.
+"""
+import re
+
+import pandas as pd
+
+# Main index: what MedicalQARetrievalModel has always indexed. The Latin range
+# deliberately starts at 'A' and ends at 'z' (so it also keeps [\]^_`), and
+# existing indexes depend on it.
+_DISALLOWED = {
+    'hi': re.compile(r'[^\u0900-\u097F\s.]'),
+    'latin': re.compile(r'[^\u0041-\u007A\u00C0-\u017F\s.]'),
+}
+_WHITESPACE = re.compile(r'\s+')
+
+# Native-language indexes: words only, apostrophes and digits split tokens.
+_NATIVE_DISALLOWED = {
+    'hi': re.compile(r'[^\u0900-\u097F\s]'),
+    'latin': re.compile(r"[^\w\s]|\d|_", re.UNICODE),
+}
+
+# Ingestion (data_loaders): plain ASCII letters and digits.
+_SOURCE_DISALLOWED = re.compile(r'[^a-z0-9\s]')
+
+_SEPARATOR = '\x1f'
+_WHITESPACE_BUT_SEPARATOR = re.compile(r'[^\S\x1f]+')
+_SPACES_AROUND_SEPARATOR = re.compile(r' ?\x1f ?')
+
+
+def _script(lang):
+    return 'hi' if lang == 'hi' else 'latin'
+
+
+def _clean_one(text, disallowed, replacement):
+    if not isinstance(text, str):
+        return ""
+    text = disallowed.sub(replacement, text.lower())
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def _clean_many(texts, disallowed, replacement):
+    texts = [text if isinstance(text, str) else "" for text in texts]
+    if not texts:
+        return []
+    blob = _SEPARATOR.join(texts)
+    if blob.count(_SEPARATOR) != len(texts) - 1:
+        return [_clean_one(text, disallowed, replacement) for text in texts]
+
+    blob = disallowed.sub(replacement, blob.lower())
+    blob = _WHITESPACE_BUT_SEPARATOR.sub(' ', blob)
+    blob = _SPACES_AROUND_SEPARATOR.sub(_SEPARATOR, blob).strip(' ')
+    return blob.split(_SEPARATOR)
+
+
+def _clean_grouped(texts, langs, table, replacement):
+    texts = pd.Series(texts).reset_index(drop=True)
+    if isinstance(langs, str) or langs is None:
+        langs = pd.Series([langs or 'en'] * len(texts))
+    langs = pd.Series(langs).reset_index(drop=True).map(_script)
+
+    cleaned = pd.Series([""] * len(texts), dtype=object)
+    for script, positions in langs.groupby(langs).groups.items():
+        cleaned.iloc[positions] = _clean_many(texts.iloc[positions].tolist(), table[script], replacement)
+    return cleaned
+
+
+def clean_text(text, lang='en'):
+    """Clean one question or query for the main TF-IDF index."""
+    return _clean_one(text, _DISALLOWED[_script(lang)], '')
+
+
+def clean_series(texts, langs='en'):
+    """Batch `clean_text` over a column; `langs` is one code or a per-row column."""
+    return _clean_grouped(texts, langs, _DISALLOWED, '')
+
+
+def clean_native(text, lang):
+    """Clean a native-language question; apostrophes split words (l'hypertension -> l hypertension)."""
+    return _clean_one(text, _NATIVE_DISALLOWED[_script(lang)], ' ')
+
+
+def clean_native_series(texts, lang):
+    return _clean_grouped(texts, lang, _NATIVE_DISALLOWED, ' ')
+
+
+def clean_source_text(text):
+    """Ingestion-time cleaning of raw MedQuAD questions and answers."""
+    return _clean_one(text, _SOURCE_DISALLOWED, '')
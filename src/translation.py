@@ -0,0 +1,368 @@
+"""
+Translation plumbing shared by the retrieval model and `language_utils`.
+
+A translator is any callable `translate(text, src, dest) -> str` that raises on
+failure; `google_translate` is the default, and tests or offline runs can pass a
+local stub instead. `google_translate` puts `HTTP_TIMEOUT` on the HTTP call
+itself, so a hung request fails instead of holding its thread forever.
+
+`TranslationCache` sits in front of the translator: a bounded in-process LRU
+backed by a SQLite file that persists across restarts and is shared safely by
+several processes (WAL journal, busy timeout, idempotent upserts).
+
+`ChunkedTranslator` handles long answers: it splits on sentence boundaries,
+packs sentences into chunks just under the provider limit and translates the
+chunks concurrently, so a long answer costs about one round trip instead of one
+per chunk. A round that gives up on a chunk still running retires its thread
+pool, so calls nobody waits for any more cannot starve later requests.
+
+`StubTranslator` is the offline stand-in used by load tests and benchmarks.
+"""
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from bs4 import BeautifulSoup
+from deep_translator import GoogleTranslator
+from deep_translator.exceptions import TranslationNotFound
+
+DEFAULT_CACHE_PATH = os.path.join("model", "translation_cache.sqlite")
+
+# Google rejects requests over 5000 characters; leave headroom for encoding.
+DEFAULT_CHUNK_CHARS = 4500
+
+# (connect, read) seconds for one call to the translation endpoint.
+HTTP_TIMEOUT = (3.05, 10.0)
+GOOGLE_TRANSLATE_URL = "https://translate.google.com/m"
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?;\u0964])\s+')
+WHITESPACE = re.compile(r'\s+')
+
+
+_http = threading.local()
+
+
+def _http_session():
+    # requests sessions are not thread-safe; keep one (and its connection pool) per thread.
+    session = getattr(_http, 'session', None)
+    if session is None:
+        session = _http.session = requests.Session()
+    return session
+
+
+def google_translate(text, src, dest, timeout=HTTP_TIMEOUT):
+    """Translate with the endpoint deep_translator's GoogleTranslator scrapes.
+
+    deep_translator calls `requests.get` without a timeout, so the request is made
+    here with `timeout`; GoogleTranslator still validates and maps the language codes.
+    """
+    # Mirrors GoogleTranslator.translate of deep-translator 1.9.1: its private
+    # `_same_source_target`, `_source` and `_target`, the endpoint and the result
+    # element. Re-check them when upgrading deep-translator.
+    languages = GoogleTranslator(source=src, target=dest)
+    text = text.strip()
+    if not text or languages._same_source_target():
+        return text
+    response = _http_session().get(GOOGLE_TRANSLATE_URL, timeout=timeout,
+                                   params={'sl': languages._source, 'tl': languages._target, 'q': text})
+    response.raise_for_status()
+    soup = BeautifulSoup(response.text, 'html.parser')
+    element = soup.find('div', {'class': 't0'}) or soup.find('div', {'class': 'result-container'})
+    if element is None:
+        raise TranslationNotFound(text)
+    return element.get_text(strip=True)
+
+
+def connect_sqlite(path):
+    """Autocommit connection tuned for many readers and a few concurrent writers."""
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def normalize_for_key(text):
+    return " ".join(text.split())
+
+
+def split_sentences(text):
+    return [sentence for sentence in SENTENCE_BOUNDARY.split(text.strip()) if sentence]
+
+
+def _split_long(piece, max_chars):
+    """Split an over-long sentence on whitespace, hard-cutting only single huge words."""
+    parts, current = [], ""
+    for word in WHITESPACE.split(piece):
+        while len(word) > max_chars:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(word[:max_chars])
+            word = word[max_chars:]
+        if current and len(current) + 1 + len(word) > max_chars:
+            parts.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        parts.append(current)
+    return parts
+
+
+def pack_chunks(text, max_chars=DEFAULT_CHUNK_CHARS):
+    """Greedily pack whole sentences into chunks of at most `max_chars` characters."""
+    chunks, current = [], ""
+    for sentence in split_sentences(text):
+        pieces = [sentence] if len(sentence) <= max_chars else _split_long(sentence, max_chars)
+        for piece in pieces:
+            if current and len(current) + 1 + len(piece) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class ChunkedTranslator:
+    """Translate long text as concurrently-translated, sentence-aligned chunks.
+
+    Each round waits at most `timeout` seconds for the outstanding chunks; chunks
+    that raised or timed out are resubmitted up to `retries` times and otherwise
+    fall back to their source text, without affecting the other chunks.
+
+    A running call cannot be cancelled. When a round gives up on one, the pool it
+    runs in is retired (its threads exit as their calls return) and later chunks
+    go to a fresh pool, so abandoned calls never hold the workers other requests need.
+    """
+
+    def __init__(self, translate_fn=google_translate, max_chars=DEFAULT_CHUNK_CHARS, max_workers=8,
+                 timeout=10.0, retries=1):
+        self.translate_fn = translate_fn
+        self.max_chars = max_chars
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.retired_pools = 0
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self):
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="translate")
+
+    def _submit(self, chunk, src, dest):
+        with self._lock:
+            executor = self._executor
+            return executor, executor.submit(self.translate_fn, chunk, src, dest)
+
+    def _abandon(self, executor, future):
+        """Give up on a chunk's call, retiring its pool if the call is already running."""
+        if future.cancel() or future.done():
+            return
+        with self._lock:
+            if self._executor is executor:
+                self._executor = self._new_executor()
+                self.retired_pools += 1
+        executor.shutdown(wait=False)
+
+    def translate(self, text, src, dest):
+        """Return (translation, number of chunks that fell back to the source text)."""
+        chunks = pack_chunks(text, self.max_chars)
+        results = {}
+        pending = {i: self._submit(chunk, src, dest) for i, chunk in enumerate(chunks)}
+        for attempt in range(self.retries + 1):
+            done, _ = wait([future for _, future in pending.values()], timeout=self.timeout)
+            retry = {}
+            for i, (executor, future) in pending.items():
+                if future in done and future.exception() is None:
+                    results[i] = future.result()
+                    continue
+                if future not in done:
+                    self._abandon(executor, future)
+                if attempt < self.retries:
+                    retry[i] = self._submit(chunks[i], src, dest)
+            pending = retry
+            if not pending:
+                break
+
+        failed = len(chunks) - len(results)
+        if failed == len(chunks):
+            raise RuntimeError(f"All {failed} chunks failed to translate from {src} to {dest}")
+        return ' '.join(results.get(i, chunk) for i, chunk in enumerate(chunks)), failed
+
+    def __call__(self, text, src, dest):
+        return self.translate(text, src, dest)[0]
+
+    def shutdown(self):
+        with self._lock:
+            executor = self._executor
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class StubTranslator:
+    """Offline stand-in for `google_translate` with configurable latency.
+
+    Maps each record's 'query' to its 'english' when translating to English (see
+    `benchmarks.query_sets`); any other text comes back unchanged. Each call
+    sleeps `latency_ms` plus up to `jitter_ms`, drawn from a seeded generator.
+    """
+
+    def __init__(self, records=(), latency_ms=0.0, jitter_ms=0.0, seed=0):
+        self.to_english = {" ".join(record['query'].split()): record['english'] for record in records}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, text, src, dest):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency_ms + (self._rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay:
+            time.sleep(delay / 1000)
+        if dest == 'en':
+            return self.to_english.get(" ".join(text.split()), text)
+        return text
+
+
+class TranslationCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=4096):
+        self.path = path
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._connection().execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                " src TEXT NOT NULL, dest TEXT NOT NULL, key TEXT NOT NULL, translation TEXT NOT NULL,"
+                " PRIMARY KEY (src, dest, key)) WITHOUT ROWID"
+            )
+
+    def _connection(self):
+        # sqlite3 connections must not be shared across threads; keep one per thread.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect_sqlite(self.path)
+        return conn
+
+    @staticmethod
+    def key(src, dest, text):
+        digest = hashlib.sha256(normalize_for_key(text).encode('utf-8')).hexdigest()
+        return src, dest, digest
+
+    def _remember(self, key, translation):
+        with self._lock:
+            self._memory[key] = translation
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, src, dest, text):
+        key = self.key(src, dest, text)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+        if self.path:
+            row = self._connection().execute(
+                "SELECT translation FROM translations WHERE src = ? AND dest = ? AND key = ?", key
+            ).fetchone()
+            if row is not None:
+                self._remember(key, row[0])
+                with self._lock:
+                    self.disk_hits += 1
+                return row[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, src, dest, text, translation):
+        key = self.key(src, dest, text)
+        self._remember(key, translation)
+        if self.path:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO translations (src, dest, key, translation) VALUES (?, ?, ?, ?)",
+                (*key, translation)
+            )
+
+    def translate(self, text, src, dest, translate_fn=google_translate):
+        """Return a cached translation, calling `translate_fn` and storing the result on a miss.
+
+        Errors from `translate_fn` propagate and nothing is cached, so a failed call
+        is retried next time instead of pinning the untranslated fallback.
+        """
+        cached = self.get(src, dest, text)
+        if cached is not None:
+            return cached
+        translation = translate_fn(text, src, dest)
+        self.put(src, dest, text, translation)
+        return translation
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TranslationCache()
+        return _default_cache
+
+
+if __name__ == "__main__":
+    # Offline demo: a fake translator with injected latency shows that a long
+    # answer now costs about one chunk's latency instead of the sum over chunks.
+    latency = 0.2
+
+    def slow_stub(text, src, dest):
+        time.sleep(latency)
+        return text.upper()
+
+    sentence = "Diabetes is a disease in which blood glucose levels are too high. "
+    answer = sentence * 400
+    chunks = pack_chunks(answer)
+
+    start = time.perf_counter()
+    sequential = ' '.join(slow_stub(chunk, 'en', 'es') for chunk in chunks)
+    sequential_time = time.perf_counter() - start
+
+    translator = ChunkedTranslator(slow_stub)
+    start = time.perf_counter()
+    concurrent, failed = translator.translate(answer, 'en', 'es')
+    concurrent_time = time.perf_counter() - start
+    translator.shutdown()
+
+    assert concurrent == sequential and not failed
+    print(f"{len(chunks)} chunks of <= {DEFAULT_CHUNK_CHARS} chars, {latency:.2f}s per call")
+    print(f"sequential: {sequential_time:.2f}s  concurrent: {concurrent_time:.2f}s")
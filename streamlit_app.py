@@ -1,11 +1,13 @@
 import streamlit as st
+from src.metrics import configure_logging
 from src.retrieval_model import MedicalQARetrievalModel
 
 st.set_page_config(page_title="🩺 Medical Chatbot", layout="wide")
 
 @st.cache_resource
 def load_model():
-    return MedicalQARetrievalModel()
+    configure_logging()
+    return MedicalQARetrievalModel.load_or_build()
 
 model = load_model()
 
@@ -0,0 +1,40 @@
+import os
+
+import pandas as pd
+
+from src.data_loaders import ingest_medquad
+
+
+def _write_qa_file(path, pairs):
+    qa_pairs = "".join(f"<QAPair><Question>{q}</Question><Answer>{a}</Answer></QAPair>" for q, a in pairs)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"<Document><QAPairs>{qa_pairs}</QAPairs></Document>")
+
+
+def _corpus(tmp_path):
+    for directory, files in {"1_CancerGov_QA": ["f1.xml", "f2.xml"], "2_GARD_QA": ["f3.xml"]}.items():
+        os.makedirs(tmp_path / "MedQuAD" / directory)
+        for name in files:
+            _write_qa_file(tmp_path / "MedQuAD" / directory / name,
+                           [(f"What is {name} question {i} ?", f"Answer {i} of {name}.") for i in range(3)])
+    return str(tmp_path / "MedQuAD")
+
+
+def test_incremental_ingest_equals_a_full_rebuild(tmp_path):
+    data_dir = _corpus(tmp_path)
+    incremental = str(tmp_path / "incremental.parquet")
+    ingest_medquad(data_dir, incremental, workers=1)
+
+    edited = os.path.join(data_dir, "1_CancerGov_QA", "f1.xml")
+    _write_qa_file(edited, [("What is the edited question ?", "The edited answer."), ("Is it second ?", "Yes.")])
+    os.utime(edited, (1, 1))
+    os.remove(os.path.join(data_dir, "2_GARD_QA", "f3.xml"))
+    _write_qa_file(os.path.join(data_dir, "2_GARD_QA", "f0.xml"), [("What is new ?", "A new file.")])
+    ingest_medquad(data_dir, incremental, workers=1)
+    ingest_medquad(data_dir, str(tmp_path / "full.parquet"), workers=1)
+
+    df = pd.read_parquet(incremental)
+    pd.testing.assert_frame_equal(df, pd.read_parquet(tmp_path / "full.parquet"))
+    assert df['source_file'].iloc[0] == os.path.join("1_CancerGov_QA", "f1.xml")
+    assert "edited" in df['question'].iloc[0]
+    assert df['source_file'].tolist() == sorted(df['source_file'])
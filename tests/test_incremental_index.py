@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic_corpus import generate_corpus, write_corpus
+from src.incremental_index import REBUILD_TOLERANCE, max_score_difference
+from src.retrieval_model import MedicalQARetrievalModel
+from src.translation import TranslationCache
+
+
+def _model(path):
+    return MedicalQARetrievalModel(data_path=path, translation_cache=TranslationCache(path=None))
+
+
+@pytest.fixture
+def corpus_path(tmp_path):
+    return write_corpus(generate_corpus(600, seed=0)[['question', 'answer']], str(tmp_path / "corpus.csv"))
+
+
+def test_updates_match_a_full_rebuild_after_compaction(corpus_path, tmp_path):
+    model = _model(corpus_path)
+    corpus = model.df[['question', 'answer', 'lang']].copy()
+    assert len(model.vectorizer.vocabulary_) < model.vectorizer.max_features
+
+    # Re-added questions bring no new n-grams, so the frozen vocabulary covers them.
+    added = corpus.sample(n=60, random_state=0)
+    model.add_documents(added['question'].tolist(), added['answer'].tolist(), added['lang'].tolist())
+    deleted = model.df['doc_id'].sample(n=90, random_state=1).tolist()
+    assert model.delete_documents(deleted) == 90
+    if model._compaction_thread is not None:
+        model._compaction_thread.join()
+    model.compact()
+    assert model.updates.live.all()
+    assert len(model.df) == len(corpus) + 60 - 90
+    assert model.updates.oov_rate() == 0.0
+
+    live_path = str(tmp_path / "live.csv")
+    model.df[['question', 'answer', 'lang']].to_csv(live_path, index=False)
+    rebuilt = _model(live_path)
+
+    queries = corpus['question'].sample(n=100, random_state=2).map(model._clean_text).tolist()
+    assert max_score_difference(model, rebuilt, queries) <= REBUILD_TOLERANCE
+    assert np.array_equal(model.question_vector.indptr, rebuilt.question_vector.indptr)
+
+
+def test_deleted_documents_are_never_returned(corpus_path):
+    model = _model(corpus_path)
+    model.enable_updates()
+    query = model._clean_text(model.df['question'].iloc[0])
+    rows, _ = model._score_queries([query], 5)[0]
+    best = int(model.df['doc_id'].iloc[rows[0]])
+    assert model.delete_documents([best]) == 1
+    rows, _ = model._score_queries([query], 5)[0]
+    assert best not in model.df['doc_id'].iloc[rows].tolist()
+
+
+def test_new_ngrams_are_counted_as_out_of_vocabulary(corpus_path):
+    model = _model(corpus_path)
+    model.add_documents(["What is zyxwvutitis ?"], ["Zyxwvutitis is made up."])
+    assert model.updates.oov_rate() > 0
@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from benchmarks.synthetic_corpus import generate_corpus, write_corpus
+from src import index_store, native_index
+from src.translation import TranslationCache
+
+
+def _translator(text, src, dest):
+    if dest == 'hi':
+        raise ConnectionError("injected failure")
+    return text
+
+
+@pytest.fixture
+def build_native(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)  # keeps the default translation cache out of the tree
+    real = native_index.build_native_indexes
+
+    def build(index_dir, languages, **kwargs):
+        return real(index_dir, languages, translator=_translator, cache=TranslationCache(path=None), workers=2)
+
+    monkeypatch.setattr(native_index, 'build_native_indexes', build)
+    data = write_corpus(generate_corpus(100, seed=0)[['question', 'answer']], str(tmp_path / "corpus.csv"))
+    return lambda *langs: index_store.main(["build", "--data", data, "--out", str(tmp_path / "index"),
+                                            "--native", *langs])
+
+
+def test_build_fails_when_a_native_language_is_skipped(build_native, tmp_path):
+    assert build_native('es', 'hi') == 1
+    native_dir = tmp_path / "index" / native_index.NATIVE_DIR
+    assert os.path.isdir(native_dir / 'es')
+    assert not os.path.exists(native_dir / 'hi')
+
+
+def test_build_succeeds_when_every_native_language_is_built(build_native):
+    assert build_native('es', 'fr') == 0
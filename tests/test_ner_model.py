@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.ner_model import EntityTagger, build_entity_index
+from src.retrieval_model import MedicalQARetrievalModel
+from src.translation import TranslationCache
+
+QUESTIONS = [
+    ("What causes chest pain ?", "Chest pain can come from the heart or the lungs."),
+    ("What is pain ?", "Pain is an unpleasant feeling."),
+    ("What are the symptoms of breast cancer ?", "A lump in the breast is a common sign."),
+    ("What is cancer ?", "Cancer is the uncontrolled growth of cells."),
+    ("What are the treatments for back pain ?", "Rest and physical therapy."),
+    ("What causes asthma ?", "Asthma is caused by inflamed airways."),
+    ("Who is at risk for breast cancer ?", "Risk grows with age."),
+    ("How to prevent heart disease ?", "Exercise and a healthy diet."),
+]
+QUERIES = ["pain in the chest causes", "chest pain", "breast cancer", "cancer of the breast symptoms",
+           "what is pain", "back pain treatments", "asthma"]
+
+
+def test_entity_ids_include_nested_matches():
+    tagger = EntityTagger(["breast cancer", "cancer", "chest pain", "pain"])
+    assert [entity_id for _, _, entity_id in tagger.tag("what causes chest pain")] == [2]
+    assert tagger.entity_ids("what causes chest pain") == {2, 3}
+    assert tagger.entity_ids("symptoms of breast cancers") == {0, 1}
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    path = str(tmp_path / "corpus.csv")
+    pd.DataFrame(QUESTIONS, columns=['question', 'answer']).to_csv(path, index=False)
+    index_dir = str(tmp_path / "index")
+    MedicalQARetrievalModel(data_path=path, translation_cache=TranslationCache(path=None)).save_index(index_dir)
+    build_entity_index(index_dir)
+    return index_dir
+
+
+def test_filtered_top_k_matches_full_scoring(index_dir):
+    full, filtered = [MedicalQARetrievalModel.load_index(index_dir, entity_filter=entity_filter,
+                                                         translation_cache=TranslationCache(path=None))
+                      for entity_filter in (False, True)]
+    assert filtered.entity_index is not None
+    cleaned = [full._clean_text(query) for query in QUERIES]
+    ranked = full._score_queries(cleaned, len(QUESTIONS))
+    for query, query_clean, (all_rows, all_scores), (rows, scores) in zip(
+            QUERIES, cleaned, ranked, filtered._score_queries(cleaned, 3)):
+        candidates = filtered.entity_index.candidates(query_clean)
+        assert candidates is not None, query
+        # The best question shares a (possibly nested) entity with the query...
+        assert all_rows[0] in candidates, query
+        # ...and among the questions that do, the ranking is full scoring's, bit for bit.
+        keep = np.isin(all_rows, candidates)
+        assert np.array_equal(rows, all_rows[keep][:3]), query
+        assert np.array_equal(scores, all_scores[keep][:3]), query
+
+
+def test_nested_entity_query_returns_the_full_scoring_answer(index_dir):
+    filtered = MedicalQARetrievalModel.load_index(index_dir, translation_cache=TranslationCache(path=None))
+    rows, _ = filtered._score_queries([filtered._clean_text("pain in the chest causes")], 1)[0]
+    assert rows.tolist() == [0]  # "What causes chest pain ?", not "What is pain ?"
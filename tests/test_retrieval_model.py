@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_corpus import generate_corpus, write_corpus
+from src.retrieval_model import MedicalQARetrievalModel
+from src.translation import TranslationCache
+
+
+@pytest.fixture
+def model(tmp_path):
+    corpus = generate_corpus(400, seed=0)[['question', 'answer']]
+    # Exact copies score identically, so their order is decided by the tie-break alone.
+    corpus = pd.concat([corpus, corpus.iloc[:20]], ignore_index=True)
+    path = write_corpus(corpus, str(tmp_path / "corpus.csv"))
+    return MedicalQARetrievalModel(data_path=path, translation_cache=TranslationCache(path=None))
+
+
+def test_batched_scoring_matches_one_query_at_a_time(model):
+    queries = model.df['question'].sample(n=40, random_state=0).tolist() + model.df['question'].iloc[:10].tolist()
+    queries += ["what are the symptoms", "completely unrelated words", ""]
+    cleaned = [model._clean_text(query) for query in queries]
+    for top_k in (2, 5, 25):
+        batched = model._score_queries(cleaned, top_k)
+        assert len(batched) == len(cleaned)
+        for query, (rows, scores) in zip(cleaned, batched):
+            [(single_rows, single_scores)] = model._score_queries([query], top_k)
+            assert np.array_equal(rows, single_rows), query
+            assert np.array_equal(scores, single_scores), query
+
+
+def test_ties_are_ranked_by_row(model):
+    n = len(model.df)
+    for row in range(20):
+        [(rows, scores)] = model._score_queries([model.df['question_clean'].iloc[row]], 5)
+        assert rows[0] == row and rows[1] == n - 20 + row
+        assert scores[0] == scores[1]
+        assert np.all(np.diff(scores) <= 0)
@@ -0,0 +1,39 @@
+import asyncio
+import json
+from http import HTTPStatus
+
+import pytest
+
+from src import server
+from src.server import MAX_TOP_K, AnswerService
+
+
+@pytest.mark.parametrize('payload', [
+    {'query': "what is asthma", 'top_k': True},
+    {'query': "what is asthma", 'top_k': False},
+    {'query': "what is asthma", 'top_k': 0},
+    {'query': "what is asthma", 'top_k': MAX_TOP_K + 1},
+    {'query': "what is asthma", 'top_k': 1.0},
+    {'query': 1},
+    ["what is asthma"],
+])
+def test_invalid_payloads_are_rejected(payload):
+    service = AnswerService(model=None)
+    try:
+        status, body = asyncio.run(service.handle_answer(payload))
+    finally:
+        service.score_executor.shutdown()
+        service.io_executor.shutdown()
+    assert status == HTTPStatus.BAD_REQUEST
+    assert 'error' in body
+
+
+def test_stub_translator_reads_the_query_set_without_benchmarks(tmp_path):
+    path = tmp_path / "queries.jsonl"
+    path.write_text(json.dumps({'query': "¿Qué es el asma?", 'english': "What is asthma?"}) + "\n\n",
+                    encoding='utf-8')
+    args = server.argparse.Namespace(translator_queries=str(path), translator_latency_ms=0.0,
+                                     translator_jitter_ms=0.0)
+    translator = server._stub_translator(args)
+    assert translator(" ¿Qué es  el asma? ", 'es', 'en') == "What is asthma?"
+    assert translator("El asma es una enfermedad.", 'en', 'es') == "El asma es una enfermedad."
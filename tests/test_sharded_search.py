@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_corpus import generate_corpus, write_corpus
+from src.retrieval_model import MedicalQARetrievalModel
+from src.translation import TranslationCache
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    corpus = generate_corpus(300, seed=1)[['question', 'answer']]
+    corpus = pd.concat([corpus, corpus.iloc[:10]], ignore_index=True)  # exact ties across shards
+    path = write_corpus(corpus, str(tmp_path / "corpus.csv"))
+    index_dir = str(tmp_path / "index")
+    MedicalQARetrievalModel(data_path=path, translation_cache=TranslationCache(path=None)).save_index(index_dir)
+    return index_dir
+
+
+def test_three_shards_match_a_single_process(index_dir):
+    single, sharded = [MedicalQARetrievalModel.load_index(index_dir, shards=shards, entity_filter=False,
+                                                          translation_cache=TranslationCache(path=None))
+                       for shards in (1, 3)]
+    try:
+        assert single.sharded_search is None
+        assert sharded.sharded_search is not None and sharded.sharded_search.n_shards == 3
+        questions = single._texts('question_clean')
+        queries = questions.sample(n=30, random_state=0).tolist() + questions.iloc[:10].tolist()
+        queries += ["what are the symptoms", "completely unrelated words"]
+        for top_k in (1, 5, 20):
+            for (rows, scores), (shard_rows, shard_scores) in zip(single._score_queries(queries, top_k),
+                                                                  sharded._score_queries(queries, top_k)):
+                assert np.array_equal(rows, shard_rows)
+                assert np.array_equal(scores, shard_scores)
+    finally:
+        if sharded.sharded_search is not None:
+            sharded.sharded_search.close()
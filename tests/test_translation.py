@@ -0,0 +1,133 @@
+import threading
+import time
+
+import pytest
+
+from src import translation
+from src.translation import HTTP_TIMEOUT, ChunkedTranslator, pack_chunks
+
+SENTENCE = "Diabetes is a disease in which blood glucose levels are too high. "
+
+
+class FakeTranslator:
+    """Upper-cases its input after `delays[chunk index]` seconds; chunks in `hang` block until released."""
+
+    def __init__(self, delays=None, hang=(), fail_first=()):
+        self.delays = delays or {}
+        self.hang = set(hang)
+        self.fail_first = set(fail_first)
+        self.calls = {}
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, text, src, dest):
+        index = int(text.split()[0])
+        with self._lock:
+            self.calls[index] = self.calls.get(index, 0) + 1
+            first = self.calls[index] == 1
+        if first and index in self.fail_first:
+            raise ConnectionError("injected failure")
+        if index in self.hang:
+            self.release.wait()
+        time.sleep(self.delays.get(index, 0.0))
+        return text.upper()
+
+
+def _answer(n_chunks):
+    """Text that packs into `n_chunks` chunks of at most 200 characters, each starting with its index."""
+    return " ".join(f"{i} " + SENTENCE * 2 for i in range(n_chunks))
+
+
+@pytest.fixture
+def make_translator():
+    created = []
+
+    def make(fake, **kwargs):
+        translator = ChunkedTranslator(fake, max_chars=200, **kwargs)
+        created.append((translator, fake))
+        return translator
+
+    yield make
+    for translator, fake in created:
+        fake.release.set()
+        translator.shutdown()
+
+
+def test_chunks_are_reassembled_in_order_when_they_complete_out_of_order(make_translator):
+    answer = _answer(6)
+    assert len(pack_chunks(answer, 200)) == 6
+    fake = FakeTranslator(delays={i: 0.05 * (6 - i) for i in range(6)})
+    translation, failed = make_translator(fake).translate(answer, 'en', 'es')
+    assert failed == 0
+    assert translation == " ".join(chunk.upper() for chunk in pack_chunks(answer, 200))
+
+
+def test_latency_tracks_the_slowest_chunk_not_the_sum(make_translator):
+    n_chunks, delay = 8, 0.2
+    answer = _answer(n_chunks)
+    assert len(pack_chunks(answer, 200)) == n_chunks
+    fake = FakeTranslator(delays={i: delay for i in range(n_chunks)})
+    start = time.perf_counter()
+    _, failed = make_translator(fake, max_workers=n_chunks).translate(answer, 'en', 'es')
+    elapsed = time.perf_counter() - start
+    assert failed == 0
+    assert elapsed < 2 * delay < n_chunks * delay
+
+
+def test_failed_chunk_is_retried(make_translator):
+    answer = _answer(3)
+    fake = FakeTranslator(fail_first={1})
+    translation, failed = make_translator(fake, retries=1).translate(answer, 'en', 'es')
+    assert failed == 0
+    assert fake.calls[1] == 2
+    assert translation == " ".join(chunk.upper() for chunk in pack_chunks(answer, 200))
+
+
+def test_timed_out_chunk_falls_back_to_source_text(make_translator):
+    answer = _answer(3)
+    chunks = pack_chunks(answer, 200)
+    fake = FakeTranslator(hang={2})
+    start = time.perf_counter()
+    translation, failed = make_translator(fake, timeout=0.2, retries=1).translate(answer, 'en', 'es')
+    assert time.perf_counter() - start < 1.0
+    assert failed == 1
+    assert fake.calls[2] == 2
+    assert translation == " ".join([chunks[0].upper(), chunks[1].upper(), chunks[2]])
+
+
+def test_all_chunks_timing_out_raises(make_translator):
+    fake = FakeTranslator(hang={0})
+    with pytest.raises(RuntimeError, match="All 1 chunks failed"):
+        make_translator(fake, timeout=0.1, retries=0).translate(_answer(1), 'en', 'es')
+
+
+def test_hung_calls_do_not_starve_later_requests(make_translator):
+    fake = FakeTranslator(hang={0})
+    translator = make_translator(fake, max_workers=2, timeout=0.1, retries=1)
+    for _ in range(4):
+        with pytest.raises(RuntimeError):
+            translator.translate(_answer(1), 'en', 'es')
+    assert fake.calls[0] == 8  # every hung call is still running
+
+    translation, failed = translator.translate("1 " + SENTENCE, 'en', 'es')
+    assert failed == 0
+    assert translation == ("1 " + SENTENCE).strip().upper()
+
+
+def test_google_translate_times_out_the_http_call(monkeypatch):
+    seen = {}
+
+    class Response:
+        text = '<div class="result-container">Diabetes es una enfermedad.</div>'
+
+        def raise_for_status(self):
+            pass
+
+    class Session:
+        def get(self, url, params, timeout):
+            seen.update(params=params, timeout=timeout)
+            return Response()
+
+    monkeypatch.setattr(translation, '_http_session', Session)
+    assert translation.google_translate(" Diabetes is a disease. ", 'en', 'es') == "Diabetes es una enfermedad."
+    assert seen == {'params': {'sl': 'en', 'tl': 'es', 'q': "Diabetes is a disease."}, 'timeout': HTTP_TIMEOUT}
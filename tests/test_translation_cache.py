@@ -0,0 +1,72 @@
+import pytest
+
+from src.translation import TranslationCache
+
+
+class StubTranslator:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = 0
+
+    def __call__(self, text, src, dest):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("injected failure")
+        return f"[{dest}] {text}"
+
+
+def test_hits_misses_and_stats(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite"))
+    stub = StubTranslator()
+    assert cache.translate("what is diabetes", 'en', 'es', stub) == "[es] what is diabetes"
+    # Keys ignore whitespace differences.
+    assert cache.translate("what  is diabetes ", 'en', 'es', stub) == "[es] what is diabetes"
+    assert cache.translate("what is diabetes", 'en', 'fr', stub) == "[fr] what is diabetes"
+    assert stub.calls == 2
+    stats = cache.stats()
+    assert (stats['memory_hits'], stats['disk_hits'], stats['misses']) == (1, 0, 2)
+    assert stats['hit_rate'] == pytest.approx(1 / 3)
+    assert stats['memory_entries'] == 2
+
+
+def test_lru_evicts_the_least_recently_used_entry(tmp_path):
+    cache = TranslationCache(path=None, max_entries=2)
+    stub = StubTranslator()
+    for text in ("a", "b"):
+        cache.translate(text, 'en', 'es', stub)
+    cache.translate("a", 'en', 'es', stub)  # "a" is now the most recent
+    cache.translate("c", 'en', 'es', stub)  # evicts "b"
+    assert cache.stats()['memory_entries'] == 2
+    assert cache.get('en', 'es', "a") == "[es] a"
+    assert cache.get('en', 'es', "b") is None
+    assert stub.calls == 3
+
+
+def test_evicted_entries_are_served_from_disk(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite"), max_entries=1)
+    stub = StubTranslator()
+    cache.translate("a", 'en', 'es', stub)
+    cache.translate("b", 'en', 'es', stub)
+    assert cache.translate("a", 'en', 'es', stub) == "[es] a"
+    assert stub.calls == 2
+    assert cache.stats()['disk_hits'] == 1
+
+
+def test_translations_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    TranslationCache(path).translate("what is asthma", 'en', 'hi', StubTranslator())
+    reopened = TranslationCache(path)
+    stub = StubTranslator()
+    assert reopened.translate("what is asthma", 'en', 'hi', stub) == "[hi] what is asthma"
+    assert stub.calls == 0
+    assert reopened.stats()['disk_hits'] == 1
+
+
+def test_failed_translations_are_not_cached(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = TranslationCache(path)
+    with pytest.raises(ConnectionError):
+        cache.translate("what is asthma", 'en', 'es', StubTranslator(fail=True))
+    assert cache.get('en', 'es', "what is asthma") is None
+    assert TranslationCache(path).get('en', 'es', "what is asthma") is None
+    assert cache.translate("what is asthma", 'en', 'es', StubTranslator()) == "[es] what is asthma"